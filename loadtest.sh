@@ -0,0 +1,62 @@
+#!/bin/bash
+# Start a local server, run the exam load test against it, then stop it.
+#
+# Usage: bash loadtest.sh [loadtest options]
+#   bash loadtest.sh --trainees 200 --questions 30
+#   bash loadtest.sh --trainees 200 --compare loadtest_results/<earlier run>.json
+#   LOADTEST_COMMAND=bench_concurrency LOADTEST_WORKERS=1 bash loadtest.sh --levels 1,10,50
+#   LOADTEST_SERVER=asgi LOADTEST_COMMAND=bench_concurrency LOADTEST_WORKERS=1 bash loadtest.sh
+#
+# The server uses the same settings and database as this shell: SQLite by
+# default, or a local MySQL when DB_ENGINE=mysql and DB_* are set.
+# LOADTEST_PORT (default 8765) and LOADTEST_WORKERS (default 3) control the
+# server; gunicorn is used when installed, runserver otherwise.
+# LOADTEST_SERVER=asgi runs gunicorn with uvicorn workers (or plain uvicorn)
+# instead of sync WSGI workers. LOADTEST_COMMAND picks the management
+# command to run: loadtest (default) or bench_concurrency.
+
+cd "$(dirname "$0")" || exit 1
+if [ -d venv ]; then
+    source venv/bin/activate
+fi
+
+PORT="${LOADTEST_PORT:-8765}"
+WORKERS="${LOADTEST_WORKERS:-3}"
+# Seen by the server and by the cache checks in quiz_app/checks.py
+export WEB_CONCURRENCY="$WORKERS"
+
+python manage.py migrate --noinput || exit 1
+
+SERVER="${LOADTEST_SERVER:-wsgi}"
+export LOADTEST_SERVER="$SERVER"
+if [ "$SERVER" = "asgi" ]; then
+    if python -c "import gunicorn, uvicorn_worker" 2>/dev/null; then
+        echo "Starting gunicorn with $WORKERS uvicorn workers on port $PORT"
+        python -m gunicorn quiz_project.asgi:application -k uvicorn_worker.UvicornWorker \
+            --workers "$WORKERS" --bind "127.0.0.1:$PORT" --log-level warning &
+    elif python -c "import uvicorn" 2>/dev/null; then
+        echo "Starting uvicorn with $WORKERS workers on port $PORT"
+        python -m uvicorn quiz_project.asgi:application --workers "$WORKERS" --port "$PORT" --log-level warning &
+    else
+        echo "LOADTEST_SERVER=asgi needs uvicorn: pip install uvicorn uvicorn-worker" >&2
+        exit 1
+    fi
+elif python -c "import gunicorn" 2>/dev/null; then
+    echo "Starting gunicorn with $WORKERS workers on port $PORT"
+    python -m gunicorn quiz_project.wsgi:application --workers "$WORKERS" --bind "127.0.0.1:$PORT" --log-level warning &
+else
+    echo "gunicorn not installed; starting runserver on port $PORT"
+    python manage.py runserver "127.0.0.1:$PORT" --noreload > /dev/null 2>&1 &
+fi
+SERVER_PID=$!
+trap 'kill $SERVER_PID 2>/dev/null; wait $SERVER_PID 2>/dev/null' EXIT
+
+# Wait for the server to answer
+for _ in $(seq 1 30); do
+    if python -c "import urllib.request; urllib.request.urlopen('http://127.0.0.1:$PORT/login/', timeout=1)" 2>/dev/null; then
+        break
+    fi
+    sleep 1
+done
+
+python manage.py "${LOADTEST_COMMAND:-loadtest}" --base-url "http://127.0.0.1:$PORT" "$@"
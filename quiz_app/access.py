@@ -0,0 +1,55 @@
+"""
+Category-based access control.
+
+The ids of the categories a user is registered for are computed once and kept
+in Django's cache, so checking access to a quiz is a set membership test
+instead of a query. The ``m2m_changed`` handler in ``quiz_app.signals`` drops
+the cached set whenever a profile's registered categories change.
+"""
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import Category
+
+CATEGORY_ACCESS_TIMEOUT = 60 * 60
+
+
+def _cache_key(user_id):
+    return f'user_category_ids:{user_id}'
+
+
+def get_allowed_category_ids(user):
+    """Return a frozenset of ids of the categories the user is registered for"""
+    # Memoised on the user object so one request hits the cache at most once
+    allowed = getattr(user, '_allowed_category_ids', None)
+    if allowed is not None:
+        return allowed
+
+    key = _cache_key(user.pk)
+    allowed = cache.get(key)
+    if allowed is None:
+        # From the primary: a lagging replica must not end up in the cache
+        allowed = frozenset(
+            Category.objects.using(DEFAULT_DB_ALIAS)
+            .filter(registered_users__user_id=user.pk).values_list('pk', flat=True)
+        )
+        cache.set(key, allowed, CATEGORY_ACCESS_TIMEOUT)
+    user._allowed_category_ids = allowed
+    return allowed
+
+
+async def aget_allowed_category_ids(user):
+    """Async version of ``get_allowed_category_ids``"""
+    allowed = getattr(user, '_allowed_category_ids', None)
+    if allowed is not None:
+        return allowed
+    # One trip to a worker thread for the cache lookup and a possible query
+    return await sync_to_async(get_allowed_category_ids)(user)
+
+
+def invalidate_allowed_categories(user_ids):
+    """Forget cached category ids of the given users once the transaction commits"""
+    keys = [_cache_key(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -1,45 +1,124 @@
+import io
+import tempfile
+
+from django.conf import settings
 from django.contrib import admin
-from django.shortcuts import render, redirect
+from django.db.models import Avg, Count, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib import messages
 from django.urls import path
-from django.http import HttpResponse
-from .models import Quiz, Question, Choice, QuizSubmission, Answer, Category, UserProfile
-from .excel_utils import export_quizzes_to_excel, create_excel_template, import_quizzes_from_excel
+from django.utils.decorators import method_decorator
+from django.http import FileResponse, HttpResponse, JsonResponse
+from .models import Quiz, Question, Choice, QuizSubmission, Answer, Category, UserProfile, ImportJob
+from .excel_utils import write_quizzes_excel, create_excel_template
+from .import_jobs import claim_job, enqueue_import, job_status, run_job
+from .interchange import format_for_filename, write_quizzes_csv, write_quizzes_jsonl
+from .grading import question_count_subquery, rescore_quizzes
+from .db_router import use_replica
+
+
+def _submission_stats_subquery(aggregate, output_name):
+    """Aggregate over the completed submissions of the outer Quiz row"""
+    submissions = (
+        QuizSubmission.objects.filter(quiz_id=OuterRef('pk'), is_completed=True)
+        .order_by()
+        .values('quiz_id')
+        .annotate(**{output_name: aggregate})
+        .values(output_name)
+    )
+    return Subquery(submissions)
+
+
+class ReplicaChangelistMixin:
+    """Read changelist pages from a replica; actions (POST) and edits use the primary"""
+    
+    @method_decorator(use_replica)
+    def changelist_view(self, request, extra_context=None):
+        return super().changelist_view(request, extra_context=extra_context)
 
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'description', 'created_at']
+class CategoryAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ['name', 'description', 'quiz_count', 'created_at']
     search_fields = ['name', 'description']
     list_filter = ['created_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(quiz_count=Count('quizzes'))
+    
+    def quiz_count(self, obj):
+        return obj.quiz_count
+    quiz_count.short_description = 'Quizzes'
+    quiz_count.admin_order_field = 'quiz_count'
 
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ['user', 'get_registered_categories', 'created_at', 'updated_at']
     list_filter = ['created_at', 'updated_at']
     search_fields = ['user__username', 'user__email']
     filter_horizontal = ['registered_categories']
+    list_select_related = ['user']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(
+            Prefetch('registered_categories', queryset=Category.objects.only('id', 'name'))
+        )
     
     def get_registered_categories(self, obj):
         """Display registered categories as comma-separated list"""
-        return ', '.join(obj.registered_categories.values_list('name', flat=True))
+        return ', '.join(category.name for category in obj.registered_categories.all())
     get_registered_categories.short_description = 'Registered Categories'
 
 
 @admin.register(Quiz)
-class QuizAdmin(admin.ModelAdmin):
-    list_display = ['title', 'category', 'created_by', 'created_at', 'is_active']
+class QuizAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = [
+        'title', 'category', 'created_by', 'question_count', 'submission_count', 'average_score',
+        'created_at', 'is_active',
+    ]
     list_filter = ['is_active', 'created_at', 'category']
     search_fields = ['title', 'description']
+    list_select_related = ['category', 'created_by']
     filter_horizontal = []
-    actions = ['export_selected_quizzes']
+    actions = [
+        'export_selected_quizzes', 'export_selected_quizzes_jsonl', 'export_selected_quizzes_csv',
+        'rescore_selected_quizzes',
+    ]
+    
+    def get_queryset(self, request):
+        # Subqueries rather than joins, so the three counts don't multiply
+        return super().get_queryset(request).annotate(
+            question_count=question_count_subquery('pk'),
+            submission_count=Coalesce(_submission_stats_subquery(Count('pk'), 'total'), Value(0)),
+            average_score=_submission_stats_subquery(Avg('score'), 'average'),
+        )
+    
+    def question_count(self, obj):
+        return obj.question_count
+    question_count.short_description = 'Questions'
+    question_count.admin_order_field = 'question_count'
+    
+    def submission_count(self, obj):
+        return obj.submission_count
+    submission_count.short_description = 'Submissions'
+    submission_count.admin_order_field = 'submission_count'
+    
+    def average_score(self, obj):
+        if obj.average_score is None:
+            return '-'
+        return f'{obj.average_score:.1f}%'
+    average_score.short_description = 'Average Score'
+    average_score.admin_order_field = 'average_score'
     
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
             path('download-template/', self.admin_site.admin_view(self.download_template), name='quiz_download_template'),
             path('upload-excel/', self.admin_site.admin_view(self.upload_excel_view), name='quiz_upload_excel'),
+            path('import-jobs/<int:job_id>/', self.admin_site.admin_view(self.import_job_view), name='quiz_import_job'),
+            path('import-jobs/<int:job_id>/status/', self.admin_site.admin_view(self.import_job_status_view), name='quiz_import_job_status'),
         ]
         return custom_urls + urls
     
@@ -64,31 +143,19 @@ class QuizAdmin(admin.ModelAdmin):
             excel_file = request.FILES['excel_file']
             
             # Check file extension
-            if not excel_file.name.endswith(('.xlsx', '.xls')):
-                messages.error(request, 'Please upload a valid Excel file (.xlsx or .xls)')
+            if format_for_filename(excel_file.name) is None:
+                messages.error(request, 'Please upload a valid Excel (.xlsx or .xls), JSONL or CSV file')
                 return redirect('admin:quiz_app_quiz_changelist')
             
-            # Import quizzes
-            result = import_quizzes_from_excel(excel_file, request.user)
-            
-            if result['success']:
-                messages.success(
-                    request,
-                    f'Successfully imported {result["success_count"]} quiz(es) from Excel file!'
-                )
-            else:
-                if result['errors']:
-                    for error in result['errors']:
-                        messages.error(request, error)
-                if result['success_count'] > 0:
-                    messages.warning(
-                        request,
-                        f'Partially imported {result["success_count"]} quiz(es). Please check errors above.'
-                    )
-                else:
-                    messages.error(request, 'Failed to import quizzes. Please check the Excel file format.')
-            
-            return redirect('admin:quiz_app_quiz_changelist')
+            # Queue the import for the background worker, or run it here
+            # when there is no worker to pick it up
+            dry_run = bool(request.POST.get('dry_run'))
+            job = enqueue_import(excel_file, request.user, dry_run=dry_run)
+            if not settings.IMPORT_WORKER:
+                claimed = claim_job(job.pk)
+                if claimed is not None:
+                    run_job(claimed)
+            return redirect('admin:quiz_import_job', job_id=job.pk)
         
         # GET request - show upload form
         context = {
@@ -96,47 +163,147 @@ class QuizAdmin(admin.ModelAdmin):
             'title': 'Upload Excel File',
             'opts': self.model._meta,
             'has_view_permission': self.has_view_permission(request),
+            'import_worker': settings.IMPORT_WORKER,
         }
         return render(request, 'admin/quiz_app/quiz/upload_excel.html', context)
     
+    def import_job_view(self, request, job_id):
+        """Progress page of a queued Excel import"""
+        job = get_object_or_404(ImportJob.objects.defer('file_data'), pk=job_id)
+        context = {
+            **self.admin_site.each_context(request),
+            'title': f'Import: {job.file_name}',
+            'opts': self.model._meta,
+            'job': job,
+            'status_json': job_status(job),
+            'import_worker': settings.IMPORT_WORKER,
+        }
+        return render(request, 'admin/quiz_app/quiz/import_job.html', context)
+    
+    def import_job_status_view(self, request, job_id):
+        """Polled by the progress page"""
+        job = get_object_or_404(ImportJob.objects.defer('file_data'), pk=job_id)
+        return JsonResponse(job_status(job))
+    
     def export_selected_quizzes(self, request, queryset):
         """Export selected quizzes to Excel"""
         if not queryset.exists():
             messages.warning(request, 'Please select at least one quiz to export.')
             return
         
-        wb = export_quizzes_to_excel(queryset)
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        # Build the workbook on disk and stream it out in blocks
+        export_file = tempfile.TemporaryFile()
+        write_quizzes_excel(queryset, export_file)
+        export_file.seek(0)
+        return FileResponse(
+            export_file,
+            as_attachment=True,
+            filename=f'quizzes_export_{queryset.count()}_quizzes.xlsx',
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
         )
-        response['Content-Disposition'] = f'attachment; filename="quizzes_export_{queryset.count()}_quizzes.xlsx"'
-        wb.save(response)
-        return response
     
     export_selected_quizzes.short_description = "Export selected quizzes to Excel"
+    
+    def _export_lines(self, queryset, writer, extension, content_type):
+        # Text formats are streamed through a temporary file like the Excel export
+        export_file = tempfile.TemporaryFile()
+        text = io.TextIOWrapper(export_file, encoding='utf-8', newline='')
+        count = writer(queryset, text)
+        text.flush()
+        text.detach()
+        export_file.seek(0)
+        return FileResponse(
+            export_file,
+            as_attachment=True,
+            filename=f'quizzes_export_{count}_quizzes.{extension}',
+            content_type=content_type,
+        )
+    
+    def export_selected_quizzes_jsonl(self, request, queryset):
+        """Export selected quizzes to JSONL, one quiz per line"""
+        return self._export_lines(queryset, write_quizzes_jsonl, 'jsonl', 'application/x-ndjson')
+    
+    export_selected_quizzes_jsonl.short_description = "Export selected quizzes to JSONL"
+    
+    def export_selected_quizzes_csv(self, request, queryset):
+        """Export selected quizzes to flat CSV, one row per choice"""
+        return self._export_lines(queryset, write_quizzes_csv, 'csv', 'text/csv')
+    
+    export_selected_quizzes_csv.short_description = "Export selected quizzes to CSV"
+    
+    def rescore_selected_quizzes(self, request, queryset):
+        """Recompute scores of completed submissions for the selected quizzes"""
+        quiz_ids = list(queryset.values_list('id', flat=True))
+        result = rescore_quizzes(quiz_ids)
+        messages.success(
+            request,
+            f'Rescored {result["updated"]} submission(s) for {len(quiz_ids)} quiz(zes) '
+            f'in {result["seconds"]:.2f}s ({result["per_second"]:.0f} submissions/s).'
+        )
+    
+    rescore_selected_quizzes.short_description = "Rescore submissions of selected quizzes"
 
 
 @admin.register(Question)
-class QuestionAdmin(admin.ModelAdmin):
-    list_display = ['question_text', 'quiz', 'question_type', 'order']
+class QuestionAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ['question_text', 'quiz', 'question_type', 'order', 'choice_count']
     list_filter = ['question_type', 'quiz']
     search_fields = ['question_text']
+    list_select_related = ['quiz']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(choice_count=Count('choices'))
+    
+    def choice_count(self, obj):
+        return obj.choice_count
+    choice_count.short_description = 'Choices'
+    choice_count.admin_order_field = 'choice_count'
 
 
 @admin.register(Choice)
-class ChoiceAdmin(admin.ModelAdmin):
+class ChoiceAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ['choice_text', 'question', 'is_correct']
     list_filter = ['is_correct']
+    # Question.__str__ shows the quiz title
+    list_select_related = ['question__quiz']
+    # A <select> of every question would run Question.__str__ per option
+    raw_id_fields = ['question']
 
 
 @admin.register(QuizSubmission)
-class QuizSubmissionAdmin(admin.ModelAdmin):
-    list_display = ['quiz', 'trainee', 'started_at', 'submitted_at', 'is_completed', 'score']
+class QuizSubmissionAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ['quiz', 'trainee', 'started_at', 'deadline', 'submitted_at', 'is_completed', 'score']
     list_filter = ['is_completed', 'submitted_at']
     search_fields = ['trainee__username', 'quiz__title']
+    list_select_related = ['quiz', 'trainee']
 
 
 @admin.register(Answer)
-class AnswerAdmin(admin.ModelAdmin):
+class AnswerAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ['submission', 'question', 'selected_choice', 'answer_text']
     list_filter = ['submission__quiz']
+    # Every column's __str__ walks up to the quiz, trainee or question
+    list_select_related = [
+        'submission__quiz', 'submission__trainee', 'question__quiz', 'selected_choice__question__quiz',
+    ]
+    raw_id_fields = ['submission', 'question', 'selected_choice']
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ['file_name', 'uploaded_by', 'status', 'dry_run', 'total_rows', 'success_count', 'created_at', 'finished_at']
+    list_filter = ['status', 'dry_run', 'created_at']
+    search_fields = ['file_name', 'uploaded_by__username']
+    list_select_related = ['uploaded_by']
+    exclude = ['file_data']
+    readonly_fields = [
+        'uploaded_by', 'file_name', 'dry_run', 'status', 'attempts', 'total_rows', 'success_count',
+        'errors', 'seconds', 'created_at', 'started_at', 'finished_at',
+    ]
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('file_data')
+    
+    def has_add_permission(self, request):
+        # Jobs are created from the quiz upload page
+        return False
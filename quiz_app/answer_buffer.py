@@ -0,0 +1,188 @@
+"""
+Write-behind buffer for autosaved answers.
+
+When ``ANSWER_WRITE_BEHIND`` is enabled, autosaves are appended to a local
+SQLite file instead of the main database, and ``manage.py flush_answer_buffer``
+moves them to the Answer table in bulk on an interval. ``submit_quiz_view``
+forces a flush of the submission being graded, so no answer is lost.
+
+Crash safety:
+
+* Buffered rows survive a process crash: SQLite commits them to its WAL
+  before the autosave request returns.
+* A flush holds the buffer's write lock while it copies rows to the main
+  database and deletes them only after that transaction has committed. If
+  the flusher is killed in between, the buffer transaction rolls back and
+  the rows are written again on the next flush. The Answer upsert is
+  idempotent, so writing them twice is harmless.
+* Holding the lock for the whole flush also stops two flushers, or a new
+  autosave, from interleaving with a flush and restoring an older value.
+
+The buffer is local to one host, so every worker that serves autosaves must
+share the same ``ANSWER_BUFFER_PATH``.
+"""
+import os
+import sqlite3
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+from .autosave import AnswerRow, bulk_upsert_answers
+from .models import Answer, Question, Choice, QuizSubmission
+
+# Largest number of rows copied to the database per flush transaction
+FLUSH_BATCH_SIZE = 2000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buffered_answer (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    submission_id INTEGER NOT NULL,
+    question_id INTEGER NOT NULL,
+    selected_choice_id INTEGER,
+    answer_text TEXT NOT NULL,
+    UNIQUE (submission_id, question_id)
+)
+"""
+
+
+def is_enabled():
+    """Return True if autosaves should go through the write-behind buffer"""
+    return getattr(settings, 'ANSWER_WRITE_BEHIND', False)
+
+
+def _chunks(items, size=500):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class AnswerBuffer:
+    """SQLite-backed store of the latest unsaved answer per (submission, question)"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def add(self, submission_id, rows):
+        """Buffer answers for a submission, replacing older unsaved values"""
+        if not rows:
+            return 0
+        conn = self._connection()
+        # REPLACE keeps only the newest unsaved answer per question. While a
+        # flush holds the write lock this waits on the busy timeout, so it
+        # never lands between a flush's copy and its delete.
+        with conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO buffered_answer '
+                '(submission_id, question_id, selected_choice_id, answer_text) VALUES (?, ?, ?, ?)',
+                [(submission_id, row.question_id, row.selected_choice_id, row.answer_text) for row in rows],
+            )
+        return len(rows)
+
+    def pending(self, submission_id):
+        """Return unsaved answers of a submission keyed by question id"""
+        cursor = self._connection().execute(
+            'SELECT question_id, selected_choice_id, answer_text FROM buffered_answer WHERE submission_id = ?',
+            (submission_id,),
+        )
+        return {question_id: AnswerRow(question_id, choice_id, text) for question_id, choice_id, text in cursor}
+
+    def size(self):
+        """Number of buffered answers waiting to be flushed"""
+        return self._connection().execute('SELECT COUNT(*) FROM buffered_answer').fetchone()[0]
+
+    def flush(self, submission_id=None, batch_size=FLUSH_BATCH_SIZE):
+        """
+        Copy buffered answers to the Answer table, optionally for one
+        submission only. Returns the number of buffered rows processed.
+        """
+        flushed = 0
+        while True:
+            count = self._flush_batch(submission_id, batch_size)
+            flushed += count
+            if count < batch_size:
+                return flushed
+
+    def _flush_batch(self, submission_id, batch_size):
+        conn = self._connection()
+        # BEGIN IMMEDIATE takes the buffer's write lock up front; autosaves
+        # wait on the busy timeout until this batch is done.
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            query = 'SELECT id, submission_id, question_id, selected_choice_id, answer_text FROM buffered_answer'
+            params = []
+            if submission_id is not None:
+                query += ' WHERE submission_id = ?'
+                params.append(submission_id)
+            query += ' ORDER BY id LIMIT ?'
+            params.append(batch_size)
+            buffered = conn.execute(query, params).fetchall()
+            if not buffered:
+                conn.execute('COMMIT')
+                return 0
+
+            self._write_to_database(buffered)
+
+            for chunk in _chunks([row[0] for row in buffered]):
+                conn.execute(
+                    f'DELETE FROM buffered_answer WHERE id IN ({", ".join("?" * len(chunk))})',
+                    chunk,
+                )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return len(buffered)
+
+    def _write_to_database(self, buffered):
+        submission_ids = {row[1] for row in buffered}
+        question_ids = {row[2] for row in buffered}
+        choice_ids = {row[3] for row in buffered if row[3] is not None}
+
+        # Rows for submissions that were graded or deleted, or for questions
+        # and choices removed since the autosave, are dropped.
+        open_submissions = set(
+            QuizSubmission.objects.filter(pk__in=submission_ids, is_completed=False).values_list('pk', flat=True)
+        )
+        questions = set(Question.objects.filter(pk__in=question_ids).values_list('pk', flat=True))
+        choices = set(Choice.objects.filter(pk__in=choice_ids).values_list('pk', flat=True))
+
+        answers = [
+            Answer(
+                submission_id=sub_id,
+                question_id=question_id,
+                selected_choice_id=choice_id,
+                answer_text=answer_text,
+            )
+            for _, sub_id, question_id, choice_id, answer_text in buffered
+            if sub_id in open_submissions
+            and question_id in questions
+            and (choice_id is None or choice_id in choices)
+        ]
+        with transaction.atomic():
+            bulk_upsert_answers(answers)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Return the process-wide answer buffer configured in settings"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None or _buffer.path != str(settings.ANSWER_BUFFER_PATH):
+            _buffer = AnswerBuffer(settings.ANSWER_BUFFER_PATH)
+        return _buffer
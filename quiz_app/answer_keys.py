@@ -0,0 +1,93 @@
+"""
+Precompiled answer keys.
+
+An answer key is the compact form of a quiz's correct answers that grading
+needs: the number of questions and the ids of the correct choices of its
+multiple choice questions. Choice ids are unique across quizzes, so a
+selected choice is correct exactly when its id is in the key, and scoring a
+submission is one set intersection over its selected choice ids.
+
+Keys are cached under the quiz's snapshot version (see ``quiz_app.snapshots``),
+which the signals on Quiz, Question and Choice bump, so an edited answer is
+picked up by the next key built on demand.
+"""
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import Choice, Question
+from .snapshots import SNAPSHOT_TIMEOUT, get_snapshot_version
+
+# Bump when the key layout changes so old cache entries are ignored
+ANSWER_KEY_FORMAT = 1
+
+# One question of a results page: the trainee's answer (or None), the choice
+# it selected (or None), whether that choice is correct, and the correct choices
+ReviewItem = namedtuple('ReviewItem', ['question', 'answer', 'selected_choice', 'is_correct', 'correct_choices'])
+
+
+class AnswerKey(namedtuple('AnswerKey', ['quiz_id', 'question_count', 'correct_choice_ids'])):
+    __slots__ = ()
+
+    def is_correct(self, choice_id):
+        return choice_id in self.correct_choice_ids
+
+    def correct_count(self, selected_choice_ids):
+        """Number of correct choices among a submission's selected choices"""
+        return len(self.correct_choice_ids.intersection(selected_choice_ids))
+
+    def score(self, selected_choice_ids):
+        """Percentage score of a submission; quizzes without questions score 0"""
+        if not self.question_count:
+            return 0.0
+        return self.correct_count(selected_choice_ids) * 100.0 / self.question_count
+
+
+def _answer_key_key(quiz_id, version):
+    return f'answer_key:{ANSWER_KEY_FORMAT}:{quiz_id}:{version}'
+
+
+def build_answer_key(quiz_id):
+    """Build an answer key straight from the database"""
+    # From the primary: a lagging replica must not end up in the cache
+    question_count = Question.objects.using(DEFAULT_DB_ALIAS).filter(quiz_id=quiz_id).count()
+    correct_choice_ids = Choice.objects.using(DEFAULT_DB_ALIAS).filter(
+        question__quiz_id=quiz_id,
+        question__question_type='multiple_choice',
+        is_correct=True,
+    ).values_list('pk', flat=True)
+    return AnswerKey(quiz_id, question_count, frozenset(correct_choice_ids))
+
+
+def get_answer_key(quiz_id):
+    """Return the cached answer key of a quiz, building it on a cache miss"""
+    key = _answer_key_key(quiz_id, get_snapshot_version(quiz_id))
+    answer_key = cache.get(key)
+    if answer_key is None:
+        answer_key = build_answer_key(quiz_id)
+        cache.set(key, answer_key, SNAPSHOT_TIMEOUT)
+    return answer_key
+
+
+async def aget_answer_key(quiz_id):
+    """Async version of ``get_answer_key``"""
+    return await sync_to_async(get_answer_key)(quiz_id)
+
+
+def review_answers(quiz, answer_key, answers):
+    """``ReviewItem`` for each question of a quiz snapshot, in order"""
+    answers_by_question = {answer.question_id: answer for answer in answers}
+    review = []
+    for question in quiz.questions:
+        answer = answers_by_question.get(question.id)
+        selected_choice_id = answer.selected_choice_id if answer else None
+        review.append(ReviewItem(
+            question=question,
+            answer=answer,
+            selected_choice=next((c for c in question.choices if c.id == selected_choice_id), None),
+            is_correct=answer_key.is_correct(selected_choice_id),
+            correct_choices=[c for c in question.choices if answer_key.is_correct(c.id)],
+        ))
+    return review
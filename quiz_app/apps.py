@@ -5,3 +5,10 @@ class QuizAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'quiz_app'
 
+    def ready(self):
+        # Register cache invalidation signal handlers
+        from . import signals  # noqa: F401
+        # Start counting database connections before the first request
+        from . import metrics  # noqa: F401
+        # Cache system checks
+        from . import checks  # noqa: F401
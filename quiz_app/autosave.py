@@ -0,0 +1,141 @@
+"""
+Answer autosave helpers shared by the single and batched autosave endpoints.
+
+Incoming answers are validated against the cached quiz snapshot, so no query
+is needed to look up questions or choices, and all rows are then written
+with one upserting ``bulk_create``. The ``a``-prefixed functions are the
+async versions used by the async autosave view.
+"""
+from asgiref.sync import sync_to_async
+from django.db import connections, router
+
+from .models import Answer
+
+# Upper bound on items accepted in one batched autosave request
+MAX_BATCH_ITEMS = 1000
+
+
+class AnswerRow:
+    """A validated answer ready to be written for one question"""
+    __slots__ = ('question_id', 'selected_choice_id', 'answer_text')
+
+    def __init__(self, question_id, selected_choice_id, answer_text):
+        self.question_id = question_id
+        self.selected_choice_id = selected_choice_id
+        self.answer_text = answer_text
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def validate_answer_items(quiz, items):
+    """
+    Validate raw ``{question_id, choice_id | answer_text}`` items against a
+    quiz snapshot.
+
+    Returns ``(rows, errors)``. Later items for the same question replace
+    earlier ones, so ``rows`` holds at most one row per question. Multiple
+    choice items without a choice are ignored, as in the single-answer view.
+    """
+    questions = {question.id: question for question in quiz.questions}
+    rows = {}
+    errors = []
+
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'error': 'Invalid item'})
+            continue
+
+        question = questions.get(_to_int(item.get('question_id')))
+        if question is None:
+            errors.append({'index': index, 'error': 'Question not found in this quiz'})
+            continue
+
+        if question.question_type == 'multiple_choice':
+            if not item.get('choice_id'):
+                continue
+            choice_id = _to_int(item.get('choice_id'))
+            choice = next((c for c in question.choices if c.id == choice_id), None)
+            if choice is None:
+                errors.append({'index': index, 'error': 'Choice not found for this question'})
+                continue
+            rows[question.id] = AnswerRow(question.id, choice.id, choice.choice_text)
+        else:
+            answer_text = item.get('answer_text') or ''
+            if not isinstance(answer_text, str):
+                errors.append({'index': index, 'error': 'Invalid answer text'})
+                continue
+            rows[question.id] = AnswerRow(question.id, None, answer_text)
+
+    return list(rows.values()), errors
+
+
+def _upsert_options():
+    options = {
+        'update_conflicts': True,
+        'update_fields': ['selected_choice', 'answer_text'],
+    }
+    connection = connections[router.db_for_write(Answer)]
+    if connection.features.supports_update_conflicts_with_target:
+        # MySQL infers the conflict target and rejects an explicit one
+        options['unique_fields'] = ['submission', 'question']
+    return options
+
+
+def bulk_upsert_answers(answers):
+    """Insert or update Answer instances, keyed on (submission, question), in bulk"""
+    if not answers:
+        return 0
+    Answer.objects.bulk_create(answers, **_upsert_options())
+    return len(answers)
+
+
+async def abulk_upsert_answers(answers):
+    """Async version of ``bulk_upsert_answers``"""
+    if not answers:
+        return 0
+    await Answer.objects.abulk_create(answers, **_upsert_options())
+    return len(answers)
+
+
+def _answer_objects(submission_id, rows):
+    return [
+        Answer(
+            submission_id=submission_id,
+            question_id=row.question_id,
+            selected_choice_id=row.selected_choice_id,
+            answer_text=row.answer_text,
+        )
+        for row in rows
+    ]
+
+
+def save_answers(submission_id, rows):
+    """Insert or update the Answer rows of a submission in a single statement"""
+    return bulk_upsert_answers(_answer_objects(submission_id, rows))
+
+
+def store_answers(submission_id, rows):
+    """
+    Persist autosaved answers: through the write-behind buffer when it is
+    enabled, otherwise straight to the Answer table.
+    """
+    from . import answer_buffer
+
+    if answer_buffer.is_enabled():
+        return answer_buffer.get_buffer().add(submission_id, rows)
+    return save_answers(submission_id, rows)
+
+
+async def astore_answers(submission_id, rows):
+    """Async version of ``store_answers``"""
+    from . import answer_buffer
+
+    if answer_buffer.is_enabled():
+        # The buffer is a local SQLite file with blocking calls
+        return await sync_to_async(answer_buffer.get_buffer().add)(submission_id, rows)
+    return await abulk_upsert_answers(_answer_objects(submission_id, rows))
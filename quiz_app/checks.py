@@ -0,0 +1,69 @@
+"""
+System checks for the cache setup, and the guard that keeps cache-invalidating
+commands off a process-local cache. The errors run with every management
+command outside DEBUG; the warning runs with ``python manage.py check --deploy``.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+from django.core.management.base import CommandError
+
+LOCMEM_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+PROCESS_LOCAL_CACHES = (
+    LOCMEM_CACHE,
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Invalidation and cached sessions only work if every process shares the cache"""
+    if settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        'The default cache is private to each process.',
+        hint=(
+            'Quiz, access and leaderboard invalidations from one gunicorn worker or the import '
+            'worker do not reach the others. Set CACHE_BACKEND to redis, memcached or file.'
+        ),
+        id='quiz_app.W001',
+    )]
+
+
+@register(Tags.caches)
+def check_locmem_in_production(app_configs, **kwargs):
+    """The locmem cache is only safe for a single process, and not for sessions"""
+    if settings.DEBUG or settings.CACHES['default']['BACKEND'] != LOCMEM_CACHE:
+        return []
+    errors = []
+    if settings.SESSION_ENGINE == 'django.contrib.sessions.backends.cached_db':
+        errors.append(Error(
+            'Sessions are cached in the locmem cache, which is private to each process.',
+            hint=(
+                'A logout or password change in one process leaves the session valid in the others. '
+                'Set SESSION_BACKEND=db, or CACHE_BACKEND to redis, memcached or file.'
+            ),
+            id='quiz_app.E001',
+        ))
+    if settings.WEB_CONCURRENCY > 1:
+        errors.append(Error(
+            f'WEB_CONCURRENCY is {settings.WEB_CONCURRENCY}, but the locmem cache is private to each worker.',
+            hint=(
+                'Edits, imports and scores saved through one worker do not clear the cached copies in the '
+                'others. Set CACHE_BACKEND to redis, memcached or file, or run a single worker.'
+            ),
+            id='quiz_app.E002',
+        ))
+    return errors
+
+
+def require_shared_cache(command):
+    """
+    Refuse to run ``command`` against the locmem cache. Its invalidations
+    would only clear this process's cache, leaving the web workers serving
+    stale quizzes, answer keys and leaderboards until their entries expire.
+    """
+    if settings.CACHES['default']['BACKEND'] == LOCMEM_CACHE:
+        raise CommandError(
+            f'{command} changes cached data, but the locmem cache is private to this process. '
+            'Set CACHE_BACKEND to file, memcached or redis for the web server and this command.'
+        )
@@ -0,0 +1,153 @@
+"""
+MySQL backend with a small per-process connection pool.
+
+Use with ``CONN_MAX_AGE = 0``: Django then "closes" the connection at the end
+of every request, and this backend puts it back in the pool instead. The next
+request, in any thread of the worker, takes it over rather than opening a new
+TCP connection and authenticating to RDS again.
+
+Pool options go in the database's ``POOL`` setting:
+
+* ``MAX_IDLE``: connections kept open while idle (default 4); extra ones
+  returned by a burst of threads are closed;
+* ``MAX_LIFETIME``: seconds before a connection is recycled (default 1800),
+  kept below MySQL's ``wait_timeout``;
+* ``PING_AFTER``: a connection idle this many seconds is pinged before reuse
+  (default 30), and dropped if the ping fails.
+
+A connection closed inside a transaction, after a database error, or with
+autocommit turned off is closed for real rather than pooled.
+"""
+import os
+import threading
+import time
+
+from django.db.backends.mysql import base as mysql_base
+
+Database = mysql_base.Database
+
+
+class ConnectionPool:
+    """LIFO stack of idle DB-API connections shared by the threads of a process"""
+
+    def __init__(self, max_idle=4, max_lifetime=1800, ping_after=30):
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.pid = os.getpid()
+        self._idle = []
+        self._lock = threading.Lock()
+        self.counters = {'created': 0, 'reused': 0, 'returned': 0, 'discarded': 0, 'expired': 0, 'broken': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Database.Error:
+            pass
+
+    def acquire(self, connect):
+        """Return ``(raw_connection, created_at)``, reusing an idle one if possible"""
+        while True:
+            with self._lock:
+                if self.pid != os.getpid():
+                    # Forked worker: the parent's sockets aren't ours to use
+                    self._idle = []
+                    self.pid = os.getpid()
+                item = self._idle.pop() if self._idle else None
+            if item is None:
+                break
+
+            raw, created_at, returned_at = item
+            now = time.monotonic()
+            if now - created_at >= self.max_lifetime:
+                self._close_quietly(raw)
+                self._count('expired')
+                continue
+            if now - returned_at >= self.ping_after:
+                try:
+                    raw.ping()
+                except Database.Error:
+                    self._close_quietly(raw)
+                    self._count('broken')
+                    continue
+            self._count('reused')
+            return raw, created_at
+
+        raw = connect()
+        self._count('created')
+        return raw, time.monotonic()
+
+    def release(self, raw, created_at):
+        """Keep a healthy connection for the next request, or close it"""
+        now = time.monotonic()
+        if now - created_at >= self.max_lifetime:
+            self._close_quietly(raw)
+            self._count('expired')
+            return
+        with self._lock:
+            if len(self._idle) < self.max_idle and self.pid == os.getpid():
+                self._idle.append((raw, created_at, now))
+                self.counters['returned'] += 1
+                return
+            self.counters['discarded'] += 1
+        self._close_quietly(raw)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            idle = len(self._idle)
+        checkouts = counters['created'] + counters['reused']
+        return {
+            **counters,
+            'idle': idle,
+            'max_idle': self.max_idle,
+            'reuse_rate': round(counters['reused'] / checkouts, 3) if checkouts else None,
+        }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, options):
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = ConnectionPool(
+                max_idle=options.get('MAX_IDLE', 4),
+                max_lifetime=options.get('MAX_LIFETIME', 1800),
+                ping_after=options.get('PING_AFTER', 30),
+            )
+        return pool
+
+
+class DatabaseWrapper(mysql_base.DatabaseWrapper):
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict.get('POOL', {}))
+
+    def get_new_connection(self, conn_params):
+        connect = super().get_new_connection
+        raw, self._pool_created_at = self.pool.acquire(lambda: connect(conn_params))
+        return raw
+
+    def _close(self):
+        if self.connection is None:
+            return
+        reusable = (
+            not self.in_atomic_block
+            and not self.errors_occurred
+            and self.get_autocommit() == self.settings_dict['AUTOCOMMIT']
+        )
+        if not reusable:
+            return super()._close()
+        self.pool.release(self.connection, self._pool_created_at)
+
+    def pool_stats(self):
+        """Counters of this process's pool, shown at /manage/metrics/"""
+        return self.pool.stats()
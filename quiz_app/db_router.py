@@ -0,0 +1,140 @@
+"""
+Read replicas for the read-heavy pages.
+
+Views wrapped with ``@use_replica`` (quiz list, results, leaderboard, the
+user directory) and the admin changelists read from a replica listed in
+``settings.DATABASE_REPLICAS``; everything else, every write and every read
+inside a transaction uses the primary (``default``).
+
+Read-your-writes: a request that writes to the primary sets a short-lived
+cookie, and while it is present that browser's requests read from the
+primary too, so a trainee sees their own submission straight away even if
+the replica lags. ``PrimaryPinMiddleware`` manages the cookie and must sit
+above the session middleware, whose saves count as writes.
+
+Code that fills a shared cache from the database reads the primary
+explicitly, so replica lag can't be cached for everyone.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.template.response import SimpleTemplateResponse
+
+PIN_COOKIE = 'primary_pin'
+
+_request_state = ContextVar('replica_request_state', default=None)
+
+
+class _RequestState:
+    __slots__ = ('pinned', 'wrote', 'replica_ok')
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica_ok = False
+
+
+@contextmanager
+def replica_reads(request):
+    """Let reads inside the block go to a replica, for GET/HEAD requests only"""
+    state = _request_state.get()
+    if state is None or request.method not in ('GET', 'HEAD'):
+        yield
+        return
+    previous = state.replica_ok
+    state.replica_ok = True
+    try:
+        yield
+    finally:
+        state.replica_ok = previous
+
+
+def use_replica(view):
+    """View decorator: serve the page from a read replica"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads(request):
+            response = view(request, *args, **kwargs)
+            # Lazy template responses would otherwise query after the block
+            if isinstance(response, SimpleTemplateResponse) and not response.is_rendered:
+                response.render()
+            return response
+    return wrapper
+
+
+class ReplicaRouter:
+    """Route reads of replica-enabled requests to a random replica"""
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if state is None or not state.replica_ok or state.pinned or state.wrote:
+            return None
+        if model._meta.app_label == 'sessions':
+            # A session created moments ago may not have reached the replica
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related lookups follow the object they start from
+            return instance._state.db
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryPinMiddleware:
+    """Keep a browser on the primary for a few seconds after it wrote"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = _RequestState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self._pin(state, response)
+
+    async def __acall__(self, request):
+        # Worker threads running the ORM get a copy of this context, and
+        # with it the same state object
+        state = _RequestState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self._pin(state, response)
+
+    def _pin(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+                secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
@@ -0,0 +1,38 @@
+"""
+View decorators for the async trainee endpoints.
+
+Django 4.2's ``login_required`` and ``require_http_methods`` only wrap
+synchronous views, so the async views use these instead.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponseNotAllowed
+from django.utils.log import log_response
+
+
+def async_login_required(view):
+    """``login_required`` for an async view"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        # Loading the session and user queries, so it runs off the event loop
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def async_require_POST(view):
+    """``require_POST`` for an async view"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            response = HttpResponseNotAllowed(['POST'])
+            log_response(
+                'Method Not Allowed (%s): %s', request.method, request.path,
+                response=response, request=request,
+            )
+            return response
+        return await view(request, *args, **kwargs)
+    return wrapper
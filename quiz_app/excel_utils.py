@@ -1,38 +1,124 @@
 """
 Excel import/export utilities for Quiz bulk operations
 """
+import time
+
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment
 from openpyxl.utils import get_column_letter
-from django.http import HttpResponse
 from django.contrib.auth.models import User
-from .models import Quiz, Question, Choice
+from django.db.models import Max, Prefetch
+from django.db.models.functions import Length
+from .models import Question, Choice
+from .importing import (
+    QuizRow, QuestionRow, ChoiceRow, cell_text, parse_bool, parse_int, parse_question_type, run_import,
+)
 
+QUIZ_HEADERS = ['Quiz Title', 'Description', 'Created By', 'Is Active', 'Created At']
+QUESTION_HEADERS = ['Quiz Title', 'Question Text', 'Question Type', 'Order', 'Time Limit (minutes)']
+CHOICE_HEADERS = ['Quiz Title', 'Question Text', 'Choice Text', 'Is Correct']
 
-def export_quizzes_to_excel(queryset):
-    """Export quizzes with questions and choices to Excel format"""
-    wb = openpyxl.Workbook()
-    
-    # Remove default sheet
-    wb.remove(wb.active)
-    
-    # Create Quiz sheet
-    quiz_sheet = wb.create_sheet("Quizzes")
-    quiz_headers = ['Quiz Title', 'Description', 'Created By', 'Is Active', 'Created At']
-    quiz_sheet.append(quiz_headers)
-    
-    # Style headers
+
+def _styled_header_row(sheet, headers):
+    """Header cells for a write-only sheet: white bold text on blue, centred"""
     header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
     header_font = Font(bold=True, color="FFFFFF")
-    
-    for col_num, header in enumerate(quiz_headers, 1):
-        cell = quiz_sheet.cell(row=1, column=col_num)
+    row = []
+    for header in headers:
+        cell = WriteOnlyCell(sheet, value=header)
         cell.fill = header_fill
         cell.font = header_font
         cell.alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Add quiz data
-    for quiz in queryset:
+        row.append(cell)
+    return row
+
+
+def _set_column_widths(sheet, widths, max_width):
+    for col_num, width in enumerate(widths, 1):
+        sheet.column_dimensions[get_column_letter(col_num)].width = min(width + 2, max_width)
+
+
+def _column_widths(queryset):
+    """
+    Widest value of every exported column, computed with one aggregate query
+    per sheet. Write-only sheets need their widths before the first row is
+    written, so they can't be measured while streaming rows out.
+    """
+    quiz_lengths = queryset.aggregate(
+        title=Max(Length('title')),
+        description=Max(Length('description')),
+        created_by=Max(Length('created_by__username')),
+    )
+    questions = Question.objects.filter(quiz__in=queryset)
+    question_lengths = questions.aggregate(
+        text=Max(Length('question_text')),
+        order=Max('order'),
+        time_limit=Max('time_limit_minutes'),
+    )
+    choice_text = Choice.objects.filter(
+        question__quiz__in=queryset, question__question_type='multiple_choice'
+    ).aggregate(text=Max(Length('choice_text')))['text']
+
+    def width(header, *lengths):
+        return max([len(header)] + [length or 0 for length in lengths])
+
+    title = quiz_lengths['title']
+    question_text = question_lengths['text']
+    return {
+        'quizzes': [
+            width(QUIZ_HEADERS[0], title),
+            width(QUIZ_HEADERS[1], quiz_lengths['description']),
+            width(QUIZ_HEADERS[2], quiz_lengths['created_by']),
+            width(QUIZ_HEADERS[3], 3),
+            width(QUIZ_HEADERS[4], 19),
+        ],
+        'questions': [
+            width(QUESTION_HEADERS[0], title),
+            width(QUESTION_HEADERS[1], question_text),
+            width(QUESTION_HEADERS[2], max(len(label) for _, label in Question.QUESTION_TYPES)),
+            width(QUESTION_HEADERS[3], len(str(question_lengths['order'] or 0))),
+            width(QUESTION_HEADERS[4], len(str(question_lengths['time_limit'] or 0))),
+        ],
+        'choices': [
+            width(CHOICE_HEADERS[0], title),
+            width(CHOICE_HEADERS[1], question_text),
+            width(CHOICE_HEADERS[2], choice_text),
+            width(CHOICE_HEADERS[3], 3),
+        ],
+    }
+
+
+def write_quizzes_excel(queryset, fileobj, chunk_size=50):
+    """
+    Stream quizzes with questions and choices into an .xlsx file object.
+
+    Uses openpyxl's write-only workbook, so rows are written to disk as they
+    are produced instead of being held in memory. Quizzes are read in chunks
+    of ``chunk_size`` with their questions and choices prefetched, which
+    keeps the export to a few queries per chunk. The sheet layout is the one
+    ``import_quizzes_from_excel`` reads back.
+    """
+    widths = _column_widths(queryset)
+
+    wb = openpyxl.Workbook(write_only=True)
+    quiz_sheet = wb.create_sheet("Quizzes")
+    question_sheet = wb.create_sheet("Questions")
+    choice_sheet = wb.create_sheet("Choices")
+
+    _set_column_widths(quiz_sheet, widths['quizzes'], 50)
+    _set_column_widths(question_sheet, widths['questions'], 80)
+    _set_column_widths(choice_sheet, widths['choices'], 80)
+
+    quiz_sheet.append(_styled_header_row(quiz_sheet, QUIZ_HEADERS))
+    question_sheet.append(_styled_header_row(question_sheet, QUESTION_HEADERS))
+    choice_sheet.append(_styled_header_row(choice_sheet, CHOICE_HEADERS))
+
+    quizzes = queryset.select_related('created_by').prefetch_related(
+        Prefetch('questions', queryset=Question.objects.order_by('order', 'id')),
+        Prefetch('questions__choices', queryset=Choice.objects.order_by('id')),
+    )
+    for quiz in quizzes.iterator(chunk_size=chunk_size):
         quiz_sheet.append([
             quiz.title,
             quiz.description,
@@ -40,35 +126,7 @@ def export_quizzes_to_excel(queryset):
             'Yes' if quiz.is_active else 'No',
             quiz.created_at.strftime('%Y-%m-%d %H:%M:%S') if quiz.created_at else ''
         ])
-    
-    # Auto-adjust column widths for Quiz sheet
-    for col in quiz_sheet.columns:
-        max_length = 0
-        col_letter = get_column_letter(col[0].column)
-        for cell in col:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        quiz_sheet.column_dimensions[col_letter].width = adjusted_width
-    
-    # Create Questions sheet
-    question_sheet = wb.create_sheet("Questions")
-    question_headers = ['Quiz Title', 'Question Text', 'Question Type', 'Order', 'Time Limit (minutes)']
-    question_sheet.append(question_headers)
-    
-    # Style question headers
-    for col_num, header in enumerate(question_headers, 1):
-        cell = question_sheet.cell(row=1, column=col_num)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Add questions data
-    for quiz in queryset:
-        for question in quiz.questions.all().order_by('order'):
+        for question in quiz.questions.all():
             question_sheet.append([
                 quiz.title,
                 question.question_text,
@@ -76,35 +134,8 @@ def export_quizzes_to_excel(queryset):
                 question.order,
                 question.time_limit_minutes
             ])
-    
-    # Auto-adjust column widths for Questions sheet
-    for col in question_sheet.columns:
-        max_length = 0
-        col_letter = get_column_letter(col[0].column)
-        for cell in col:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 80)
-        question_sheet.column_dimensions[col_letter].width = adjusted_width
-    
-    # Create Choices sheet
-    choice_sheet = wb.create_sheet("Choices")
-    choice_headers = ['Quiz Title', 'Question Text', 'Choice Text', 'Is Correct']
-    choice_sheet.append(choice_headers)
-    
-    # Style choice headers
-    for col_num, header in enumerate(choice_headers, 1):
-        cell = choice_sheet.cell(row=1, column=col_num)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Add choices data
-    for quiz in queryset:
-        for question in quiz.questions.filter(question_type='multiple_choice').order_by('order'):
+            if question.question_type != 'multiple_choice':
+                continue
             for choice in question.choices.all():
                 choice_sheet.append([
                     quiz.title,
@@ -112,21 +143,8 @@ def export_quizzes_to_excel(queryset):
                     choice.choice_text,
                     'Yes' if choice.is_correct else 'No'
                 ])
-    
-    # Auto-adjust column widths for Choices sheet
-    for col in choice_sheet.columns:
-        max_length = 0
-        col_letter = get_column_letter(col[0].column)
-        for cell in col:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 80)
-        choice_sheet.column_dimensions[col_letter].width = adjusted_width
-    
-    return wb
+
+    wb.save(fileobj)
 
 
 def create_excel_template():
@@ -289,170 +307,95 @@ def create_excel_template():
     return wb
 
 
-def import_quizzes_from_excel(excel_file, created_by_user):
-    """Import quizzes, questions, and choices from Excel file"""
-    errors = []
-    success_count = 0
-    
-    try:
-        wb = openpyxl.load_workbook(excel_file, data_only=True)
-    except Exception as e:
-        return {'success': False, 'errors': [f'Error reading Excel file: {str(e)}'], 'success_count': 0}
-    
-    # Get default user if created_by_user is not provided
-    if not created_by_user:
-        try:
-            created_by_user = User.objects.get(username='admin')
-        except User.DoesNotExist:
-            return {'success': False, 'errors': ['Default admin user not found. Please specify created_by_user.'], 'success_count': 0}
-    
-    # Import Quizzes
-    if 'Quizzes' not in wb.sheetnames:
-        return {'success': False, 'errors': ['Excel file must contain a "Quizzes" sheet'], 'success_count': 0}
-    
-    quiz_sheet = wb['Quizzes']
-    quizzes_data = {}
-    
-    for row_idx, row in enumerate(quiz_sheet.iter_rows(min_row=2, values_only=True), start=2):
-        if not row[0] or not str(row[0]).strip():  # Skip empty rows
+def _sheet_rows(sheet, width):
+    """Yield (row number, padded values) for non-empty data rows of a sheet"""
+    for row_idx, row in enumerate(sheet.iter_rows(min_row=2, max_col=width, values_only=True), start=2):
+        row = tuple(row) + (None,) * (width - len(row))
+        if not cell_text(row[0]):  # Skip empty rows
             continue
-        
-        quiz_title = str(row[0]).strip()
-        description = str(row[1]).strip() if row[1] else ''
-        
-        # Get or create user for created_by
-        created_by_username = str(row[2]).strip() if row[2] else 'admin'
-        try:
-            created_by = User.objects.get(username=created_by_username)
-        except User.DoesNotExist:
-            created_by = created_by_user
-            errors.append(f'Row {row_idx}: User "{created_by_username}" not found, using "{created_by_user.username}"')
-        
-        is_active_str = str(row[3]).strip().lower() if row[3] else 'yes'
-        is_active = is_active_str in ['yes', 'y', 'true', '1']
-        
-        # Create or get quiz
-        quiz, created = Quiz.objects.get_or_create(
-            title=quiz_title,
-            defaults={
-                'description': description,
-                'created_by': created_by,
-                'is_active': is_active
-            }
+        yield row_idx, row
+
+
+def parse_quiz_workbook(wb):
+    """
+    Read the Quizzes, Questions and Choices sheets of a workbook into import
+    rows. Returns ``(quiz_rows, question_rows, choice_rows, errors)``.
+    """
+    errors = []
+    quiz_rows = [
+        QuizRow(
+            label=f'Row {row_idx}',
+            title=cell_text(row[0]),
+            description=cell_text(row[1]),
+            created_by=cell_text(row[2]) or 'admin',
+            is_active=parse_bool(row[3], True),
         )
-        if not created:
-            quiz.description = description
-            quiz.is_active = is_active
-            quiz.save()
-        
-        quizzes_data[quiz_title] = quiz
-    
-    # Import Questions
+        for row_idx, row in _sheet_rows(wb['Quizzes'], len(QUIZ_HEADERS))
+    ]
+
+    question_rows = []
     if 'Questions' not in wb.sheetnames:
         errors.append('Excel file should contain a "Questions" sheet')
     else:
-        question_sheet = wb['Questions']
-        
-        for row_idx, row in enumerate(question_sheet.iter_rows(min_row=2, values_only=True), start=2):
-            if not row[0] or not str(row[0]).strip():  # Skip empty rows
-                continue
-            
-            quiz_title = str(row[0]).strip()
-            if quiz_title not in quizzes_data:
-                errors.append(f'Questions sheet, Row {row_idx}: Quiz "{quiz_title}" not found in Quizzes sheet')
-                continue
-            
-            quiz = quizzes_data[quiz_title]
-            question_text = str(row[1]).strip() if row[1] else ''
-            
-            if not question_text:
-                errors.append(f'Questions sheet, Row {row_idx}: Question text is required')
-                continue
-            
-            question_type_str = str(row[2]).strip() if row[2] else 'Multiple Choice'
-            question_type_map = {
-                'multiple choice': 'multiple_choice',
-                'text answer': 'text',
-                'text': 'text',
-            }
-            question_type = question_type_map.get(question_type_str.lower(), 'multiple_choice')
-            
-            try:
-                order = int(row[3]) if row[3] else 0
-            except (ValueError, TypeError):
-                order = 0
-            
-            try:
-                time_limit = int(row[4]) if row[4] else 1
-            except (ValueError, TypeError):
-                time_limit = 1
-            
-            # Create question
-            question, created = Question.objects.get_or_create(
-                quiz=quiz,
-                question_text=question_text,
-                defaults={
-                    'question_type': question_type,
-                    'order': order,
-                    'time_limit_minutes': time_limit
-                }
+        question_rows = [
+            QuestionRow(
+                label=f'Questions sheet, Row {row_idx}',
+                quiz_title=cell_text(row[0]),
+                question_text=cell_text(row[1]),
+                question_type=parse_question_type(row[2]),
+                order=parse_int(row[3], 0),
+                time_limit=parse_int(row[4], 1),
             )
-            if not created:
-                question.question_type = question_type
-                question.order = order
-                question.time_limit_minutes = time_limit
-                question.save()
-    
-    # Import Choices
+            for row_idx, row in _sheet_rows(wb['Questions'], len(QUESTION_HEADERS))
+        ]
+
+    choice_rows = []
     if 'Choices' in wb.sheetnames:
-        choice_sheet = wb['Choices']
-        
-        for row_idx, row in enumerate(choice_sheet.iter_rows(min_row=2, values_only=True), start=2):
-            if not row[0] or not str(row[0]).strip():  # Skip empty rows
-                continue
-            
-            quiz_title = str(row[0]).strip()
-            if quiz_title not in quizzes_data:
-                continue  # Already logged error in Questions import
-            
-            question_text = str(row[1]).strip() if row[1] else ''
-            if not question_text:
-                continue
-            
-            # Find the question
-            quiz = quizzes_data[quiz_title]
-            try:
-                question = Question.objects.get(quiz=quiz, question_text=question_text)
-            except Question.DoesNotExist:
-                errors.append(f'Choices sheet, Row {row_idx}: Question "{question_text}" not found for quiz "{quiz_title}"')
-                continue
-            except Question.MultipleObjectsReturned:
-                question = Question.objects.filter(quiz=quiz, question_text=question_text).first()
-                errors.append(f'Choices sheet, Row {row_idx}: Multiple questions found, using first one')
-            
-            # Only add choices for multiple choice questions
-            if question.question_type != 'multiple_choice':
-                continue
-            
-            choice_text = str(row[2]).strip() if row[2] else ''
-            if not choice_text:
-                continue
-            
-            is_correct_str = str(row[3]).strip().lower() if row[3] else 'no'
-            is_correct = is_correct_str in ['yes', 'y', 'true', '1']
-            
-            # Create choice
-            Choice.objects.get_or_create(
-                question=question,
-                choice_text=choice_text,
-                defaults={'is_correct': is_correct}
+        choice_rows = [
+            ChoiceRow(
+                label=f'Choices sheet, Row {row_idx}',
+                quiz_title=cell_text(row[0]),
+                question_text=cell_text(row[1]),
+                choice_text=cell_text(row[2]),
+                is_correct=parse_bool(row[3], False),
             )
-    
-    success_count = len(quizzes_data)
-    
-    return {
-        'success': len(errors) == 0,
-        'errors': errors,
-        'success_count': success_count
-    }
+            for row_idx, row in _sheet_rows(wb['Choices'], len(CHOICE_HEADERS))
+        ]
+
+    return quiz_rows, question_rows, choice_rows, errors
+
+
+def import_quizzes_from_excel(excel_file, created_by_user, dry_run=False, on_parsed=None):
+    """
+    Import quizzes, questions, and choices from Excel file.
+
+    The workbook is parsed in read-only mode, then everything is written in a
+    single transaction with bulk queries (see ``importing.run_import``), so a
+    failed import leaves no partial data. ``dry_run`` validates the file
+    against the database and rolls back instead of committing.
+    ``on_parsed(row_count)`` is called once the file has been read.
+    """
+    started = time.monotonic()
+    try:
+        wb = openpyxl.load_workbook(excel_file, read_only=True, data_only=True)
+    except Exception as e:
+        return {'success': False, 'errors': [f'Error reading Excel file: {str(e)}'], 'success_count': 0}
+
+    try:
+        # Get default user if created_by_user is not provided
+        if not created_by_user:
+            try:
+                created_by_user = User.objects.get(username='admin')
+            except User.DoesNotExist:
+                return {'success': False, 'errors': ['Default admin user not found. Please specify created_by_user.'], 'success_count': 0}
+
+        if 'Quizzes' not in wb.sheetnames:
+            return {'success': False, 'errors': ['Excel file must contain a "Quizzes" sheet'], 'success_count': 0}
+
+        quiz_rows, question_rows, choice_rows, errors = parse_quiz_workbook(wb)
+    finally:
+        wb.close()
 
+    if on_parsed is not None:
+        on_parsed(len(quiz_rows) + len(question_rows) + len(choice_rows))
+    return run_import(quiz_rows, question_rows, choice_rows, created_by_user, errors, dry_run=dry_run, started=started)
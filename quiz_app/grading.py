@@ -0,0 +1,203 @@
+"""
+Grading engine for quiz submissions.
+
+Scores come from the quiz's precompiled answer key (``quiz_app.answer_keys``):
+the only rows read are the ids of the choices a submission selected, and the
+score is a set intersection with the key. The same key scores one submission
+from ``submit_quiz_view``, re-scores many submissions in chunks, and
+finalizes exams whose deadline passed without a submission.
+"""
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import answer_buffer
+from .answer_keys import aget_answer_key, build_answer_key, get_answer_key
+from .leaderboard import invalidate_leaderboard, record_submission
+from .models import Question, Answer, QuizSubmission
+
+
+def question_count_subquery(quiz_ref='quiz_id'):
+    """Number of questions in the quiz referenced by ``quiz_ref``"""
+    questions = (
+        Question.objects.filter(quiz_id=OuterRef(quiz_ref))
+        .order_by()
+        .values('quiz_id')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(questions), Value(0))
+
+
+def _selected_choice_ids(submission_id):
+    return Answer.objects.filter(
+        submission_id=submission_id, selected_choice__isnull=False
+    ).values_list('selected_choice_id', flat=True)
+
+
+def selected_choices_by_submission(submission_ids):
+    """Selected choice ids of several submissions, keyed by submission id, in one query"""
+    selected = defaultdict(list)
+    answers = Answer.objects.filter(
+        submission_id__in=submission_ids, selected_choice__isnull=False
+    ).values_list('submission_id', 'selected_choice_id')
+    for submission_id, choice_id in answers:
+        selected[submission_id].append(choice_id)
+    return selected
+
+
+def update_scores(submissions, scores, **fields):
+    """
+    Store ``scores`` (submission id -> score) with one UPDATE of
+    ``submissions`` per distinct score, also setting ``fields``. Scores take
+    few distinct values, so this is far cheaper than a per-row CASE.
+    """
+    by_score = defaultdict(list)
+    for submission_id, score in scores.items():
+        by_score[score].append(submission_id)
+    return sum(
+        submissions.filter(pk__in=submission_ids).update(score=score, **fields)
+        for score, submission_ids in by_score.items()
+    )
+
+
+def grade_submission(submission):
+    """Return the percentage score for a submission using a single query"""
+    return get_answer_key(submission.quiz_id).score(_selected_choice_ids(submission.pk))
+
+
+async def agrade_submission(submission):
+    """Async version of ``grade_submission``"""
+    answer_key = await aget_answer_key(submission.quiz_id)
+    return answer_key.score([choice_id async for choice_id in _selected_choice_ids(submission.pk)])
+
+
+def _finalize(submission, score):
+    submission.score = score
+    submission.is_completed = True
+    submission.submitted_at = timezone.now()
+    # Only while unsubmitted: the expiry sweeper may have finalized it since
+    # it was read, and its score and deadline date must stand
+    return QuizSubmission.objects.filter(pk=submission.pk, is_completed=False), {
+        'score': score, 'is_completed': True, 'submitted_at': submission.submitted_at,
+    }
+
+
+def finalize_submission(submission, score):
+    """
+    Submit ``submission`` with ``score``. Returns False, changing nothing, if
+    it was already submitted. The update skips model signals, so the
+    leaderboard is updated here.
+    """
+    unsubmitted, fields = _finalize(submission, score)
+    if not unsubmitted.update(**fields):
+        return False
+    record_submission(submission)
+    return True
+
+
+async def afinalize_submission(submission, score):
+    """Async version of ``finalize_submission``"""
+    unsubmitted, fields = _finalize(submission, score)
+    if not await unsubmitted.aupdate(**fields):
+        return False
+    await sync_to_async(record_submission)(submission)
+    return True
+
+
+def rescore_quizzes(quiz_ids, chunk_size=1000):
+    """
+    Recompute stored scores for all completed submissions of the given quizzes.
+
+    Each quiz's answer key is rebuilt from the database, since rescoring
+    follows an answer key change. Submissions are processed in primary key
+    order, ``chunk_size`` at a time: one query reads their selected choices
+    and ``update_scores`` writes the new scores inside its own transaction.
+    Returns a dict with the number of submissions updated, elapsed seconds
+    and throughput.
+    """
+    started = time.monotonic()
+    updated = 0
+
+    for quiz_id in quiz_ids:
+        answer_key = build_answer_key(quiz_id)
+        submissions = QuizSubmission.objects.filter(quiz_id=quiz_id, is_completed=True)
+        last_pk = 0
+        while True:
+            chunk = list(submissions.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not chunk:
+                break
+            selected = selected_choices_by_submission(chunk)
+            with transaction.atomic():
+                updated += update_scores(submissions, {pk: answer_key.score(selected[pk]) for pk in chunk})
+            last_pk = chunk[-1]
+
+    # Rescoring bypasses model signals, so cached rankings are rebuilt
+    for quiz_id in quiz_ids:
+        invalidate_leaderboard(quiz_id)
+
+    elapsed = time.monotonic() - started
+    return {
+        'updated': updated,
+        'seconds': elapsed,
+        'per_second': updated / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def finalize_expired_submissions(chunk_size=1000):
+    """
+    Submit and score every unsubmitted exam whose deadline passed more than
+    EXAM_GRACE_SECONDS ago, as if the trainee had submitted at the deadline.
+
+    Each chunk of ``chunk_size`` submissions is locked, graded against the
+    answer keys of their quizzes and finalized by ``update_scores``. Returns a
+    dict with the number of submissions finalized, quizzes affected, elapsed
+    seconds and throughput.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.EXAM_GRACE_SECONDS)
+    expired = QuizSubmission.objects.filter(is_completed=False, deadline__lt=cutoff)
+    started = time.monotonic()
+    finalized = 0
+    quiz_ids = set()
+
+    if answer_buffer.is_enabled() and expired.exists():
+        # Answers autosaved before the deadline may still be buffered
+        answer_buffer.get_buffer().flush()
+
+    while True:
+        with transaction.atomic():
+            # Locked, so another sweeper waits for this chunk instead of
+            # grading it too. Both this and finalize_submission (used by
+            # submit_quiz_view) only update rows still unsubmitted, so
+            # whichever commits first wins and the other changes nothing.
+            chunk = list(expired.select_for_update().order_by('pk').values_list('pk', 'quiz_id')[:chunk_size])
+            if not chunk:
+                break
+            answer_keys = {quiz_id: get_answer_key(quiz_id) for _, quiz_id in chunk}
+            selected = selected_choices_by_submission([pk for pk, _ in chunk])
+            finalized += update_scores(
+                QuizSubmission.objects.filter(is_completed=False),
+                {pk: answer_keys[quiz_id].score(selected[pk]) for pk, quiz_id in chunk},
+                is_completed=True,
+                submitted_at=F('deadline'),
+            )
+        quiz_ids.update(answer_keys)
+
+    # Finalizing bypasses model signals, so cached rankings are rebuilt
+    for quiz_id in quiz_ids:
+        invalidate_leaderboard(quiz_id)
+
+    elapsed = time.monotonic() - started
+    return {
+        'finalized': finalized,
+        'quizzes': len(quiz_ids),
+        'seconds': elapsed,
+        'per_second': finalized / elapsed if elapsed > 0 else 0.0,
+    }
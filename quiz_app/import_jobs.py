@@ -0,0 +1,130 @@
+"""
+Background quiz bank imports.
+
+The admin upload view stores the uploaded file in an ``ImportJob`` row and
+returns straight away; ``manage.py run_import_worker`` picks queued jobs up
+and runs them through the bulk importer. With ``settings.IMPORT_WORKER`` off
+(no worker running), the view claims and runs the job itself. Jobs are claimed with a conditional UPDATE,
+so several workers can share one queue without a broker. Progress is written
+outside the import transaction, so the admin progress page sees it while the
+import itself is still uncommitted.
+"""
+import io
+import logging
+from datetime import timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+from .excel_utils import import_quizzes_from_excel
+from .interchange import FORMATS, format_for_filename, import_quizzes_from_file
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+# A job is given up after this many workers died while running it
+MAX_ATTEMPTS = 3
+
+
+def enqueue_import(uploaded_file, user, dry_run=False):
+    """Store an uploaded Excel, JSONL or CSV file as a queued import job"""
+    return ImportJob.objects.create(
+        uploaded_by=user,
+        file_name=uploaded_file.name[:255],
+        file_data=uploaded_file.read(),
+        dry_run=dry_run,
+    )
+
+
+def requeue_stale_jobs(stale_after):
+    """
+    Put jobs whose worker stopped mid-import back in the queue, or fail them
+    after ``MAX_ATTEMPTS``. Imports are atomic, so a rerun starts clean.
+    """
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    stale = ImportJob.objects.filter(status__in=ImportJob.ACTIVE_STATUSES, started_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=ImportJob.STATUS_FAILED,
+        errors=['The import worker stopped before this job finished.'],
+        file_data=b'',
+        finished_at=timezone.now(),
+    )
+    requeued = stale.filter(attempts__lt=MAX_ATTEMPTS).update(status=ImportJob.STATUS_QUEUED)
+    return requeued + failed
+
+
+def claim_job(job_id):
+    """Claim a queued job, or return None if it was claimed already"""
+    claimed = ImportJob.objects.filter(pk=job_id, status=ImportJob.STATUS_QUEUED).update(
+        status=ImportJob.STATUS_PARSING,
+        started_at=timezone.now(),
+        attempts=F('attempts') + 1,
+    )
+    if claimed:
+        return ImportJob.objects.select_related('uploaded_by').get(pk=job_id)
+    return None
+
+
+def claim_next_job():
+    """Claim the oldest queued job for this worker, or return None"""
+    queued = ImportJob.objects.filter(status=ImportJob.STATUS_QUEUED).order_by('created_at', 'pk')
+    for job_id in queued.values_list('pk', flat=True)[:10]:
+        job = claim_job(job_id)
+        if job is not None:
+            return job
+    return None
+
+
+def run_job(job):
+    """Import a claimed job's file and record the outcome on the job"""
+    def on_parsed(row_count):
+        job.status = ImportJob.STATUS_IMPORTING
+        job.total_rows = row_count
+        job.save(update_fields=['status', 'total_rows'])
+
+    fileobj = io.BytesIO(bytes(job.file_data))
+    fmt = format_for_filename(job.file_name)
+    try:
+        if fmt in FORMATS:
+            # Line formats are read and written batch by batch in one pass
+            on_parsed(None)
+            result = import_quizzes_from_file(fileobj, fmt, job.uploaded_by, dry_run=job.dry_run)
+        else:
+            result = import_quizzes_from_excel(fileobj, job.uploaded_by, dry_run=job.dry_run, on_parsed=on_parsed)
+    except Exception as e:
+        logger.exception('Import job %s failed', job.pk)
+        result = {'success': False, 'errors': [f'Import failed: {e}'], 'success_count': 0}
+
+    # Row-level warnings don't stop an import; only a file that couldn't be
+    # imported at all (or rolled back on an error) counts as failed.
+    failed = not result['success'] and result['success_count'] == 0
+    job.status = ImportJob.STATUS_FAILED if failed else ImportJob.STATUS_SUCCEEDED
+    if result.get('rows') is not None:
+        job.total_rows = result['rows']
+    job.success_count = result['success_count']
+    job.errors = result['errors']
+    job.seconds = result.get('seconds')
+    job.file_data = b''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'total_rows', 'success_count', 'errors', 'seconds', 'file_data', 'finished_at'])
+    return job
+
+
+def job_status(job):
+    """JSON-ready progress of a job for the admin progress page"""
+    return {
+        'id': job.pk,
+        'file_name': job.file_name,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'finished': job.is_finished,
+        'dry_run': job.dry_run,
+        'total_rows': job.total_rows,
+        'success_count': job.success_count,
+        'errors': job.errors,
+        'seconds': job.seconds,
+        'rows_per_second': job.total_rows / job.seconds if job.seconds and job.total_rows else None,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
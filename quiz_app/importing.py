@@ -0,0 +1,280 @@
+"""
+Bulk import pipeline for quiz banks.
+
+Parsers (Excel in ``excel_utils``, JSONL/CSV in ``interchange``) turn their
+input into flat quiz, question and choice rows; ``apply_import`` then writes
+them with one prefetch per model and ``bulk_create``/``bulk_update`` calls
+inside a single transaction, instead of several queries per row.
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import Category, Quiz, Question, Choice
+from .snapshots import invalidate_quiz_snapshot
+
+QUESTION_TYPE_MAP = {
+    'multiple choice': 'multiple_choice',
+    'multiple_choice': 'multiple_choice',
+    'text answer': 'text',
+    'text': 'text',
+}
+
+BULK_BATCH_SIZE = 500
+
+
+class QuizRow:
+    __slots__ = ('label', 'title', 'description', 'created_by', 'is_active', 'category')
+
+    def __init__(self, label, title, description, created_by, is_active, category=None):
+        self.label = label
+        self.title = title
+        self.description = description
+        self.created_by = created_by
+        self.is_active = is_active
+        # Category name; None leaves the category of an existing quiz alone
+        self.category = category
+
+
+class QuestionRow:
+    __slots__ = ('label', 'quiz_title', 'question_text', 'question_type', 'order', 'time_limit')
+
+    def __init__(self, label, quiz_title, question_text, question_type, order, time_limit):
+        self.label = label
+        self.quiz_title = quiz_title
+        self.question_text = question_text
+        self.question_type = question_type
+        self.order = order
+        self.time_limit = time_limit
+
+
+class ChoiceRow:
+    __slots__ = ('label', 'quiz_title', 'question_text', 'choice_text', 'is_correct')
+
+    def __init__(self, label, quiz_title, question_text, choice_text, is_correct):
+        self.label = label
+        self.quiz_title = quiz_title
+        self.question_text = question_text
+        self.choice_text = choice_text
+        self.is_correct = is_correct
+
+
+def parse_bool(value, default):
+    """Interpret Yes/No style cells, falling back to ``default`` when empty"""
+    if value is None or str(value).strip() == '':
+        return default
+    return str(value).strip().lower() in ['yes', 'y', 'true', '1']
+
+
+def parse_int(value, default):
+    try:
+        return int(value) if value not in (None, '') else default
+    except (ValueError, TypeError):
+        return default
+
+
+def cell_text(value):
+    return str(value).strip() if value is not None else ''
+
+
+def parse_question_type(value):
+    text = str(value).strip() if value else 'Multiple Choice'
+    return QUESTION_TYPE_MAP.get(text.lower(), 'multiple_choice')
+
+
+def _refetch_missing_pks(objects, lookup):
+    """
+    Backends such as MySQL don't return primary keys from bulk_create;
+    read them back with one query keyed by ``lookup(obj)``.
+    """
+    missing = [obj for obj in objects if obj.pk is None]
+    if not missing:
+        return
+    model = type(missing[0])
+    by_key = {lookup(obj): obj for obj in missing}
+    if model is Quiz:
+        saved = Quiz.objects.filter(title__in=[obj.title for obj in missing]).order_by('-pk')
+    else:
+        saved = Question.objects.filter(
+            quiz_id__in={obj.quiz_id for obj in missing},
+            question_text__in=[obj.question_text for obj in missing],
+        ).order_by('-pk')
+    for row in saved:
+        obj = by_key.get(lookup(row))
+        if obj is not None and obj.pk is None:
+            obj.pk = row.pk
+
+
+def _get_or_create_categories(names):
+    """Categories by name, creating the ones that don't exist yet"""
+    if not names:
+        return {}
+    categories = Category.objects.in_bulk(list(names), field_name='name')
+    missing = [Category(name=name) for name in names if name not in categories]
+    if missing:
+        Category.objects.bulk_create(missing, ignore_conflicts=True)
+        categories = Category.objects.in_bulk(list(names), field_name='name')
+    return categories
+
+
+def apply_import(quiz_rows, question_rows, choice_rows, created_by_user, errors):
+    """
+    Create or update quizzes, questions and choices from parsed rows.
+
+    Must run inside a transaction. Quizzes are matched by title and questions
+    by (quiz, question text); existing rows are updated, missing ones are
+    created. Missing categories are created by name. Existing choices are
+    left untouched. Problems are appended to ``errors``. Returns the number
+    of distinct quizzes imported.
+    """
+    # Quizzes: later rows with the same title win, as with repeated saves
+    quiz_values = {}
+    for row in quiz_rows:
+        quiz_values[row.title] = row
+
+    usernames = {row.created_by for row in quiz_values.values()}
+    users = User.objects.filter(username__in=usernames).in_bulk(field_name='username')
+    categories = _get_or_create_categories({row.category for row in quiz_values.values() if row.category})
+    quizzes = {}
+    for quiz in Quiz.objects.filter(title__in=list(quiz_values)).order_by('-pk'):
+        quizzes[quiz.title] = quiz  # keep the oldest quiz per title
+
+    new_quizzes, changed_quizzes = [], []
+    for row in quiz_rows:
+        if row.created_by not in users:
+            errors.append(f'{row.label}: User "{row.created_by}" not found, using "{created_by_user.username}"')
+    for title, row in quiz_values.items():
+        quiz = quizzes.get(title)
+        if quiz is None:
+            quiz = Quiz(
+                title=title,
+                description=row.description,
+                created_by=users.get(row.created_by, created_by_user),
+                is_active=row.is_active,
+            )
+            quizzes[title] = quiz
+            new_quizzes.append(quiz)
+        else:
+            quiz.description = row.description
+            quiz.is_active = row.is_active
+            changed_quizzes.append(quiz)
+        if row.category:
+            quiz.category = categories[row.category]
+
+    Quiz.objects.bulk_create(new_quizzes, batch_size=BULK_BATCH_SIZE)
+    _refetch_missing_pks(new_quizzes, lambda quiz: quiz.title)
+    Quiz.objects.bulk_update(
+        changed_quizzes, ['description', 'is_active', 'category'], batch_size=BULK_BATCH_SIZE,
+    )
+
+    # Questions
+    quiz_ids = [quiz.pk for quiz in quizzes.values()]
+    questions = {}
+    for question in Question.objects.filter(quiz_id__in=quiz_ids).order_by('pk'):
+        questions.setdefault((question.quiz_id, question.question_text), []).append(question)
+
+    new_questions, changed_questions = {}, {}
+    for row in question_rows:
+        quiz = quizzes.get(row.quiz_title)
+        if quiz is None:
+            errors.append(f'{row.label}: Quiz "{row.quiz_title}" not found in Quizzes sheet')
+            continue
+        if not row.question_text:
+            errors.append(f'{row.label}: Question text is required')
+            continue
+
+        key = (quiz.pk, row.question_text)
+        matches = questions.get(key)
+        if matches:
+            question = matches[0]
+            changed_questions[id(question)] = question
+        else:
+            question = Question(quiz=quiz, question_text=row.question_text)
+            questions[key] = [question]
+            new_questions[key] = question
+        question.question_type = row.question_type
+        question.order = row.order
+        question.time_limit_minutes = row.time_limit
+
+    Question.objects.bulk_create(list(new_questions.values()), batch_size=BULK_BATCH_SIZE)
+    _refetch_missing_pks(list(new_questions.values()), lambda q: (q.quiz_id, q.question_text))
+    Question.objects.bulk_update(
+        list(changed_questions.values()),
+        ['question_type', 'order', 'time_limit_minutes'],
+        batch_size=BULK_BATCH_SIZE,
+    )
+
+    # Choices
+    existing_choices = set(
+        Choice.objects.filter(question__quiz_id__in=quiz_ids).values_list('question_id', 'choice_text')
+    )
+    new_choices = []
+    for row in choice_rows:
+        quiz = quizzes.get(row.quiz_title)
+        if quiz is None or not row.question_text:
+            continue  # Already reported while importing questions
+
+        matches = questions.get((quiz.pk, row.question_text))
+        if not matches:
+            errors.append(f'{row.label}: Question "{row.question_text}" not found for quiz "{row.quiz_title}"')
+            continue
+        if len(matches) > 1:
+            errors.append(f'{row.label}: Multiple questions found, using first one')
+        question = matches[0]
+
+        # Only add choices for multiple choice questions
+        if question.question_type != 'multiple_choice' or not row.choice_text:
+            continue
+        if (question.pk, row.choice_text) in existing_choices:
+            continue
+        existing_choices.add((question.pk, row.choice_text))
+        new_choices.append(Choice(question=question, choice_text=row.choice_text, is_correct=row.is_correct))
+
+    Choice.objects.bulk_create(new_choices, batch_size=BULK_BATCH_SIZE)
+
+    # Bulk writes skip model signals, so retire cached quiz content here
+    for quiz_id in quiz_ids:
+        invalidate_quiz_snapshot(quiz_id)
+
+    return len(quizzes)
+
+
+def run_import_batches(batches, created_by_user, errors, dry_run=False, started=None):
+    """
+    Apply an iterable of ``(quiz_rows, question_rows, choice_rows)`` batches
+    in one transaction and time it. Streaming readers use this to import
+    arbitrarily large files with bounded memory: each batch is written and
+    dropped before the next one is read. With ``dry_run`` the rows are fully
+    validated against the database and then rolled back. ``started`` is a
+    ``time.monotonic()`` reading to time from, so parsing done beforehand is
+    included in the reported throughput.
+    """
+    if started is None:
+        started = time.monotonic()
+    rows = 0
+    titles = set()
+    with transaction.atomic():
+        for quiz_rows, question_rows, choice_rows in batches:
+            apply_import(quiz_rows, question_rows, choice_rows, created_by_user, errors)
+            titles.update(row.title for row in quiz_rows)
+            rows += len(quiz_rows) + len(question_rows) + len(choice_rows)
+        if dry_run:
+            transaction.set_rollback(True)
+    elapsed = time.monotonic() - started
+    return {
+        'success': len(errors) == 0,
+        'errors': errors,
+        'success_count': len(titles),
+        'dry_run': dry_run,
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_second': rows / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def run_import(quiz_rows, question_rows, choice_rows, created_by_user, errors, dry_run=False, started=None):
+    """Apply one set of parsed rows; see ``run_import_batches``"""
+    return run_import_batches(
+        [(quiz_rows, question_rows, choice_rows)], created_by_user, errors, dry_run=dry_run, started=started,
+    )
@@ -0,0 +1,273 @@
+"""
+Line-oriented quiz bank interchange formats.
+
+JSONL holds one quiz per line with its questions and choices nested::
+
+    {"title": "Python Basics", "description": "", "created_by": "admin",
+     "is_active": true, "category": "Python",
+     "questions": [{"question_text": "...", "question_type": "multiple_choice",
+                    "order": 0, "time_limit_minutes": 1,
+                    "choices": [{"choice_text": "...", "is_correct": true}]}]}
+
+CSV is the same data flattened to one row per choice (one row per text
+question, or per quiz without questions), with the quiz and question columns
+repeated. Rows of a quiz are written together, and the reader groups
+consecutive rows back into quiz records.
+
+Both readers and writers stream: exports read quizzes in chunks, and imports
+are applied in batches of quizzes inside one transaction (see
+``importing.run_import_batches``), so memory use doesn't grow with the size
+of the bank.
+"""
+import csv
+import io
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.db.models import Prefetch
+
+from .importing import (
+    QuizRow, QuestionRow, ChoiceRow, cell_text, parse_bool, parse_int, parse_question_type,
+    run_import_batches,
+)
+from .models import Question, Choice
+
+FORMATS = ('jsonl', 'csv')
+
+CSV_HEADERS = [
+    'quiz_title', 'quiz_description', 'created_by', 'is_active', 'category',
+    'question_text', 'question_type', 'order', 'time_limit_minutes',
+    'choice_text', 'is_correct',
+]
+
+# Quizzes applied per bulk import batch
+IMPORT_BATCH_SIZE = 200
+
+
+def format_for_filename(filename):
+    """Return 'jsonl', 'csv' or 'xlsx' for a file name, or None"""
+    name = filename.lower()
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.xlsx', '.xls')):
+        return 'xlsx'
+    return None
+
+
+def iter_quiz_records(queryset, chunk_size=100):
+    """Yield quizzes as interchange dicts, reading them in prefetched chunks"""
+    quizzes = queryset.select_related('created_by', 'category').prefetch_related(
+        Prefetch('questions', queryset=Question.objects.order_by('order', 'id')),
+        Prefetch('questions__choices', queryset=Choice.objects.order_by('id')),
+    )
+    for quiz in quizzes.iterator(chunk_size=chunk_size):
+        yield {
+            'title': quiz.title,
+            'description': quiz.description,
+            'created_by': quiz.created_by.username,
+            'is_active': quiz.is_active,
+            'category': quiz.category.name if quiz.category else None,
+            'questions': [
+                {
+                    'question_text': question.question_text,
+                    'question_type': question.question_type,
+                    'order': question.order,
+                    'time_limit_minutes': question.time_limit_minutes,
+                    'choices': [
+                        {'choice_text': choice.choice_text, 'is_correct': choice.is_correct}
+                        for choice in question.choices.all()
+                    ] if question.question_type == 'multiple_choice' else [],
+                }
+                for question in quiz.questions.all()
+            ],
+        }
+
+
+def write_quizzes_jsonl(queryset, fileobj, chunk_size=100):
+    """Write quizzes to a text file object, one JSON record per line"""
+    count = 0
+    for record in iter_quiz_records(queryset, chunk_size):
+        fileobj.write(json.dumps(record, ensure_ascii=False))
+        fileobj.write('\n')
+        count += 1
+    return count
+
+
+def write_quizzes_csv(queryset, fileobj, chunk_size=100):
+    """Write quizzes to a text file object as flat CSV, one row per choice"""
+    writer = csv.writer(fileobj)
+    writer.writerow(CSV_HEADERS)
+    count = 0
+    for record in iter_quiz_records(queryset, chunk_size):
+        quiz_columns = [
+            record['title'],
+            record['description'],
+            record['created_by'],
+            'Yes' if record['is_active'] else 'No',
+            record['category'] or '',
+        ]
+        if not record['questions']:
+            writer.writerow(quiz_columns + [''] * 6)
+        for question in record['questions']:
+            question_columns = [
+                question['question_text'],
+                question['question_type'],
+                question['order'],
+                question['time_limit_minutes'],
+            ]
+            if not question['choices']:
+                writer.writerow(quiz_columns + question_columns + ['', ''])
+            for choice in question['choices']:
+                writer.writerow(quiz_columns + question_columns + [
+                    choice['choice_text'],
+                    'Yes' if choice['is_correct'] else 'No',
+                ])
+        count += 1
+    return count
+
+
+def _text_stream(fileobj):
+    if isinstance(fileobj, io.TextIOBase):
+        return fileobj
+    return io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+
+
+def read_quizzes_jsonl(fileobj, errors):
+    """Yield ``(label, record)`` for each quiz line; bad lines go to ``errors``"""
+    for line_number, line in enumerate(_text_stream(fileobj), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            errors.append(f'Line {line_number}: Invalid JSON ({e})')
+            continue
+        if not isinstance(record, dict):
+            errors.append(f'Line {line_number}: Expected a JSON object')
+            continue
+        yield f'Line {line_number}', record
+
+
+def read_quizzes_csv(fileobj, errors):
+    """Group consecutive CSV rows of the same quiz into ``(label, record)``"""
+    reader = csv.DictReader(_text_stream(fileobj))
+    missing = [header for header in ('quiz_title', 'question_text') if header not in (reader.fieldnames or [])]
+    if missing:
+        errors.append(f'CSV file is missing the column(s): {", ".join(missing)}')
+        return
+
+    label, record, questions = None, None, {}
+    for row in reader:
+        line_number = reader.line_num
+        title = cell_text(row.get('quiz_title'))
+        if not title:  # Skip empty rows
+            continue
+        if record is None or title != record['title']:
+            if record is not None:
+                yield label, record
+            label, questions = f'Line {line_number}', {}
+            record = {
+                'title': title,
+                'description': row.get('quiz_description'),
+                'created_by': row.get('created_by'),
+                'is_active': row.get('is_active'),
+                'category': row.get('category'),
+                'questions': [],
+            }
+
+        question_text = cell_text(row.get('question_text'))
+        if not question_text:
+            continue
+        question = questions.get(question_text)
+        if question is None:
+            question = questions[question_text] = {
+                'question_text': question_text,
+                'question_type': row.get('question_type'),
+                'order': row.get('order'),
+                'time_limit_minutes': row.get('time_limit_minutes'),
+                'choices': [],
+            }
+            record['questions'].append(question)
+        if cell_text(row.get('choice_text')):
+            question['choices'].append({'choice_text': row['choice_text'], 'is_correct': row.get('is_correct')})
+
+    if record is not None:
+        yield label, record
+
+
+def records_to_rows(records):
+    """Flatten ``(label, record)`` pairs into importer rows"""
+    quiz_rows, question_rows, choice_rows = [], [], []
+    for label, record in records:
+        title = cell_text(record.get('title'))
+        quiz_rows.append(QuizRow(
+            label=label,
+            title=title,
+            description=cell_text(record.get('description')),
+            created_by=cell_text(record.get('created_by')) or 'admin',
+            is_active=parse_bool(record.get('is_active'), True),
+            category=cell_text(record.get('category')) or None,
+        ))
+        for question in record.get('questions') or []:
+            if not isinstance(question, dict):
+                continue
+            question_text = cell_text(question.get('question_text'))
+            question_rows.append(QuestionRow(
+                label=label,
+                quiz_title=title,
+                question_text=question_text,
+                question_type=parse_question_type(question.get('question_type')),
+                order=parse_int(question.get('order'), 0),
+                time_limit=parse_int(question.get('time_limit_minutes'), 1),
+            ))
+            for choice in question.get('choices') or []:
+                if not isinstance(choice, dict):
+                    continue
+                choice_rows.append(ChoiceRow(
+                    label=label,
+                    quiz_title=title,
+                    question_text=question_text,
+                    choice_text=cell_text(choice.get('choice_text')),
+                    is_correct=parse_bool(choice.get('is_correct'), False),
+                ))
+    return quiz_rows, question_rows, choice_rows
+
+
+def _batches(records, errors, batch_size):
+    batch = []
+    for label, record in records:
+        if not cell_text(record.get('title')):
+            errors.append(f'{label}: Quiz title is required')
+            continue
+        batch.append((label, record))
+        if len(batch) >= batch_size:
+            yield records_to_rows(batch)
+            batch = []
+    if batch:
+        yield records_to_rows(batch)
+
+
+def import_quizzes_from_file(fileobj, fmt, created_by_user, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Import a JSONL or CSV quiz bank in one transaction, ``batch_size``
+    quizzes at a time. Returns the same result dict as the Excel importer.
+    """
+    started = time.monotonic()
+    if not created_by_user:
+        created_by_user = User.objects.filter(username='admin').first()
+        if created_by_user is None:
+            return {'success': False, 'errors': ['Default admin user not found. Please specify created_by_user.'], 'success_count': 0}
+
+    errors = []
+    if fmt == 'jsonl':
+        records = read_quizzes_jsonl(fileobj, errors)
+    elif fmt == 'csv':
+        records = read_quizzes_csv(fileobj, errors)
+    else:
+        raise ValueError(f'Unsupported format: {fmt}')
+    return run_import_batches(
+        _batches(records, errors, batch_size), created_by_user, errors, dry_run=dry_run, started=started,
+    )
@@ -0,0 +1,149 @@
+"""
+Quiz leaderboards.
+
+The top entries of each quiz are kept as a sorted tuple in Django's cache and
+updated in place when a submission is finalized. A trainee's own rank is
+answered by one indexed COUNT query, so it is available however far down the
+list they are. Bulk changes that bypass model signals (rescoring, expiry
+sweeps) invalidate the cached list, and it is rebuilt on the next read.
+"""
+import bisect
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, Q
+
+from .models import QuizSubmission
+
+LEADERBOARD_SIZE = 50
+LEADERBOARD_TIMEOUT = 60 * 60
+
+LeaderboardEntry = namedtuple('LeaderboardEntry', [
+    'submission_id', 'trainee_id', 'username', 'score', 'submitted_at',
+])
+
+
+def _cache_key(quiz_id):
+    return f'leaderboard:{quiz_id}'
+
+
+def _lock_key(quiz_id):
+    return f'leaderboard_lock:{quiz_id}'
+
+
+def _sort_key(entry):
+    # Highest score first, earlier submission wins ties
+    return (-entry.score, entry.submitted_at, entry.submission_id)
+
+
+def ranked_submissions(quiz_id):
+    """Completed, scored submissions of a quiz in leaderboard order"""
+    return QuizSubmission.objects.filter(
+        quiz_id=quiz_id, is_completed=True, score__isnull=False,
+    ).order_by('-score', 'submitted_at', 'pk')
+
+
+def build_top_entries(quiz_id):
+    """Read the top of a leaderboard straight from the database"""
+    # From the primary: a lagging replica must not end up in the cache
+    rows = ranked_submissions(quiz_id).using(DEFAULT_DB_ALIAS).values_list(
+        'pk', 'trainee_id', 'trainee__username', 'score', 'submitted_at',
+    )[:LEADERBOARD_SIZE]
+    return tuple(LeaderboardEntry(*row) for row in rows)
+
+
+def get_top_entries(quiz_id):
+    """Return the cached top entries of a quiz, building them on a miss"""
+    entries = cache.get(_cache_key(quiz_id))
+    if entries is None:
+        entries = build_top_entries(quiz_id)
+        cache.set(_cache_key(quiz_id), entries, LEADERBOARD_TIMEOUT)
+    return entries
+
+
+def get_rank(submission):
+    """
+    Return ``(rank, total)`` for a completed submission with one aggregate
+    query, or ``(None, total)`` if it is not on the leaderboard.
+    """
+    ranked = ranked_submissions(submission.quiz_id)
+    if not submission.is_completed or submission.score is None:
+        return None, ranked.count()
+
+    ahead = (
+        Q(score__gt=submission.score)
+        | Q(score=submission.score, submitted_at__lt=submission.submitted_at)
+        | Q(score=submission.score, submitted_at=submission.submitted_at, pk__lt=submission.pk)
+    )
+    counts = ranked.aggregate(total=Count('pk'), ahead=Count('pk', filter=ahead))
+    return counts['ahead'] + 1, counts['total']
+
+
+def invalidate_leaderboard(quiz_id):
+    """Drop the cached leaderboard of a quiz once the transaction commits"""
+    transaction.on_commit(lambda: cache.delete(_cache_key(quiz_id)))
+
+
+def _acquire(lock_key, attempts=20):
+    for _ in range(attempts):
+        if cache.add(lock_key, 1, 5):
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def _apply_change(submission):
+    key = _cache_key(submission.quiz_id)
+    lock_key = _lock_key(submission.quiz_id)
+    if not _acquire(lock_key):
+        cache.delete(key)
+        return
+    try:
+        entries = cache.get(key)
+        if entries is None:
+            # Nothing cached yet; the next read builds it from the database
+            return
+
+        entries = list(entries)
+        previous = next((e for e in entries if e.submission_id == submission.pk), None)
+        was_full = len(entries) >= LEADERBOARD_SIZE
+        if previous is not None:
+            entries.remove(previous)
+
+        if submission.is_completed and submission.score is not None:
+            entry = LeaderboardEntry(
+                submission.pk, submission.trainee_id, None, submission.score, submission.submitted_at,
+            )
+            if previous is not None and was_full and entries and _sort_key(entry) > _sort_key(entries[-1]):
+                # Dropped below a full list: whoever replaces it isn't cached
+                cache.delete(key)
+                return
+            if len(entries) < LEADERBOARD_SIZE or _sort_key(entry) < _sort_key(entries[-1]):
+                if QuizSubmission.trainee.is_cached(submission):
+                    username = submission.trainee.username
+                else:
+                    username = (
+                        QuizSubmission.objects.filter(pk=submission.pk)
+                        .values_list('trainee__username', flat=True).first()
+                    )
+                position = bisect.bisect([_sort_key(e) for e in entries], _sort_key(entry))
+                entries.insert(position, entry._replace(username=username))
+                del entries[LEADERBOARD_SIZE:]
+        elif previous is not None and was_full:
+            # Removed from a full list: the next entry down isn't cached
+            cache.delete(key)
+            return
+
+        cache.set(key, tuple(entries), LEADERBOARD_TIMEOUT)
+    finally:
+        cache.delete(lock_key)
+
+
+def record_submission(submission):
+    """
+    Apply a saved submission to its cached leaderboard after commit: insert
+    it at its rank, move it, or take it off the list.
+    """
+    transaction.on_commit(lambda: _apply_change(submission))
@@ -0,0 +1,302 @@
+"""
+Server-Sent Events for live leaderboards and exam timers.
+
+Every browser on a quiz's leaderboard or exam page holds one
+``text/event-stream`` connection to ``quiz_events_view``. In each server
+process the streams of a quiz share a ``QuizChannel``: one asyncio task that
+reads the quiz's leaderboard from the shared cache once per
+``LIVE_POLL_SECONDS`` and, when it changed (a submission was finalized,
+rescored or expired, in any process), sends the changed rows to every
+subscriber. The same task sends a ``tick`` with the server clock every
+``LIVE_TICK_SECONDS``, which also keeps idle connections open through
+proxies. A stream with nobody on the other end costs a queue and a paused
+generator, not a thread or a query.
+
+Events:
+
+* ``timer``: sent once to a trainee taking the quiz, with their deadline;
+* ``tick``: ``server_time``, so clients correct the drift of their timer;
+* ``leaderboard``: ``size`` and the ``changed`` rows (rank, trainee, score,
+  submission time); the first one a stream gets lists every row.
+
+Streams need the ASGI server, and skip Django's request cycle there:
+``with_live_events`` (applied in ``quiz_project/asgi.py``) answers the
+events URL itself. A request handled by Django keeps a thread reserved until
+its response is finished, which for a stream is when the exam ends. Here the
+session, user and quiz access are checked in one trip to the shared thread
+pool, and the stream then lives on the event loop alone until the client
+disconnects or ``LIVE_STREAM_SECONDS`` pass (EventSource then reconnects, and
+access is checked again). Middleware does not run for these responses.
+"""
+import asyncio
+import contextvars
+import io
+import json
+import time
+import weakref
+from importlib import import_module
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.exceptions import DisallowedHost
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.urls import Resolver404, resolve
+from django.utils import dateformat, timezone
+
+from .access import get_allowed_category_ids
+from .leaderboard import get_top_entries
+from .models import QuizSubmission
+from .snapshots import get_quiz_snapshot
+
+# Messages a slow client may fall behind by before its stream is ended
+QUEUE_SIZE = 100
+
+# Channels of the running event loop, by quiz id
+_channels_by_loop = weakref.WeakKeyDictionary()
+
+
+def format_event(event, data):
+    """One SSE message"""
+    return f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+def _entry_row(rank, entry):
+    return {
+        'rank': rank,
+        'trainee_id': entry.trainee_id,
+        'username': entry.username,
+        'score': f'{entry.score:.1f}',
+        'submitted_at': dateformat.format(timezone.localtime(entry.submitted_at), 'M d, Y g:i A'),
+    }
+
+
+def leaderboard_delta(previous, entries):
+    """Rows of ``entries`` that differ from ``previous``, by rank"""
+    changed = [
+        _entry_row(rank, entry)
+        for rank, entry in enumerate(entries, start=1)
+        if rank > len(previous) or previous[rank - 1] != entry
+    ]
+    return {'size': len(entries), 'changed': changed}
+
+
+def _read_leaderboard(quiz_id):
+    try:
+        return get_top_entries(quiz_id)
+    finally:
+        # No request ends in this thread to close what a rebuild opened
+        close_old_connections()
+
+
+def timer_payload(deadline):
+    """``timer`` event data for a trainee whose exam ends at ``deadline``"""
+    now = timezone.now()
+    return {
+        'deadline': deadline.timestamp(),
+        'remaining': max(0, int((deadline - now).total_seconds())),
+        'server_time': now.timestamp(),
+    }
+
+
+class _Subscriber:
+    __slots__ = ('queue', 'leaderboard')
+
+    def __init__(self, leaderboard):
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.leaderboard = leaderboard
+
+
+class QuizChannel:
+    """The streams of one quiz in this process and the task that feeds them"""
+
+    def __init__(self, quiz_id):
+        self.quiz_id = quiz_id
+        self.subscribers = set()
+        self.entries = None
+        self.task = None
+
+    def subscribe(self, leaderboard=True):
+        subscriber = _Subscriber(leaderboard)
+        self.subscribers.add(subscriber)
+        if leaderboard and self.entries is not None:
+            subscriber.queue.put_nowait(format_event('leaderboard', leaderboard_delta((), self.entries)))
+        if self.task is None or self.task.done():
+            # In a fresh context: the task outlives the request that starts it
+            self.task = contextvars.Context().run(asyncio.get_running_loop().create_task, self.run())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    def publish(self, message, leaderboard=False):
+        """Queue a message for every subscriber; drop those too far behind"""
+        for subscriber in list(self.subscribers):
+            if leaderboard and not subscriber.leaderboard:
+                continue
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.subscribers.discard(subscriber)
+                # Make room for the end-of-stream marker
+                subscriber.queue.get_nowait()
+                subscriber.queue.put_nowait(None)
+
+    async def run(self):
+        last_tick = 0.0
+        try:
+            while self.subscribers:
+                if any(subscriber.leaderboard for subscriber in self.subscribers):
+                    entries = await sync_to_async(_read_leaderboard, thread_sensitive=False)(self.quiz_id)
+                    if entries != self.entries:
+                        delta = leaderboard_delta(self.entries or (), entries)
+                        self.entries = entries
+                        self.publish(format_event('leaderboard', delta), leaderboard=True)
+                if time.monotonic() - last_tick >= settings.LIVE_TICK_SECONDS:
+                    last_tick = time.monotonic()
+                    self.publish(format_event('tick', {'server_time': timezone.now().timestamp()}))
+                await asyncio.sleep(settings.LIVE_POLL_SECONDS)
+        finally:
+            # Without subscribers the cached rows may go stale; start afresh
+            self.entries = None
+
+
+def get_channel(quiz_id):
+    channels = _channels_by_loop.setdefault(asyncio.get_running_loop(), {})
+    channel = channels.get(quiz_id)
+    if channel is None:
+        channel = channels[quiz_id] = QuizChannel(quiz_id)
+    return channel
+
+
+async def event_stream(quiz_id, timer=None, leaderboard=True):
+    """Async iterator of SSE messages for one client"""
+    channel = get_channel(quiz_id)
+    subscriber = channel.subscribe(leaderboard)
+    closes_at = time.monotonic() + settings.LIVE_STREAM_SECONDS
+    try:
+        yield 'retry: 3000\n\n'
+        if timer is not None:
+            yield format_event('timer', timer)
+        while True:
+            remaining = closes_at - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), remaining)
+            except asyncio.TimeoutError:
+                return
+            if message is None:
+                return
+            yield message
+    finally:
+        channel.unsubscribe(subscriber)
+
+
+def _open_stream(scope, quiz_id):
+    """
+    Check an events request like the view stack would: host, session, user
+    and category access. Returns ``(status, timer)``; runs in a pool thread.
+    """
+    try:
+        request = ASGIRequest(scope, io.BytesIO())
+        try:
+            request.get_host()
+        except DisallowedHost:
+            return 400, None
+        session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+        user = get_user(request)
+        if not user.is_authenticated:
+            return 403, None
+
+        quiz = get_quiz_snapshot(quiz_id)
+        if quiz is None:
+            return 404, None
+        if quiz.category_id and quiz.category_id not in get_allowed_category_ids(user):
+            return 403, None
+
+        timer = None
+        if request.GET.get('timer') == '1':
+            deadline = (
+                QuizSubmission.objects.filter(quiz_id=quiz.id, trainee=user, is_completed=False)
+                .values_list('deadline', flat=True)
+                .first()
+            )
+            if deadline:
+                timer = timer_payload(deadline)
+        return 200, timer
+    finally:
+        # No request ends in this thread to close the connection
+        close_old_connections()
+
+
+async def _send_events(send, stream):
+    async for message in stream:
+        await send({'type': 'http.response.body', 'body': message.encode(), 'more_body': True})
+
+
+async def events_app(scope, receive, send, quiz_id):
+    """ASGI app for ``/quiz/<id>/events/``"""
+    if scope['method'] not in ('GET', 'HEAD'):
+        status, timer = 405, None
+    else:
+        status, timer = await sync_to_async(_open_stream, thread_sensitive=False)(scope, quiz_id)
+    if status != 200:
+        await send({'type': 'http.response.start', 'status': status, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'text/event-stream'),
+        (b'cache-control', b'no-cache'),
+        # Tell nginx to pass events on as they come instead of buffering them
+        (b'x-accel-buffering', b'no'),
+    ]})
+    query = parse_qs(scope.get('query_string', b'').decode())
+    stream = event_stream(quiz_id, timer=timer, leaderboard=query.get('leaderboard') != ['0'])
+    sender = asyncio.ensure_future(_send_events(send, stream))
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await asyncio.wait([sender, disconnect], return_when=asyncio.FIRST_COMPLETED)
+        client_gone = disconnect.done()
+    finally:
+        # Cancelling the sender unsubscribes the stream straight away
+        sender.cancel()
+        disconnect.cancel()
+        await asyncio.gather(sender, disconnect, return_exceptions=True)
+        await stream.aclose()
+    if not client_gone:
+        await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def _events_quiz_id(scope):
+    path = scope['path']
+    if not path.endswith('/events/'):
+        return None
+    root_path = scope.get('root_path', '')
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return None
+    return match.kwargs['quiz_id'] if match.url_name == 'quiz_events' else None
+
+
+def with_live_events(application):
+    """Wrap Django's ASGI application so it doesn't handle event streams"""
+    async def app(scope, receive, send):
+        if scope['type'] == 'http' and settings.LIVE_UPDATES:
+            quiz_id = _events_quiz_id(scope)
+            if quiz_id is not None:
+                return await events_app(scope, receive, send, quiz_id)
+        return await application(scope, receive, send)
+    return app
@@ -0,0 +1,402 @@
+"""
+Load-test driver that simulates a live exam cohort.
+
+``seed_cohort`` creates (or reuses) ``loadtest_NNNNN`` trainees registered to
+a "Load test" category and a fresh quiz for the run. ``run_cohort`` then drives
+every trainee through the real HTTP flow against a running server::
+
+    GET login, POST login, GET start_quiz, GET take_quiz,
+    POST submit_answer (once per question), POST submit_quiz,
+    GET quiz_results, GET quiz_leaderboard
+
+Each trainee is a thread with its own cookie jar, so sessions and CSRF work
+as in a browser. Redirects are not followed, so every request is timed
+against its own endpoint. Question and choice ids come from the database, so
+the server must use the same database as this process.
+
+``run_autosave_capacity`` instead keeps a growing number of signed-in
+trainees autosaving at once, to compare how many concurrent requests one
+server process (sync WSGI or async ASGI worker) sustains.
+"""
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Category, Choice, Question, Quiz, UserProfile
+
+USERNAME_PREFIX = 'loadtest_'
+CATEGORY_NAME = 'Load test'
+REQUEST_TIMEOUT = 60
+
+
+def _username(number):
+    return f'{USERNAME_PREFIX}{number:05d}'
+
+
+@transaction.atomic
+def seed_cohort(trainees, questions, choices, password, owner):
+    """
+    Make sure ``trainees`` load-test users exist and create a new quiz owned
+    by ``owner`` for this run. Returns ``(quiz, usernames)``.
+    """
+    category, _ = Category.objects.get_or_create(
+        name=CATEGORY_NAME, defaults={'description': 'Created by manage.py loadtest'},
+    )
+
+    usernames = [_username(n) for n in range(1, trainees + 1)]
+    existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    # One hash for every trainee; hashing each password would dominate seeding
+    password_hash = make_password(password)
+    User.objects.bulk_create(
+        [User(username=name, password=password_hash) for name in usernames if name not in existing],
+        batch_size=500,
+    )
+    User.objects.filter(username__in=existing).update(password=password_hash)
+
+    # bulk_create skips the post_save handler that creates profiles
+    user_ids = list(User.objects.filter(username__in=usernames).values_list('pk', flat=True))
+    with_profile = set(UserProfile.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+    UserProfile.objects.bulk_create(
+        [UserProfile(user_id=user_id) for user_id in user_ids if user_id not in with_profile],
+        batch_size=500,
+    )
+    through = UserProfile.registered_categories.through
+    profile_ids = UserProfile.objects.filter(user_id__in=user_ids).values_list('pk', flat=True)
+    through.objects.bulk_create(
+        [through(userprofile_id=profile_id, category_id=category.pk) for profile_id in profile_ids],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+    quiz = Quiz.objects.create(
+        title=f'Load test {timezone.now():%Y-%m-%d %H:%M:%S}',
+        description=f'{trainees} trainees, {questions} questions',
+        category=category,
+        created_by=owner,
+    )
+    question_objs = Question.objects.bulk_create([
+        Question(quiz=quiz, question_text=f'Question {n + 1}', question_type='multiple_choice', order=n)
+        for n in range(questions)
+    ])
+    if question_objs and question_objs[0].pk is None:
+        # MySQL doesn't return primary keys from bulk inserts
+        question_objs = list(quiz.questions.all())
+    Choice.objects.bulk_create([
+        Choice(question=question, choice_text=f'Option {n}', is_correct=n == 1)
+        for question in question_objs
+        for n in range(1, choices + 1)
+    ])
+    return quiz, usernames
+
+
+def cleanup_cohort():
+    """Delete every load-test trainee, quiz and the load-test category"""
+    with transaction.atomic():
+        quizzes = Quiz.objects.filter(category__name=CATEGORY_NAME).delete()[0]
+        users = User.objects.filter(username__startswith=USERNAME_PREFIX).delete()[0]
+        Category.objects.filter(name=CATEGORY_NAME).delete()
+    return quizzes, users
+
+
+def answer_plan(quiz):
+    """``[(question_id, [choice_id, ...]), ...]`` in question order"""
+    plan = defaultdict(list)
+    for question_id, choice_id in (
+        Choice.objects.filter(question__quiz=quiz).order_by('question__order', 'question_id', 'pk')
+        .values_list('question_id', 'pk')
+    ):
+        plan[question_id].append(choice_id)
+    return list(plan.items())
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class TraineeClient:
+    """One simulated browser: cookie jar, CSRF token and timed requests"""
+
+    def __init__(self, base_url, record):
+        self.base_url = base_url.rstrip('/')
+        self.record = record
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect(),
+        )
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == settings.CSRF_COOKIE_NAME:
+                return cookie.value
+        return ''
+
+    def request(self, endpoint, path, data=None, expect=(200,)):
+        """Send one request and record its latency under ``endpoint``"""
+        url = self.base_url + path
+        headers = {'Referer': url}
+        body = None
+        if data is not None:
+            body = urllib.parse.urlencode(data).encode()
+            headers['X-CSRFToken'] = self.csrf_token()
+        started = time.perf_counter()
+        location = None
+        try:
+            try:
+                response = self.opener.open(
+                    urllib.request.Request(url, data=body, headers=headers), timeout=REQUEST_TIMEOUT,
+                )
+            except urllib.error.HTTPError as e:
+                # Redirects and error statuses arrive here
+                response = e
+            with response:
+                response.read()
+                status = response.status
+                location = response.headers.get('Location')
+        except (OSError, urllib.error.URLError) as e:
+            self.record(endpoint, time.perf_counter() - started, False, f'{type(e).__name__}: {e}')
+            return None, None
+        ok = status in expect
+        self.record(endpoint, time.perf_counter() - started, ok, None if ok else f'HTTP {status}')
+        return status, location
+
+
+def _trainee_flow(client, username, password, quiz_id, plan, think_time):
+    """Run one trainee through the exam; returns True if every step succeeded"""
+    client.request('GET login', reverse('login'))
+    status, _ = client.request(
+        'POST login', reverse('login'), {'username': username, 'password': password}, expect=(302,),
+    )
+    if status != 302:
+        return False
+    status, _ = client.request('GET start_quiz', reverse('start_quiz', args=[quiz_id]), expect=(302,))
+    if status != 302:
+        return False
+    status, _ = client.request('GET take_quiz', reverse('take_quiz', args=[quiz_id]))
+    if status != 200:
+        return False
+
+    ok = True
+    for question_id, choice_ids in plan:
+        if think_time:
+            time.sleep(random.uniform(0, 2 * think_time))
+        status, _ = client.request('POST submit_answer', reverse('submit_answer', args=[quiz_id]), {
+            'question_id': question_id,
+            'choice_id': random.choice(choice_ids),
+        })
+        ok = ok and status == 200
+
+    status, location = client.request(
+        'POST submit_quiz', reverse('submit_quiz', args=[quiz_id]), {}, expect=(302,),
+    )
+    if status != 302 or not location:
+        return False
+    status, _ = client.request('GET quiz_results', urllib.parse.urlsplit(location).path)
+    ok = ok and status == 200
+    status, _ = client.request('GET quiz_leaderboard', reverse('quiz_leaderboard', args=[quiz_id]))
+    return ok and status == 200
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def summarize(samples, wall_seconds):
+    """Per-endpoint count, errors, throughput and latency percentiles in ms"""
+    endpoints = {}
+    for endpoint, rows in samples.items():
+        latencies = sorted(seconds * 1000 for seconds, ok, error in rows)
+        errors = [error for seconds, ok, error in rows if not ok]
+        endpoints[endpoint] = {
+            'count': len(rows),
+            'errors': len(errors),
+            'error_samples': sorted(set(errors))[:5],
+            'rps': round(len(rows) / wall_seconds, 2) if wall_seconds else None,
+            'mean_ms': round(sum(latencies) / len(latencies), 2),
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'max_ms': round(latencies[-1], 2),
+        }
+    return endpoints
+
+
+def run_cohort(base_url, usernames, password, quiz, concurrency, ramp_up=0.0, think_time=0.0):
+    """
+    Drive every trainee through the exam flow, at most ``concurrency`` at a
+    time, starting them evenly over ``ramp_up`` seconds. Returns the result
+    dict that ``manage.py loadtest`` saves as JSON.
+    """
+    plan = answer_plan(quiz)
+    samples = defaultdict(list)
+    lock = threading.Lock()
+
+    def record(endpoint, seconds, ok, error):
+        with lock:
+            samples[endpoint].append((seconds, ok, error))
+
+    def run_one(index, username):
+        if ramp_up:
+            time.sleep(ramp_up * index / len(usernames))
+        try:
+            return _trainee_flow(TraineeClient(base_url, record), username, password, quiz.pk, plan, think_time)
+        except Exception as e:
+            record('flow', 0.0, False, f'{type(e).__name__}: {e}')
+            return False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(run_one, range(len(usernames)), usernames))
+    wall_seconds = time.perf_counter() - started
+
+    total_requests = sum(len(rows) for rows in samples.values())
+    total_errors = sum(1 for rows in samples.values() for seconds, ok, error in rows if not ok)
+    return {
+        'meta': run_metadata(base_url),
+        'config': {
+            'trainees': len(usernames),
+            'concurrency': concurrency,
+            'questions': len(plan),
+            'ramp_up': ramp_up,
+            'think_time': think_time,
+            'quiz_id': quiz.pk,
+        },
+        'wall_seconds': round(wall_seconds, 3),
+        'requests': total_requests,
+        'errors': total_errors,
+        'throughput_rps': round(total_requests / wall_seconds, 2) if wall_seconds else None,
+        'flows_completed': sum(outcomes),
+        'flows_per_second': round(sum(outcomes) / wall_seconds, 2) if wall_seconds else None,
+        'endpoints': summarize(samples, wall_seconds),
+    }
+
+
+def run_autosave_capacity(base_url, usernames, password, quiz, levels, duration):
+    """
+    Measure how one server copes with more and more trainees autosaving at
+    once. Every trainee logs in and starts the quiz first; then, for each
+    level in ``levels``, that many trainees post answers back to back for
+    ``duration`` seconds. Returns the result dict that
+    ``manage.py bench_concurrency`` saves as JSON.
+    """
+    plan = answer_plan(quiz)
+    url = reverse('submit_answer', args=[quiz.pk])
+    samples = defaultdict(list)
+    lock = threading.Lock()
+
+    def record(endpoint, seconds, ok, error):
+        with lock:
+            samples[endpoint].append((seconds, ok, error))
+
+    def sign_in(username):
+        client = TraineeClient(base_url, record)
+        client.request('GET login', reverse('login'))
+        status, _ = client.request(
+            'POST login', reverse('login'), {'username': username, 'password': password}, expect=(302,),
+        )
+        if status == 302:
+            client.request('GET start_quiz', reverse('start_quiz', args=[quiz.pk]), expect=(302,))
+        return client
+
+    # A few at a time, so logins don't crowd out the measurement or SQLite
+    with ThreadPoolExecutor(max_workers=min(8, len(usernames))) as executor:
+        clients = list(executor.map(sign_in, usernames))
+    setup = summarize(samples, 0)
+
+    def autosave_until(client, endpoint, deadline):
+        while time.perf_counter() < deadline:
+            question_id, choice_ids = random.choice(plan)
+            client.request(endpoint, url, {'question_id': question_id, 'choice_id': random.choice(choice_ids)})
+
+    results = []
+    for level in levels:
+        endpoint = f'{level} concurrent'
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=level) as executor:
+            for client in clients[:level]:
+                executor.submit(autosave_until, client, endpoint, deadline)
+        wall_seconds = time.perf_counter() - started
+        rows = samples.pop(endpoint, [])
+        stats = summarize({endpoint: rows}, wall_seconds)[endpoint] if rows else {'count': 0, 'errors': 0}
+        results.append({'concurrency': level, **stats})
+
+    return {
+        'meta': run_metadata(base_url),
+        'config': {
+            'trainees': len(usernames),
+            'levels': list(levels),
+            'duration': duration,
+            'quiz_id': quiz.pk,
+        },
+        'setup': setup,
+        'levels': results,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_metadata(base_url):
+    """What was measured, so saved runs can be told apart"""
+    return {
+        'timestamp': timezone.now().isoformat(),
+        'commit': _git_revision(),
+        'base_url': base_url,
+        # Set by loadtest.sh: wsgi or asgi
+        'server': os.environ.get('LOADTEST_SERVER'),
+        'database': connection.vendor,
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'answer_write_behind': getattr(settings, 'ANSWER_WRITE_BEHIND', False),
+        'quiz_metrics': getattr(settings, 'QUIZ_METRICS', False),
+        'cache_backend': settings.CACHES['default']['BACKEND'],
+        'session_engine': settings.SESSION_ENGINE,
+    }
+
+
+def compare(baseline, current):
+    """Rows of ``(endpoint, metric, before, after, change %)`` for two results"""
+    rows = []
+    for endpoint in sorted(set(baseline['endpoints']) | set(current['endpoints'])):
+        before = baseline['endpoints'].get(endpoint, {})
+        after = current['endpoints'].get(endpoint, {})
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'errors'):
+            old, new = before.get(metric), after.get(metric)
+            change = round((new - old) / old * 100, 1) if old and new is not None else None
+            rows.append((endpoint, metric, old, new, change))
+    old, new = baseline.get('throughput_rps'), current.get('throughput_rps')
+    rows.append(('total', 'throughput_rps', old, new, round((new - old) / old * 100, 1) if old and new else None))
+    return rows
+
+
+def load_result(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,89 @@
+import json
+import os
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from quiz_app import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        'Keep more and more trainees autosaving at once against a running server and report '
+        'throughput and latency per concurrency level'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url', default='http://127.0.0.1:8000',
+            help='Server to test; it must use the same database as this command (default: http://127.0.0.1:8000)',
+        )
+        parser.add_argument(
+            '--levels', default='1,10,50,100',
+            help='Comma-separated numbers of trainees autosaving at once (default: 1,10,50,100)',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=10.0,
+            help='Seconds each level runs for (default: 10)',
+        )
+        parser.add_argument('--questions', type=int, default=20, help='Questions in the seeded quiz (default: 20)')
+        parser.add_argument('--password', default='loadtest-pass', help='Password given to the load-test trainees')
+        parser.add_argument(
+            '--output', default=None,
+            help='Results file (default: loadtest_results/<timestamp>-<commit>-concurrency.json; "-" prints to stdout)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            levels = sorted({int(level) for level in options['levels'].split(',') if level.strip()})
+        except ValueError:
+            raise CommandError('--levels must be comma-separated numbers, e.g. 1,10,50')
+        if not levels or levels[0] < 1 or options['duration'] <= 0 or options['questions'] < 1:
+            raise CommandError('Need levels of 1 or more, a positive --duration and at least 1 question.')
+
+        owner = User.objects.filter(is_superuser=True).order_by('pk').first()
+        if owner is None:
+            raise CommandError('Create a superuser first; the seeded quiz needs an owner.')
+
+        quiz, usernames = loadtest.seed_cohort(levels[-1], options['questions'], 4, options['password'], owner)
+        self.stdout.write(
+            f'Seeded quiz {quiz.pk}; signing in {len(usernames)} trainees at {options["base_url"]}, '
+            f'then {options["duration"]:g}s per level'
+        )
+
+        result = loadtest.run_autosave_capacity(
+            options['base_url'], usernames, options['password'], quiz, levels, options['duration'],
+        )
+        setup_errors = sum(stats['errors'] for stats in result['setup'].values())
+        if setup_errors:
+            self.stdout.write(self.style.WARNING(f'{setup_errors} sign-in request(s) failed'))
+
+        self.stdout.write(
+            f'\n{"concurrent":>10}{"requests":>10}{"errors":>8}{"req/s":>9}'
+            f'{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"max ms":>10}'
+        )
+        for stats in result['levels']:
+            if not stats['count']:
+                self.stdout.write(f'{stats["concurrency"]:>10}{0:>10}')
+                continue
+            self.stdout.write(
+                f'{stats["concurrency"]:>10}{stats["count"]:>10}{stats["errors"]:>8}{stats["rps"]:>9.1f}'
+                f'{stats["p50_ms"]:>10.1f}{stats["p95_ms"]:>10.1f}{stats["p99_ms"]:>10.1f}{stats["max_ms"]:>10.1f}'
+            )
+        self.save_result(result, options['output'])
+
+    def save_result(self, result, output):
+        payload = json.dumps(result, indent=2)
+        if output == '-':
+            self.stdout.write(payload)
+            return
+        if output is None:
+            directory = os.path.join(settings.BASE_DIR, 'loadtest_results')
+            os.makedirs(directory, exist_ok=True)
+            name = f'{timezone.now():%Y%m%d-%H%M%S}-{result["meta"]["commit"] or "nogit"}-concurrency.json'
+            output = os.path.join(directory, name)
+        with open(output, 'w') as f:
+            f.write(payload + '\n')
+        self.stdout.write(self.style.SUCCESS(f'Results saved to {output}'))
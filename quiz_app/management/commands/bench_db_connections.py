@@ -0,0 +1,106 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.db.utils import load_backend
+
+from quiz_app.loadtest import percentile
+
+POOL_ENGINE = 'quiz_app.db_backends.mysql_pool'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare per-request database latency when reconnecting every request, '
+        'with persistent connections, and with the connection pool'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database to benchmark (default: default)')
+        parser.add_argument('--threads', type=int, default=4, help='Concurrent request threads (default: 4)')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per thread and mode (default: 200)')
+        parser.add_argument(
+            '--query', default='SELECT 1',
+            help='Statement each simulated request runs (default: SELECT 1)',
+        )
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1 or options['requests'] < 1:
+            raise CommandError('--threads and --requests must be at least 1.')
+        base = dict(connections[options['database']].settings_dict)
+        vendor = connections[options['database']].vendor
+        plain_engine = 'django.db.backends.mysql' if base['ENGINE'] == POOL_ENGINE else base['ENGINE']
+
+        modes = [
+            ('reconnect', {'ENGINE': plain_engine, 'CONN_MAX_AGE': 0}),
+            ('persistent', {'ENGINE': plain_engine, 'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True}),
+        ]
+        if vendor == 'mysql':
+            modes.append(('pool', {
+                'ENGINE': POOL_ENGINE, 'CONN_MAX_AGE': 0,
+                'POOL': {**base.get('POOL', {}), 'MAX_IDLE': options['threads']},
+            }))
+        else:
+            self.stdout.write(self.style.WARNING(f'The pool backend is MySQL only; skipping it on {vendor}.'))
+
+        self.stdout.write(
+            f'{options["threads"]} threads x {options["requests"]} requests per mode, running "{options["query"]}"\n'
+        )
+        self.stdout.write(f'{"mode":<12}{"mean ms":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"connects":>10}')
+        for name, overrides in modes:
+            latencies, connects = self.run_mode(
+                f'bench_{name}', {**base, **overrides}, options['threads'], options['requests'], options['query'],
+            )
+            latencies.sort()
+            self.stdout.write(
+                f'{name:<12}{sum(latencies) / len(latencies):>10.2f}{percentile(latencies, 0.50):>10.2f}'
+                f'{percentile(latencies, 0.95):>10.2f}{percentile(latencies, 0.99):>10.2f}{connects:>10}'
+            )
+
+    def run_mode(self, alias, settings_dict, threads, requests, query):
+        """Time ``requests`` simulated requests in each of ``threads`` threads"""
+        backend = load_backend(settings_dict['ENGINE'])
+        latencies = []
+        connects = []
+        lock = threading.Lock()
+
+        def count_connect(sender, connection, **kwargs):
+            if connection.alias == alias:
+                with lock:
+                    connects.append(1)
+
+        def worker():
+            # One wrapper per thread, as Django keeps one per request thread
+            wrapper = backend.DatabaseWrapper(dict(settings_dict), alias)
+            timings = []
+            try:
+                for _ in range(requests):
+                    started = time.perf_counter()
+                    # What the request_started/request_finished handlers do
+                    wrapper.close_if_unusable_or_obsolete()
+                    with wrapper.cursor() as cursor:
+                        cursor.execute(query)
+                        cursor.fetchall()
+                    wrapper.close_if_unusable_or_obsolete()
+                    timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                wrapper.close()
+            with lock:
+                latencies.extend(timings)
+
+        connection_created.connect(count_connect)
+        try:
+            workers = [threading.Thread(target=worker) for _ in range(threads)]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+        finally:
+            connection_created.disconnect(count_connect)
+
+        if settings_dict['ENGINE'] == POOL_ENGINE:
+            # Checkouts from the pool also fire connection_created
+            return latencies, backend.get_pool(alias, settings_dict['POOL']).stats()['created']
+        return latencies, len(connects)
@@ -0,0 +1,94 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from quiz_app.loadtest import percentile
+
+SESSION_ENGINES = [
+    ('db', 'django.contrib.sessions.backends.db'),
+    ('cached_db', 'django.contrib.sessions.backends.cached_db'),
+    ('signed_cookies', 'django.contrib.sessions.backends.signed_cookies'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare database queries and latency per request for each session engine'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username', default=None,
+            help='User to log in as (default: the first active trainee)',
+        )
+        parser.add_argument(
+            '--url', action='append', default=[], metavar='URL_NAME',
+            help='Page to request, by URL name without arguments (repeatable, default: quiz_list)',
+        )
+        parser.add_argument('--requests', type=int, default=50, help='Requests per page and engine (default: 50)')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1.')
+        users = User.objects.filter(is_active=True)
+        if options['username']:
+            user = users.filter(username=options['username']).first()
+        else:
+            user = users.filter(is_staff=False).order_by('pk').first()
+        if user is None:
+            raise CommandError('No matching active user to log in as; pass --username.')
+        urls = [reverse(name) for name in options['url'] or ['quiz_list']]
+
+        self.stdout.write(
+            f'{options["requests"]} requests to {", ".join(urls)} as {user.username}, '
+            f'cache backend {settings.CACHES["default"]["BACKEND"].rsplit(".", 1)[-1]}\n'
+        )
+        self.stdout.write(
+            f'{"engine":<16}{"queries/req":>12}{"session q/req":>14}{"mean ms":>10}{"p95 ms":>10}'
+        )
+        for name, engine in SESSION_ENGINES:
+            queries, session_queries, latencies = self.run_engine(engine, user, urls, options['requests'])
+            count = len(latencies)
+            latencies.sort()
+            self.stdout.write(
+                f'{name:<16}{queries / count:>12.2f}{session_queries / count:>14.2f}'
+                f'{sum(latencies) / count:>10.2f}{percentile(latencies, 0.95):>10.2f}'
+            )
+
+    def run_engine(self, engine, user, urls, requests):
+        """Log in with ``engine`` and time warm requests, counting their queries"""
+        counts = {'queries': 0, 'session': 0}
+
+        def count(execute, sql, params, many, context):
+            counts['queries'] += 1
+            if 'django_session' in sql:
+                counts['session'] += 1
+            return execute(sql, params, many, context)
+
+        latencies = []
+        # Whatever the pages write is rolled back; the session itself is
+        # flushed at the end so no cached copy outlives the run.
+        with override_settings(SESSION_ENGINE=engine, ALLOWED_HOSTS=['testserver']), transaction.atomic():
+            client = Client()
+            client.force_login(user)
+            for url in urls:
+                # Warm the quiz and access caches so only the session differs
+                client.get(url)
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(count))
+                for _ in range(requests):
+                    for url in urls:
+                        started = time.perf_counter()
+                        response = client.get(url)
+                        latencies.append((time.perf_counter() - started) * 1000)
+                        if response.status_code != 200:
+                            raise CommandError(f'{url} returned {response.status_code} with {engine}')
+            client.logout()
+            transaction.set_rollback(True)
+        return counts['queries'], counts['session'], latencies
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_app.models import QuizSubmission
+from quiz_app.query_plans import hot_querysets, queryset_full_scans
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the queries of the trainee and staff views and fail on full table scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--submission', type=int, default=None,
+            help='Submission whose trainee and quiz are used (default: the newest one on an active quiz)',
+        )
+        parser.add_argument(
+            '--allow', action='append', default=[], metavar='TABLE',
+            help='Table that may be scanned, e.g. a lookup table with a handful of rows (repeatable)',
+        )
+
+    def handle(self, *args, **options):
+        submissions = QuizSubmission.objects.all()
+        if options['submission']:
+            submission = submissions.filter(pk=options['submission']).first()
+        else:
+            submission = submissions.filter(quiz__is_active=True).order_by('-pk').first()
+        if submission is None:
+            raise CommandError('Need a quiz submission to take ids from; take a quiz or pass --submission.')
+
+        # Only EXPLAIN is run: no requests, so nothing is written to the
+        # database or the shared cache
+        querysets = hot_querysets(submission)
+        problems = []
+        for page, description, queryset in querysets:
+            tables = [table for table in queryset_full_scans(queryset) if table not in options['allow']]
+            if tables:
+                problems.append((page, description, queryset, tables))
+
+        for page, description, queryset, tables in problems:
+            self.stdout.write(self.style.ERROR(f'{page} ({description}): full scan of {", ".join(tables)}'))
+            self.stdout.write(f'  {queryset.query}')
+        if problems:
+            raise CommandError(f'{len(problems)} quer(ies) scan whole tables')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(querysets)} queries from {len({page for page, _, _ in querysets})} views use indexes '
+            f'(submission {submission.pk})'
+        ))
@@ -0,0 +1,58 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_app.checks import require_shared_cache
+from quiz_app.grading import finalize_expired_submissions
+
+
+class Command(BaseCommand):
+    help = 'Submit and score exams whose deadline passed without a submission'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=60.0,
+            help='Seconds between sweeps when running continuously (default: 60)',
+        )
+        parser.add_argument('--once', action='store_true', help='Sweep once and exit (e.g. from cron)')
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Number of submissions finalized per transaction (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+        require_shared_cache('expire_submissions')
+
+        if options['once']:
+            self._sweep(options['chunk_size'], quiet=False)
+            return
+
+        # Finish the current sweep on SIGTERM/SIGINT; each chunk is its own
+        # transaction, so stopping mid-sweep would only leave work for the next run.
+        stopping = []
+
+        def request_stop(signum, frame):
+            stopping.append(signum)
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        self.stdout.write(f'Finalizing expired submissions every {options["interval"]}s')
+        while not stopping:
+            next_sweep = time.monotonic() + options['interval']
+            self._sweep(options['chunk_size'], quiet=True)
+            # Short sleeps, so a stop request doesn't wait out a long interval
+            while not stopping and time.monotonic() < next_sweep:
+                time.sleep(min(1.0, max(0.0, next_sweep - time.monotonic())))
+        self.stdout.write('Expiry sweeper stopped')
+
+    def _sweep(self, chunk_size, quiet):
+        result = finalize_expired_submissions(chunk_size=chunk_size)
+        if result['finalized'] or not quiet:
+            self.stdout.write(self.style.SUCCESS(
+                f'Finalized {result["finalized"]} expired submission(s) across {result["quizzes"]} quiz(zes) '
+                f'in {result["seconds"]:.2f}s ({result["per_second"]:.0f} submissions/s)'
+            ))
@@ -0,0 +1,59 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_app.excel_utils import write_quizzes_excel
+from quiz_app.interchange import format_for_filename, write_quizzes_csv, write_quizzes_jsonl
+from quiz_app.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Export quizzes with their questions and choices to JSONL, CSV or Excel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='File to write (.jsonl, .csv or .xlsx), or - for stdout')
+        parser.add_argument('quiz_ids', nargs='*', type=int, help='IDs of the quizzes to export (default: all)')
+        parser.add_argument(
+            '--format', choices=['jsonl', 'csv', 'xlsx'],
+            help='Output format (default: taken from the file extension, jsonl for stdout)',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=100,
+            help='Quizzes read from the database per query batch (default: 100)',
+        )
+
+    def handle(self, *args, **options):
+        output = options['output']
+        fmt = options['format'] or ('jsonl' if output == '-' else format_for_filename(output))
+        if fmt is None:
+            raise CommandError('Cannot tell the format from the file name; pass --format.')
+        if fmt == 'xlsx' and output == '-':
+            raise CommandError('Excel exports must be written to a file.')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+
+        queryset = Quiz.objects.order_by('pk')
+        if options['quiz_ids']:
+            queryset = queryset.filter(pk__in=options['quiz_ids'])
+
+        started = time.monotonic()
+        if fmt == 'xlsx':
+            with open(output, 'wb') as fileobj:
+                write_quizzes_excel(queryset, fileobj, chunk_size=options['chunk_size'])
+            count = queryset.count()
+        else:
+            writer = write_quizzes_jsonl if fmt == 'jsonl' else write_quizzes_csv
+            if output == '-':
+                count = writer(queryset, sys.stdout, chunk_size=options['chunk_size'])
+            else:
+                with open(output, 'w', encoding='utf-8', newline='') as fileobj:
+                    count = writer(queryset, fileobj, chunk_size=options['chunk_size'])
+        elapsed = time.monotonic() - started
+
+        # Keep stdout clean when it carries the export itself
+        stream = self.stderr if output == '-' else self.stdout
+        stream.write(self.style.SUCCESS(
+            f'Exported {count} quiz(zes) as {fmt} in {elapsed:.2f}s'
+            f' ({count / elapsed if elapsed > 0 else 0:.0f} quizzes/s)'
+        ))
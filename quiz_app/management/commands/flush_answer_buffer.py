@@ -0,0 +1,54 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_app import answer_buffer
+
+
+class Command(BaseCommand):
+    help = 'Move autosaved answers from the write-behind buffer to the Answer table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=2.0,
+            help='Seconds between flushes when running continuously (default: 2)',
+        )
+        parser.add_argument('--once', action='store_true', help='Flush once and exit')
+        parser.add_argument(
+            '--batch-size', type=int, default=answer_buffer.FLUSH_BATCH_SIZE,
+            help='Answers written per database transaction',
+        )
+
+    def handle(self, *args, **options):
+        if not answer_buffer.is_enabled():
+            raise CommandError('ANSWER_WRITE_BEHIND is not enabled in settings.')
+
+        buffer = answer_buffer.get_buffer()
+        if options['once']:
+            flushed = buffer.flush(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Flushed {flushed} buffered answer(s)'))
+            return
+
+        # Finish the current batch on SIGTERM/SIGINT instead of dying mid-flush;
+        # an unfinished batch would be retried anyway, this just avoids the redo.
+        stopping = []
+
+        def request_stop(signum, frame):
+            stopping.append(signum)
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        self.stdout.write(f'Flushing answer buffer {buffer.path} every {options["interval"]}s')
+        while not stopping:
+            started = time.monotonic()
+            flushed = buffer.flush(batch_size=options['batch_size'])
+            if flushed:
+                elapsed = time.monotonic() - started
+                self.stdout.write(f'Flushed {flushed} answer(s) in {elapsed:.3f}s')
+            time.sleep(max(0.0, options['interval'] - (time.monotonic() - started)))
+
+        # Drain whatever arrived before shutting down
+        buffer.flush(batch_size=options['batch_size'])
+        self.stdout.write('Answer buffer flusher stopped')
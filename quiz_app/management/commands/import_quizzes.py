@@ -0,0 +1,76 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_app.checks import require_shared_cache
+from quiz_app.excel_utils import import_quizzes_from_excel
+from quiz_app.interchange import IMPORT_BATCH_SIZE, format_for_filename, import_quizzes_from_file
+
+
+class Command(BaseCommand):
+    help = 'Import quizzes with their questions and choices from JSONL, CSV or Excel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='File to read (.jsonl, .csv or .xlsx), or - for stdin')
+        parser.add_argument(
+            '--format', choices=['jsonl', 'csv', 'xlsx'],
+            help='Input format (default: taken from the file extension, jsonl for stdin)',
+        )
+        parser.add_argument(
+            '--user', default='admin',
+            help='Username used for quizzes whose creator does not exist (default: admin)',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Validate the file against the database and roll back instead of saving',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help=f'Quizzes written per bulk batch for JSONL/CSV (default: {IMPORT_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        source = options['input']
+        fmt = options['format'] or ('jsonl' if source == '-' else format_for_filename(source))
+        if fmt is None:
+            raise CommandError('Cannot tell the format from the file name; pass --format.')
+        if fmt == 'xlsx' and source == '-':
+            raise CommandError('Excel imports must be read from a file.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        if not options['dry_run']:
+            require_shared_cache('import_quizzes')
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["user"]}" not found.')
+
+        try:
+            if fmt == 'xlsx':
+                result = import_quizzes_from_excel(source, user, dry_run=options['dry_run'])
+            elif source == '-':
+                result = import_quizzes_from_file(
+                    sys.stdin.buffer, fmt, user, dry_run=options['dry_run'], batch_size=options['batch_size'],
+                )
+            else:
+                with open(source, 'rb') as fileobj:
+                    result = import_quizzes_from_file(
+                        fileobj, fmt, user, dry_run=options['dry_run'], batch_size=options['batch_size'],
+                    )
+        except (OSError, UnicodeDecodeError) as e:
+            raise CommandError(f'Could not read {source}: {e}')
+
+        for error in result['errors']:
+            self.stderr.write(error)
+        if 'rows' not in result:
+            raise CommandError('Import failed.')
+
+        action = 'Validated' if options['dry_run'] else 'Imported'
+        message = (
+            f'{action} {result["success_count"]} quiz(zes), {result["rows"]} rows in {result["seconds"]:.2f}s '
+            f'({result["rows_per_second"]:.0f} rows/s), {len(result["errors"])} error(s)'
+        )
+        if options['dry_run']:
+            message += '; nothing was saved'
+        self.stdout.write(self.style.SUCCESS(message) if result['success'] else self.style.WARNING(message))
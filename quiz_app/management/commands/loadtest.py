@@ -0,0 +1,132 @@
+import json
+import os
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from quiz_app import loadtest
+
+
+class Command(BaseCommand):
+    help = 'Drive simulated trainees through a full exam against a running server and report latencies'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url', default='http://127.0.0.1:8000',
+            help='Server to test; it must use the same database as this command (default: http://127.0.0.1:8000)',
+        )
+        parser.add_argument('--trainees', type=int, default=50, help='Number of simulated trainees (default: 50)')
+        parser.add_argument(
+            '--concurrency', type=int, default=None,
+            help='Trainees taking the exam at the same time (default: all of them)',
+        )
+        parser.add_argument('--questions', type=int, default=20, help='Questions in the seeded quiz (default: 20)')
+        parser.add_argument('--choices', type=int, default=4, help='Choices per question (default: 4)')
+        parser.add_argument(
+            '--ramp-up', type=float, default=0.0,
+            help='Seconds over which trainee starts are spread (default: 0, all at once)',
+        )
+        parser.add_argument(
+            '--think-time', type=float, default=0.0,
+            help='Mean seconds a trainee waits before each answer (default: 0)',
+        )
+        parser.add_argument('--password', default='loadtest-pass', help='Password given to the load-test trainees')
+        parser.add_argument(
+            '--output', default=None,
+            help='Results file (default: loadtest_results/<timestamp>-<commit>.json; "-" prints to stdout)',
+        )
+        parser.add_argument('--compare', default=None, help='Earlier results file to compare this run against')
+        parser.add_argument(
+            '--cleanup', action='store_true',
+            help='Delete all load-test trainees and quizzes and exit',
+        )
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            quizzes, users = loadtest.cleanup_cohort()
+            self.stdout.write(self.style.SUCCESS(f'Deleted load-test data ({quizzes} quiz rows, {users} user rows)'))
+            return
+
+        trainees = options['trainees']
+        concurrency = options['concurrency'] or trainees
+        if trainees < 1 or concurrency < 1 or options['questions'] < 1 or options['choices'] < 2:
+            raise CommandError('Need at least 1 trainee, 1 question and 2 choices, and a concurrency of 1 or more.')
+
+        baseline = None
+        if options['compare']:
+            try:
+                baseline = loadtest.load_result(options['compare'])
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read {options["compare"]}: {e}')
+
+        owner = User.objects.filter(is_superuser=True).order_by('pk').first()
+        if owner is None:
+            raise CommandError('Create a superuser first; the seeded quiz needs an owner.')
+
+        quiz, usernames = loadtest.seed_cohort(
+            trainees, options['questions'], options['choices'], options['password'], owner,
+        )
+        self.stdout.write(
+            f'Seeded quiz {quiz.pk} with {options["questions"]} questions; '
+            f'running {trainees} trainees, {concurrency} at a time, against {options["base_url"]}'
+        )
+
+        result = loadtest.run_cohort(
+            options['base_url'], usernames, options['password'], quiz, concurrency,
+            ramp_up=options['ramp_up'], think_time=options['think_time'],
+        )
+        self.print_result(result)
+        if baseline is not None:
+            self.print_comparison(loadtest.compare(baseline, result))
+        self.save_result(result, options['output'])
+
+        if result['errors']:
+            self.stdout.write(self.style.WARNING(
+                f'{result["errors"]} request(s) failed; see "error_samples" in the results'
+            ))
+
+    def print_result(self, result):
+        self.stdout.write(
+            f'\n{"endpoint":<22}{"count":>7}{"errors":>8}{"req/s":>9}'
+            f'{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"max ms":>10}'
+        )
+        for endpoint, stats in result['endpoints'].items():
+            self.stdout.write(
+                f'{endpoint:<22}{stats["count"]:>7}{stats["errors"]:>8}{stats["rps"]:>9.1f}'
+                f'{stats["p50_ms"]:>10.1f}{stats["p95_ms"]:>10.1f}{stats["p99_ms"]:>10.1f}{stats["max_ms"]:>10.1f}'
+            )
+        self.stdout.write(
+            f'\n{result["requests"]} requests in {result["wall_seconds"]:.1f}s '
+            f'({result["throughput_rps"]:.1f} req/s), '
+            f'{result["flows_completed"]}/{result["config"]["trainees"]} exams completed'
+        )
+
+    def print_comparison(self, rows):
+        self.stdout.write(f'\n{"endpoint":<22}{"metric":<16}{"before":>10}{"after":>10}{"change":>9}')
+        for endpoint, metric, before, after, change in rows:
+            self.stdout.write(
+                f'{endpoint:<22}{metric:<16}{_fmt(before):>10}{_fmt(after):>10}'
+                f'{"" if change is None else f"{change:+.1f}%":>9}'
+            )
+
+    def save_result(self, result, output):
+        payload = json.dumps(result, indent=2)
+        if output == '-':
+            self.stdout.write(payload)
+            return
+        if output is None:
+            directory = os.path.join(settings.BASE_DIR, 'loadtest_results')
+            os.makedirs(directory, exist_ok=True)
+            name = f'{timezone.now():%Y%m%d-%H%M%S}-{result["meta"]["commit"] or "nogit"}.json'
+            output = os.path.join(directory, name)
+        with open(output, 'w') as f:
+            f.write(payload + '\n')
+        self.stdout.write(self.style.SUCCESS(f'Results saved to {output}'))
+
+
+def _fmt(value):
+    if value is None:
+        return '-'
+    return f'{value:.1f}' if isinstance(value, float) else str(value)
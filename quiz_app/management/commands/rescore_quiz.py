@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_app.checks import require_shared_cache
+from quiz_app.grading import rescore_quizzes
+from quiz_app.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Recompute stored scores of completed submissions after an answer key change'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='*', type=int, help='IDs of the quizzes to rescore')
+        parser.add_argument('--all', action='store_true', help='Rescore every quiz')
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Number of submissions updated per transaction (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        if options['all']:
+            quiz_ids = list(Quiz.objects.values_list('id', flat=True))
+        else:
+            quiz_ids = options['quiz_ids']
+            if not quiz_ids:
+                raise CommandError('Pass one or more quiz IDs, or --all.')
+            missing = set(quiz_ids) - set(Quiz.objects.filter(id__in=quiz_ids).values_list('id', flat=True))
+            if missing:
+                raise CommandError(f'Quiz(zes) not found: {", ".join(map(str, sorted(missing)))}')
+
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+        require_shared_cache('rescore_quiz')
+
+        result = rescore_quizzes(quiz_ids, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rescored {result["updated"]} submission(s) across {len(quiz_ids)} quiz(zes) '
+            f'in {result["seconds"]:.2f}s ({result["per_second"]:.0f} submissions/s)'
+        ))
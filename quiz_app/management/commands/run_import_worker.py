@@ -0,0 +1,63 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from quiz_app import import_jobs
+from quiz_app.checks import require_shared_cache
+
+
+class Command(BaseCommand):
+    help = 'Process quiz bank imports queued from the admin upload page'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=2.0,
+            help='Seconds to wait for new jobs when the queue is empty (default: 2)',
+        )
+        parser.add_argument('--once', action='store_true', help='Process the queued jobs and exit')
+        parser.add_argument(
+            '--stale-after', type=int, default=3600,
+            help='Requeue jobs that have been running longer than this many seconds (default: 3600)',
+        )
+
+    def handle(self, *args, **options):
+        require_shared_cache('run_import_worker')
+
+        # Finish the current job on SIGTERM/SIGINT; an interrupted import
+        # would roll back and be requeued, this just avoids redoing it.
+        stopping = []
+
+        def request_stop(signum, frame):
+            stopping.append(signum)
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        if not options['once']:
+            self.stdout.write(f'Waiting for import jobs every {options["interval"]}s')
+        while not stopping:
+            # Long-running process: drop connections the database has timed out
+            close_old_connections()
+            requeued = import_jobs.requeue_stale_jobs(options['stale_after'])
+            if requeued:
+                self.stdout.write(self.style.WARNING(f'Recovered {requeued} stale import job(s)'))
+
+            job = import_jobs.claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            self.stdout.write(f'Importing job {job.pk}: {job.file_name}')
+            job = import_jobs.run_job(job)
+            rows = f', {job.total_rows} rows in {job.seconds:.2f}s' if job.seconds else ''
+            message = f'Job {job.pk} {job.status}: {job.success_count} quiz(es), {len(job.errors)} error(s){rows}'
+            if job.status == job.STATUS_FAILED:
+                self.stdout.write(self.style.ERROR(message))
+            else:
+                self.stdout.write(self.style.SUCCESS(message))
+
+        self.stdout.write('Import worker stopped')
@@ -0,0 +1,270 @@
+"""
+Opt-in per-view query and timing instrumentation.
+
+With ``QUIZ_METRICS`` enabled, ``QueryMetricsMiddleware`` counts the SQL
+queries and database time of every request through a connection execute
+wrapper (so it works with ``DEBUG = False``), times template rendering via
+``TimedDjangoTemplates`` and the whole request, and:
+
+* adds a ``Server-Timing`` header, visible in the browser's network panel;
+* aggregates the numbers per URL name in this process, readable by staff at
+  ``/manage/metrics/`` (each gunicorn worker keeps its own figures).
+
+``/manage/metrics/`` also shows how often each database alias connected in
+this process, and the pool counters when the pooled MySQL backend is used,
+whether or not ``QUIZ_METRICS`` is on.
+
+``QueryBudgetMixin`` in ``quiz_app.testing`` uses the same counter to check
+the query budgets below in tests.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates
+
+# Highest expected query count per URL name for a request by a logged-in
+# user once the caches are warm (quiz snapshot, answer key, category access,
+# leaderboard), with the session and user lookups of db sessions included.
+# The first request after a quiz changes runs a few more to refill the cache.
+QUERY_BUDGETS = {
+    'quiz_list': 5,
+    'take_quiz': 5,
+    'quiz_questions': 4,
+    'submit_answer': 4,
+    'submit_answers': 4,
+    'submit_quiz': 6,
+    'quiz_results': 4,
+    'quiz_leaderboard': 4,
+    'user_list': 3,
+}
+
+# Recent request durations kept per URL name for percentiles
+SAMPLE_SIZE = 1000
+
+# Metrics of every capture_queries block active in this context, innermost
+# last; nested blocks (a budget assertion around a metered request) all count.
+_active = ContextVar('quiz_request_metrics', default=())
+
+
+class RequestMetrics:
+    """Counters for one request (or one ``capture_queries`` block)"""
+    __slots__ = ('queries', 'db_seconds', 'template_seconds', 'queries_by_alias')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.queries_by_alias = {}
+
+
+def _record_query(execute, sql, params, many, context):
+    active = _active.get()
+    if not active:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        alias = context['connection'].alias
+        for metrics in active:
+            metrics.db_seconds += elapsed
+            metrics.queries += 1
+            metrics.queries_by_alias[alias] = metrics.queries_by_alias.get(alias, 0) + 1
+
+
+@contextmanager
+def capture_queries():
+    """Count queries and DB time on every database alias inside the block"""
+    metrics = RequestMetrics()
+    token = _active.set(_active.get() + (metrics,))
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                # An enclosing block's wrapper already counts for this one
+                if _record_query not in connection.execute_wrappers:
+                    stack.enter_context(connection.execute_wrapper(_record_query))
+            yield metrics
+    finally:
+        _active.reset(token)
+
+
+class _TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+        self.origin = template.origin
+
+    def render(self, context=None, request=None):
+        active = _active.get()
+        if not active:
+            return self.template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            elapsed = time.perf_counter() - started
+            for metrics in active:
+                metrics.template_seconds += elapsed
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend that adds render time to the request metrics"""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+class _ViewStats:
+    __slots__ = (
+        'requests', 'queries', 'max_queries', 'queries_by_alias', 'db_ms', 'template_ms', 'total_ms', 'max_ms',
+        'samples',
+    )
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.queries_by_alias = {}
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def as_dict(self, name):
+        samples = sorted(self.samples)
+
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))], 2) if samples else None
+
+        return {
+            'requests': self.requests,
+            'avg_queries': round(self.queries / self.requests, 2),
+            'max_queries': self.max_queries,
+            'budget': QUERY_BUDGETS.get(name),
+            # Totals per database alias, to see what the replica router moved
+            'queries_by_alias': dict(self.queries_by_alias),
+            'avg_db_ms': round(self.db_ms / self.requests, 2),
+            'avg_template_ms': round(self.template_ms / self.requests, 2),
+            'avg_total_ms': round(self.total_ms / self.requests, 2),
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+            'max_ms': round(self.max_ms, 2),
+        }
+
+
+_stats = {}
+_connects = {}
+_stats_lock = threading.Lock()
+
+
+def record(view_name, metrics, total_seconds):
+    """Add one request's numbers to the in-process aggregate"""
+    total_ms = total_seconds * 1000
+    with _stats_lock:
+        stats = _stats.get(view_name)
+        if stats is None:
+            stats = _stats[view_name] = _ViewStats()
+        stats.requests += 1
+        stats.queries += metrics.queries
+        stats.max_queries = max(stats.max_queries, metrics.queries)
+        for alias, count in metrics.queries_by_alias.items():
+            stats.queries_by_alias[alias] = stats.queries_by_alias.get(alias, 0) + count
+        stats.db_ms += metrics.db_seconds * 1000
+        stats.template_ms += metrics.template_seconds * 1000
+        stats.total_ms += total_ms
+        stats.max_ms = max(stats.max_ms, total_ms)
+        stats.samples.append(total_ms)
+
+
+def get_stats():
+    """Aggregated metrics per URL name, for this process"""
+    with _stats_lock:
+        return {name: stats.as_dict(name) for name, stats in _stats.items()}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+        _connects.clear()
+
+
+@receiver(connection_created)
+def _count_connect(sender, connection, **kwargs):
+    with _stats_lock:
+        _connects[connection.alias] = _connects.get(connection.alias, 0) + 1
+    # Async views query from worker threads whose connections a
+    # capture_queries block on the event loop can't reach; the wrapper does
+    # nothing outside a block, so keep it on every connection.
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def get_connection_stats():
+    """
+    Django connects per alias in this process; with persistent connections
+    this stays far below the request count. With the pooled backend every
+    request connects, and the pool counters show how many were reused.
+    """
+    with _stats_lock:
+        stats = {alias: {'connects': count} for alias, count in _connects.items()}
+    for connection in connections.all():
+        if hasattr(connection, 'pool_stats'):
+            stats.setdefault(connection.alias, {'connects': 0})['pool'] = connection.pool_stats()
+    return stats
+
+
+def server_timing(metrics, total_seconds):
+    """Format request metrics as a Server-Timing header value"""
+    queries = f'{metrics.queries} queries'
+    if set(metrics.queries_by_alias) - {'default'}:
+        queries += ' (' + ', '.join(f'{alias} {count}' for alias, count in sorted(metrics.queries_by_alias.items())) + ')'
+    return ', '.join([
+        f'db;dur={metrics.db_seconds * 1000:.1f};desc="{queries}"',
+        f'tpl;dur={metrics.template_seconds * 1000:.1f};desc="templates"',
+        f'total;dur={total_seconds * 1000:.1f}',
+    ])
+
+
+class QueryMetricsMiddleware:
+    """Record per-request query count, DB, template and total time by URL name"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with capture_queries() as metrics:
+            response = self.get_response(request)
+        return self._finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with capture_queries() as metrics:
+            response = await self.get_response(request)
+        return self._finish(request, response, metrics, started)
+
+    def _finish(self, request, response, metrics, started):
+        total_seconds = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else '<unresolved>'
+        record(view_name, metrics, total_seconds)
+        response['Server-Timing'] = server_timing(metrics, total_seconds)
+        return response
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('quiz_app', '0004_create_default_categories'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_name', models.CharField(max_length=255)),
+                ('file_data', models.BinaryField(help_text='Uploaded workbook, cleared once the job has finished')),
+                ('dry_run', models.BooleanField(default=False, help_text='Validate only, roll back instead of saving')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('parsing', 'Reading file'), ('importing', 'Importing'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], db_index=True, default='queued', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('total_rows', models.PositiveIntegerField(blank=True, null=True)),
+                ('success_count', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('seconds', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('uploaded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.db import migrations, models
+
+# auth.User belongs to another app, so the index is managed here directly
+# instead of through the model state.
+INDEX = models.Index(fields=['date_joined', 'id'], name='quiz_user_joined_id_idx')
+
+
+def add_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model('auth', 'User'), INDEX)
+
+
+def remove_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('auth', 'User'), INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('quiz_app', '0005_importjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_index, remove_index),
+    ]
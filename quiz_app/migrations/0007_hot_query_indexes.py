@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_app', '0006_user_date_joined_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['category', 'is_active'], name='quiz_category_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizsubmission',
+            index=models.Index(fields=['quiz', '-score', 'submitted_at', 'is_completed'], name='quiz_sub_leaderboard_idx'),
+        ),
+    ]
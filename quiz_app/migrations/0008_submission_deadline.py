@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:18
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+from django.utils import timezone
+
+
+def set_open_submission_deadlines(apps, schema_editor):
+    """
+    Give exams in progress the deadline their page timer was counting to, but
+    no earlier than one full time limit from now. Until now reopening an
+    exam restarted its timer, so an attempt left open for days is still
+    resumable; the sweeper must not finalize it on its first run.
+    """
+    Question = apps.get_model('quiz_app', 'Question')
+    QuizSubmission = apps.get_model('quiz_app', 'QuizSubmission')
+    
+    migrated_at = timezone.now()
+    open_quiz_ids = QuizSubmission.objects.filter(is_completed=False).values('quiz_id')
+    quiz_minutes = (
+        Question.objects.filter(quiz_id__in=open_quiz_ids)
+        .order_by()
+        .values('quiz_id')
+        .annotate(minutes=Sum('time_limit_minutes'))
+        .values_list('quiz_id', 'minutes')
+    )
+    for quiz_id, minutes in quiz_minutes:
+        if minutes:
+            open_submissions = QuizSubmission.objects.filter(quiz_id=quiz_id, is_completed=False)
+            open_submissions.update(deadline=F('started_at') + timedelta(minutes=minutes))
+            earliest = migrated_at + timedelta(minutes=minutes)
+            open_submissions.filter(deadline__lt=earliest).update(deadline=earliest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_app', '0007_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizsubmission',
+            name='deadline',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='quizsubmission',
+            index=models.Index(fields=['is_completed', 'deadline'], name='quiz_sub_expiry_idx'),
+        ),
+        migrations.RunPython(set_open_submission_deadlines, migrations.RunPython.noop),
+    ]
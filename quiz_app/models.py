@@ -1,3 +1,6 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -29,6 +32,12 @@ class Quiz(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Quiz list: active quizzes in the trainee's categories. Django
+            # compiles is_active=True to a bare column test, which can't seek
+            # an index, so the category comes first.
+            models.Index(fields=['category', 'is_active'], name='quiz_category_active_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -95,6 +104,8 @@ class QuizSubmission(models.Model):
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='submissions')
     trainee = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_submissions')
     started_at = models.DateTimeField(auto_now_add=True)
+    # When the time allowed runs out; set when the quiz is started, None if untimed
+    deadline = models.DateTimeField(null=True, blank=True)
     submitted_at = models.DateTimeField(null=True, blank=True)
     is_completed = models.BooleanField(default=False)
     score = models.FloatField(null=True, blank=True)
@@ -102,9 +113,31 @@ class QuizSubmission(models.Model):
     class Meta:
         unique_together = ['quiz', 'trainee']
         ordering = ['-submitted_at']
+        indexes = [
+            # Leaderboard: a quiz's scored submissions in rank order, with
+            # is_completed last so get_rank()'s count reads only the index.
+            # Answer lookups by (submission, question) use Answer's unique index.
+            models.Index(fields=['quiz', '-score', 'submitted_at', 'is_completed'], name='quiz_sub_leaderboard_idx'),
+            # Expiry sweeps: unsubmitted exams whose deadline has passed
+            models.Index(fields=['is_completed', 'deadline'], name='quiz_sub_expiry_idx'),
+        ]
     
     def __str__(self):
         return f"{self.trainee.username} - {self.quiz.title}"
+    
+    @staticmethod
+    def deadline_for(started_at, total_time_seconds):
+        """Deadline of an exam started at ``started_at``, or None for an untimed quiz"""
+        if not total_time_seconds:
+            return None
+        return started_at + timedelta(seconds=total_time_seconds)
+    
+    def is_past_deadline(self):
+        """True once the deadline and EXAM_GRACE_SECONDS have passed"""
+        return (
+            self.deadline is not None
+            and timezone.now() > self.deadline + timedelta(seconds=settings.EXAM_GRACE_SECONDS)
+        )
 
 
 class Answer(models.Model):
@@ -121,3 +154,44 @@ class Answer(models.Model):
             return f"{self.submission} - {self.question} - {self.selected_choice.choice_text}"
         return f"{self.submission} - {self.question} - {self.answer_text}"
 
+
+
+class ImportJob(models.Model):
+    """An uploaded quiz bank waiting for, or processed by, the import worker"""
+    STATUS_QUEUED = 'queued'
+    STATUS_PARSING = 'parsing'
+    STATUS_IMPORTING = 'importing'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_PARSING, 'Reading file'),
+        (STATUS_IMPORTING, 'Importing'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    ACTIVE_STATUSES = [STATUS_PARSING, STATUS_IMPORTING]
+    
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='import_jobs')
+    file_name = models.CharField(max_length=255)
+    file_data = models.BinaryField(help_text="Uploaded workbook, cleared once the job has finished")
+    dry_run = models.BooleanField(default=False, help_text="Validate only, roll back instead of saving")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    success_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    seconds = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.file_name} ({self.get_status_display()})"
+    
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
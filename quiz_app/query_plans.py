@@ -0,0 +1,143 @@
+"""
+Query plan regression checks.
+
+``full_scans`` runs ``EXPLAIN`` on a SELECT and returns the tables the
+database would read in full: SQLite's ``SCAN <table>`` without an index, or
+MySQL's access type ``ALL``. Full passes over an index (a keyset page read in
+index order, say) are not reported. ``capture_selects`` records the SELECTs
+run inside a block, so the statements a view actually issues can be checked.
+``hot_querysets`` builds, without running them, the querysets behind the
+trainee and staff pages, so they can be explained against a live database
+without making requests, writing rows or filling the cache.
+
+Used by ``QueryPlanMixin`` in ``quiz_app.testing`` and by
+``manage.py check_query_plans``.
+"""
+from contextlib import ExitStack, contextmanager
+
+from django.contrib.auth.models import User
+from django.db import NotSupportedError, connections
+
+
+def _sqlite_scans(cursor, sql, params):
+    cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+    scans = []
+    for row in cursor.fetchall():
+        detail = row[-1]
+        if not detail.startswith('SCAN ') or ' USING ' in detail:
+            continue
+        # "SCAN TABLE t" before SQLite 3.36, "SCAN t [AS alias]" since
+        table = detail.split()[2] if detail.startswith('SCAN TABLE ') else detail.split()[1]
+        if table.startswith('(') or table == 'CONSTANT':
+            # Subquery results and constant rows aren't tables
+            continue
+        scans.append(table)
+    return scans
+
+
+def _mysql_scans(cursor, sql, params):
+    cursor.execute('EXPLAIN ' + sql, params)
+    columns = [column[0].lower() for column in cursor.description]
+    scans = []
+    for row in cursor.fetchall():
+        row = dict(zip(columns, row))
+        table = row.get('table') or ''
+        if row.get('type') == 'ALL' and not table.startswith('<'):
+            # <derivedN>, <subqueryN> and <unionM,N> are temporary results
+            scans.append(table)
+    return scans
+
+
+def full_scans(sql, params=(), using='default'):
+    """Tables ``sql`` would read with a full table scan on database ``using``"""
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        explain = _sqlite_scans
+    elif connection.vendor == 'mysql':
+        explain = _mysql_scans
+    else:
+        raise NotSupportedError(f'Query plan checks support SQLite and MySQL, not {connection.vendor}')
+    with connection.cursor() as cursor:
+        return explain(cursor, sql, params or ())
+
+
+def queryset_full_scans(queryset):
+    """Tables a queryset would read with a full table scan"""
+    sql, params = queryset.query.sql_with_params()
+    return full_scans(sql, params, using=queryset.db)
+
+
+@contextmanager
+def capture_selects():
+    """Collect ``(alias, sql, params)`` of every SELECT run inside the block"""
+    statements = []
+
+    def record(execute, sql, params, many, context):
+        if not many and sql.lstrip()[:6].upper() == 'SELECT':
+            statements.append((context['connection'].alias, sql, params))
+        return execute(sql, params, many, context)
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(record))
+        yield statements
+
+
+def find_full_scans(statements, allowed_tables=()):
+    """
+    ``[(sql, tables), ...]`` for the captured statements that scan a table
+    outside ``allowed_tables``. Repeated statements are explained once.
+    """
+    problems = []
+    seen = set()
+    for alias, sql, params in statements:
+        if (alias, sql) in seen:
+            continue
+        seen.add((alias, sql))
+        tables = [table for table in full_scans(sql, params, using=alias) if table not in allowed_tables]
+        if tables:
+            problems.append((sql, tables))
+    return problems
+
+
+def hot_querysets(submission):
+    """
+    ``(page, description, queryset)`` for the queries of the trainee pages
+    as seen by ``submission``'s trainee, and of the staff user directory.
+    Cache fills are included, since a cold cache runs them on every page.
+    """
+    from .leaderboard import LEADERBOARD_SIZE, ranked_submissions
+    from .models import Answer, Category, Choice, Question, QuizSubmission
+    from .user_directory import DEFAULT_PAGE_SIZE, annotate_directory_stats
+    from .views import available_quizzes
+
+    quiz_id, trainee_id = submission.quiz_id, submission.trainee_id
+    category_ids = Category.objects.filter(registered_users__user_id=trainee_id).values_list('pk', flat=True)
+    question_ids = list(Question.objects.filter(quiz_id=quiz_id).values_list('pk', flat=True)[:10])
+    return [
+        ('quiz_list', 'allowed categories', category_ids),
+        ('quiz_list', 'active quizzes by category', available_quizzes(list(category_ids))),
+        ('quiz_list', 'completed submissions', QuizSubmission.objects.filter(
+            trainee_id=trainee_id, is_completed=True,
+        ).values_list('quiz_id', 'id')),
+        ('take_quiz', 'own submission', QuizSubmission.objects.filter(quiz_id=quiz_id, trainee_id=trainee_id)),
+        ('take_quiz', 'saved answers on a page', Answer.objects.filter(
+            submission_id=submission.pk, question_id__in=question_ids,
+        )),
+        ('submit_answer', 'answer by submission and question', Answer.objects.filter(
+            submission_id=submission.pk, question_id=question_ids[0] if question_ids else 0,
+        )),
+        ('take_quiz', 'snapshot questions', Question.objects.filter(quiz_id=quiz_id).order_by('order')),
+        ('take_quiz', 'snapshot choices', Choice.objects.filter(question_id__in=question_ids).order_by('pk')),
+        ('quiz_results', 'answers of a submission', Answer.objects.filter(submission_id=submission.pk)),
+        ('quiz_results', 'answer key', Choice.objects.filter(
+            question__quiz_id=quiz_id, question__question_type='multiple_choice', is_correct=True,
+        ).values_list('pk', flat=True)),
+        ('quiz_leaderboard', 'top entries', ranked_submissions(quiz_id).values_list(
+            'pk', 'trainee_id', 'trainee__username', 'score', 'submitted_at',
+        )[:LEADERBOARD_SIZE]),
+        ('quiz_leaderboard', 'own ranked submission', ranked_submissions(quiz_id).filter(trainee_id=trainee_id)),
+        ('user_list', 'directory page', annotate_directory_stats(User.objects.all()).order_by(
+            'date_joined', 'id',
+        )[:DEFAULT_PAGE_SIZE + 1]),
+    ]
@@ -0,0 +1,113 @@
+"""
+Paginated question delivery for the exam page.
+
+``take_quiz_view`` renders a shell with the first page of questions; the page
+fetches the others as JSON from ``quiz_questions_view`` (prefetching the page
+after the one on screen). Questions come from the cached quiz snapshot, so a
+page costs one query: the trainee's saved answers to the questions on it.
+Correct answers are never sent.
+"""
+from asgiref.sync import sync_to_async
+from django.core.paginator import Paginator
+
+from . import answer_buffer
+from .models import Answer
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+
+
+def get_question_page(quiz, number, per_page=DEFAULT_PAGE_SIZE):
+    """
+    Page ``number`` of a quiz snapshot's questions. Raises ``InvalidPage``
+    (``EmptyPage`` or ``PageNotAnInteger``) for a page that doesn't exist.
+    """
+    return Paginator(quiz.questions, per_page).page(number)
+
+
+def _answer_payload(answer):
+    if answer is None:
+        return None
+    return {'choice_id': answer.selected_choice_id, 'answer_text': answer.answer_text}
+
+
+def page_payload(page, answers):
+    """JSON-ready page of questions, each with the trainee's answer or None"""
+    paginator = page.paginator
+    return {
+        'page': page.number,
+        'num_pages': paginator.num_pages,
+        'per_page': paginator.per_page,
+        'total': paginator.count,
+        'questions': [
+            {
+                'id': question.id,
+                'number': number,
+                'text': question.question_text,
+                'type': question.question_type,
+                'choices': [{'id': choice.id, 'text': choice.choice_text} for choice in question.choices],
+                'answer': _answer_payload(answers.get(question.id)),
+            }
+            for number, question in enumerate(page.object_list, start=page.start_index())
+        ],
+    }
+
+
+def _saved_answers(submission_id, question_ids):
+    return Answer.objects.filter(submission_id=submission_id, question_id__in=question_ids).only(
+        'question_id', 'selected_choice_id', 'answer_text',
+    )
+
+
+def _answered_question_ids(submission_id):
+    return Answer.objects.filter(submission_id=submission_id).exclude(answer_text='').values_list(
+        'question_id', flat=True,
+    )
+
+
+def _add_pending_answers(answers, pending, question_ids):
+    # Answers still waiting in the write-behind buffer are the newest
+    answers.update((question_id, row) for question_id, row in pending.items() if question_id in question_ids)
+    return answers
+
+
+def _add_pending_answered(answered, pending):
+    for question_id, row in pending.items():
+        if row.answer_text:
+            answered.add(question_id)
+        else:
+            answered.discard(question_id)
+    return answered
+
+
+def get_saved_answers(submission_id, question_ids):
+    """Saved answers of a submission to the given questions, keyed by question id"""
+    answers = {answer.question_id: answer for answer in _saved_answers(submission_id, question_ids)}
+    if answer_buffer.is_enabled():
+        _add_pending_answers(answers, answer_buffer.get_buffer().pending(submission_id), question_ids)
+    return answers
+
+
+async def aget_saved_answers(submission_id, question_ids):
+    """Async version of ``get_saved_answers``"""
+    answers = {answer.question_id: answer async for answer in _saved_answers(submission_id, question_ids)}
+    if answer_buffer.is_enabled():
+        pending = await sync_to_async(answer_buffer.get_buffer().pending)(submission_id)
+        _add_pending_answers(answers, pending, question_ids)
+    return answers
+
+
+def get_answered_question_ids(submission_id):
+    """Ids of the questions a submission has a non-empty answer to"""
+    answered = set(_answered_question_ids(submission_id))
+    if answer_buffer.is_enabled():
+        _add_pending_answered(answered, answer_buffer.get_buffer().pending(submission_id))
+    return answered
+
+
+async def aget_answered_question_ids(submission_id):
+    """Async version of ``get_answered_question_ids``"""
+    answered = {question_id async for question_id in _answered_question_ids(submission_id)}
+    if answer_buffer.is_enabled():
+        _add_pending_answered(answered, await sync_to_async(answer_buffer.get_buffer().pending)(submission_id))
+    return answered
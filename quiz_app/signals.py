@@ -0,0 +1,66 @@
+"""
+Signal handlers that keep cached quiz data in step with the database.
+"""
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+from .access import invalidate_allowed_categories
+from .leaderboard import invalidate_leaderboard, record_submission
+from .models import Quiz, Question, Choice, QuizSubmission, UserProfile
+from .snapshots import invalidate_quiz_snapshot, quiz_id_for_choice
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def invalidate_quiz_on_quiz_change(sender, instance, **kwargs):
+    """Quiz title, description, category or status changed"""
+    invalidate_quiz_snapshot(instance.pk)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_quiz_on_question_change(sender, instance, **kwargs):
+    """A question was added, edited or removed"""
+    invalidate_quiz_snapshot(instance.quiz_id)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def invalidate_quiz_on_choice_change(sender, instance, **kwargs):
+    """A choice or its correctness changed; also retires the quiz's answer key"""
+    invalidate_quiz_snapshot(quiz_id_for_choice(instance))
+
+
+@receiver(m2m_changed, sender=UserProfile.registered_categories.through)
+def invalidate_category_access(sender, instance, action, reverse, pk_set, **kwargs):
+    """A user's registered categories changed, from either side of the relation"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_allowed_categories([instance.user_id])
+    elif action in ('post_add', 'post_remove'):
+        # instance is a Category and pk_set holds UserProfile ids
+        invalidate_allowed_categories(
+            UserProfile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True)
+        )
+    elif action == 'pre_clear':
+        # The affected profiles are no longer known after the clear
+        invalidate_allowed_categories(instance.registered_users.values_list('user_id', flat=True))
+
+
+@receiver(post_delete, sender=UserProfile)
+def invalidate_category_access_on_profile_delete(sender, instance, **kwargs):
+    invalidate_allowed_categories([instance.user_id])
+
+
+@receiver(post_save, sender=QuizSubmission)
+def update_leaderboard_on_submission_save(sender, instance, created, **kwargs):
+    """A submission was finalized, or edited in the admin"""
+    if created and not instance.is_completed:
+        # Quiz just started; nothing to rank yet
+        return
+    record_submission(instance)
+
+
+@receiver(post_delete, sender=QuizSubmission)
+def update_leaderboard_on_submission_delete(sender, instance, **kwargs):
+    invalidate_leaderboard(instance.quiz_id)
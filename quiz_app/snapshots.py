@@ -0,0 +1,142 @@
+"""
+Cached, read-only snapshots of quiz content.
+
+A snapshot holds a quiz with all of its questions and choices as plain
+namedtuples. It is built once from the database and then served from Django's
+cache to every trainee taking the same quiz. Each quiz has a version number in
+the cache; the signals in ``quiz_app.signals`` bump it whenever a Quiz,
+Question or Choice changes, so stale snapshots are simply never read again.
+Answer keys (``quiz_app.answer_keys``) are cached under the same versions.
+"""
+import time
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Prefetch
+from django.http import Http404
+
+from .models import Quiz, Question, Choice
+
+# Bump when the snapshot layout changes so old cache entries are ignored
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+QuizSnapshot = namedtuple('QuizSnapshot', [
+    'id', 'title', 'description', 'category_id', 'is_active',
+    'questions', 'total_time_seconds',
+])
+QuestionSnapshot = namedtuple('QuestionSnapshot', [
+    'id', 'question_text', 'question_type', 'order', 'time_limit_minutes', 'choices',
+])
+ChoiceSnapshot = namedtuple('ChoiceSnapshot', ['id', 'choice_text', 'is_correct'])
+
+
+def _version_key(quiz_id):
+    return f'quiz_snapshot_version:{quiz_id}'
+
+
+def _snapshot_key(quiz_id, version):
+    return f'quiz_snapshot:{SNAPSHOT_FORMAT}:{quiz_id}:{version}'
+
+
+def _new_version():
+    # Millisecond timestamps keep versions increasing even if the counter
+    # itself is evicted from the cache and has to be recreated.
+    return int(time.time() * 1000)
+
+
+def get_snapshot_version(quiz_id):
+    """Return the current content version of a quiz"""
+    key = _version_key(quiz_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def build_quiz_snapshot(quiz_id):
+    """Build a snapshot straight from the database, or None if the quiz is missing"""
+    # From the primary: a lagging replica must not end up in the cache
+    quiz = Quiz.objects.using(DEFAULT_DB_ALIAS).filter(pk=quiz_id).first()
+    if quiz is None:
+        return None
+
+    questions = quiz.questions.prefetch_related(
+        Prefetch('choices', queryset=Choice.objects.order_by('pk'))
+    )
+    question_snapshots = tuple(
+        QuestionSnapshot(
+            id=question.id,
+            question_text=question.question_text,
+            question_type=question.question_type,
+            order=question.order,
+            time_limit_minutes=question.time_limit_minutes,
+            choices=tuple(
+                ChoiceSnapshot(id=choice.id, choice_text=choice.choice_text, is_correct=choice.is_correct)
+                for choice in question.choices.all()
+            ),
+        )
+        for question in questions
+    )
+    return QuizSnapshot(
+        id=quiz.id,
+        title=quiz.title,
+        description=quiz.description,
+        category_id=quiz.category_id,
+        is_active=quiz.is_active,
+        questions=question_snapshots,
+        total_time_seconds=sum(q.time_limit_minutes for q in question_snapshots) * 60,
+    )
+
+
+def get_quiz_snapshot(quiz_id):
+    """Return the cached snapshot of a quiz, building it on a cache miss"""
+    key = _snapshot_key(quiz_id, get_snapshot_version(quiz_id))
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_quiz_snapshot(quiz_id)
+        if snapshot is not None:
+            cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def get_quiz_snapshot_or_404(quiz_id, active_only=True):
+    """Snapshot counterpart of ``get_object_or_404(Quiz, ...)``"""
+    snapshot = get_quiz_snapshot(quiz_id)
+    if snapshot is None or (active_only and not snapshot.is_active):
+        raise Http404('No Quiz matches the given query.')
+    return snapshot
+
+
+async def aget_quiz_snapshot_or_404(quiz_id, active_only=True):
+    """Async version of ``get_quiz_snapshot_or_404``"""
+    # One trip to a worker thread for both cache reads (and a build on a miss)
+    return await sync_to_async(get_quiz_snapshot_or_404)(quiz_id, active_only)
+
+
+def _bump_version(quiz_id):
+    key = _version_key(quiz_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), None)
+
+
+def invalidate_quiz_snapshot(quiz_id):
+    """
+    Retire the current snapshot of a quiz once the surrounding transaction
+    commits, so readers can't rebuild it from uncommitted data.
+    """
+    if quiz_id is None:
+        return
+    transaction.on_commit(lambda: _bump_version(quiz_id))
+
+
+def quiz_id_for_choice(choice):
+    """Return the quiz id a choice belongs to, or None if its question is gone"""
+    if Choice.question.is_cached(choice):
+        return choice.question.quiz_id
+    return Question.objects.filter(pk=choice.question_id).values_list('quiz_id', flat=True).first()
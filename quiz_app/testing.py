@@ -0,0 +1,74 @@
+"""
+Test helpers.
+
+``QueryBudgetMixin`` makes a request to a named URL and fails if it runs more
+queries than the budget recorded for that URL in ``metrics.QUERY_BUDGETS``::
+
+    class QuizListTests(QueryBudgetMixin, TestCase):
+        def test_budget(self):
+            self.client.force_login(self.trainee)
+            self.assertQueryBudget('quiz_list')
+            self.assertQueryBudget('take_quiz', args=[quiz.id], budget=4)
+
+``QueryPlanMixin`` fails if any SELECT a view runs, or a given queryset,
+would read a whole table (SQLite and MySQL)::
+
+    class PlanTests(QueryPlanMixin, TestCase):
+        def test_leaderboard_plan(self):
+            self.client.force_login(self.trainee)
+            self.assertNoFullScans('quiz_leaderboard', args=[quiz.id])
+            self.assertQuerysetIndexed(ranked_submissions(quiz.id))
+"""
+from django.urls import reverse
+
+from .metrics import QUERY_BUDGETS, capture_queries
+from .query_plans import capture_selects, find_full_scans, queryset_full_scans
+
+
+class QueryBudgetMixin:
+    """TestCase mixin for asserting per-URL query budgets"""
+
+    def assertQueryBudget(self, url_name, budget=None, method='get', args=None, kwargs=None, data=None, **extra):
+        """
+        Request ``url_name`` with ``self.client`` and assert the query count
+        stays within ``budget`` (default: ``QUERY_BUDGETS[url_name]``).
+        Returns the response.
+        """
+        if budget is None:
+            if url_name not in QUERY_BUDGETS:
+                self.fail(f'No query budget recorded for "{url_name}"; pass budget=')
+            budget = QUERY_BUDGETS[url_name]
+
+        url = reverse(url_name, args=args, kwargs=kwargs)
+        with capture_queries() as metrics:
+            response = getattr(self.client, method)(url, data, **extra)
+        self.assertLessEqual(
+            metrics.queries, budget,
+            f'{method.upper()} {url} ({url_name}) ran {metrics.queries} queries, budget is {budget}',
+        )
+        return response
+
+
+class QueryPlanMixin:
+    """TestCase mixin for asserting that queries don't scan whole tables"""
+
+    def assertNoFullScans(self, url_name, method='get', args=None, kwargs=None, data=None, allowed_tables=(), **extra):
+        """
+        Request ``url_name`` with ``self.client`` and EXPLAIN every SELECT it
+        ran. Tables in ``allowed_tables`` may be scanned. Returns the response.
+        """
+        url = reverse(url_name, args=args, kwargs=kwargs)
+        with capture_selects() as statements:
+            response = getattr(self.client, method)(url, data, **extra)
+        problems = find_full_scans(statements, allowed_tables)
+        if problems:
+            self.fail(f'{method.upper()} {url} ({url_name}) scans whole tables:\n' + '\n'.join(
+                f'  {", ".join(tables)}: {sql}' for sql, tables in problems
+            ))
+        return response
+
+    def assertQuerysetIndexed(self, queryset, allowed_tables=()):
+        """Assert ``queryset`` reads no table in full"""
+        tables = [table for table in queryset_full_scans(queryset) if table not in allowed_tables]
+        if tables:
+            self.fail(f'Query scans {", ".join(tables)}: {queryset.query}')
@@ -0,0 +1,588 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from inspect import iscoroutinefunction
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.contrib import admin
+from django.urls import URLPattern, include, path, resolve, reverse
+from django.utils import timezone
+
+from . import answer_buffer, checks, views
+from . import urls as quiz_urls
+from .answer_keys import get_answer_key
+from .autosave import AnswerRow
+from .grading import finalize_expired_submissions, grade_submission
+from .models import Answer, Category, Choice, ImportJob, Question, Quiz, QuizSubmission
+from .leaderboard import ranked_submissions
+from .metrics import QUERY_BUDGETS
+from .query_plans import hot_querysets
+from .testing import QueryBudgetMixin, QueryPlanMixin
+from .views import available_quizzes
+
+
+def make_quiz(owner, question_count, title='Quiz'):
+    """A quiz whose questions each have one correct and one wrong choice"""
+    quiz = Quiz.objects.create(title=title, created_by=owner)
+    questions = []
+    for order in range(question_count):
+        question = Question.objects.create(quiz=quiz, question_text=f'Question {order}', order=order)
+        correct = Choice.objects.create(question=question, choice_text='Right', is_correct=True)
+        wrong = Choice.objects.create(question=question, choice_text='Wrong', is_correct=False)
+        questions.append((question, correct, wrong))
+    return quiz, questions
+
+
+def answer_all(submission, questions, correct_every=2):
+    """Answer every question, correctly for every ``correct_every``-th one"""
+    Answer.objects.bulk_create([
+        Answer(
+            submission=submission,
+            question=question,
+            selected_choice=correct if index % correct_every == 0 else wrong,
+        )
+        for index, (question, correct, wrong) in enumerate(questions)
+    ])
+
+
+class CacheIsolationMixin:
+    """Start each test with an empty cache; ids are reused after a rollback"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+class GradingTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.trainee = User.objects.create_user('trainee', password='pw')
+
+    def grade(self, question_count):
+        quiz, questions = make_quiz(self.trainee, question_count, title=f'{question_count} questions')
+        submission = QuizSubmission.objects.create(quiz=quiz, trainee=self.trainee)
+        answer_all(submission, questions)
+        return submission
+
+    def test_query_count_does_not_grow_with_quiz_size(self):
+        small, large = self.grade(5), self.grade(50)
+        # Building the answer key, then grading from the cached key
+        for queries in (3, 1):
+            with self.assertNumQueries(queries):
+                self.assertAlmostEqual(grade_submission(small), 60.0)
+            with self.assertNumQueries(queries):
+                self.assertAlmostEqual(grade_submission(large), 50.0)
+
+    def test_unanswered_and_empty_quizzes_score_zero(self):
+        quiz, _ = make_quiz(self.trainee, 3)
+        self.assertEqual(grade_submission(QuizSubmission.objects.create(quiz=quiz, trainee=self.trainee)), 0.0)
+        empty = Quiz.objects.create(title='Empty', created_by=self.trainee)
+        self.assertEqual(grade_submission(QuizSubmission.objects.create(quiz=empty, trainee=self.trainee)), 0.0)
+
+
+class AnswerBufferFlushTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_override = override_settings(
+            ANSWER_WRITE_BEHIND=True, ANSWER_BUFFER_PATH=str(Path(directory) / 'buffer.sqlite3'),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        trainee = User.objects.create_user('trainee', password='pw')
+        self.quiz, self.questions = make_quiz(trainee, 4)
+        self.submission = QuizSubmission.objects.create(quiz=self.quiz, trainee=trainee)
+        self.buffer = answer_buffer.get_buffer()
+
+    def buffer_answers(self, correct):
+        self.buffer.add(self.submission.id, [
+            AnswerRow(question.id, (right if correct else wrong).id, (right if correct else wrong).choice_text)
+            for question, right, wrong in self.questions
+        ])
+
+    def assertAnswers(self, correct):
+        answers = Answer.objects.filter(submission=self.submission)
+        expected = {question.id: (right if correct else wrong).id for question, right, wrong in self.questions}
+        self.assertEqual(dict(answers.values_list('question_id', 'selected_choice_id')), expected)
+
+    def test_killed_between_copy_and_delete(self):
+        self.buffer_answers(correct=False)
+        # The flusher dies after the Answer rows committed, before the
+        # buffer rows are deleted
+        with mock.patch('quiz_app.answer_buffer._chunks', side_effect=SystemExit):
+            with self.assertRaises(SystemExit):
+                self.buffer.flush()
+        self.assertAnswers(correct=False)
+        self.assertEqual(self.buffer.size(), 4)
+
+        # The next flush writes the same rows again without duplicating them
+        self.assertEqual(self.buffer.flush(), 4)
+        self.assertEqual(self.buffer.size(), 0)
+        self.assertEqual(Answer.objects.filter(submission=self.submission).count(), 4)
+        self.assertAnswers(correct=False)
+
+    def test_newer_autosave_after_interrupted_flush_wins(self):
+        self.buffer_answers(correct=False)
+        with mock.patch('quiz_app.answer_buffer._chunks', side_effect=SystemExit):
+            with self.assertRaises(SystemExit):
+                self.buffer.flush()
+        self.buffer_answers(correct=True)
+        self.buffer.flush()
+        self.assertEqual(self.buffer.size(), 0)
+        self.assertAnswers(correct=True)
+
+    def test_failed_database_write_keeps_buffered_rows(self):
+        self.buffer_answers(correct=True)
+        with mock.patch('quiz_app.answer_buffer.bulk_upsert_answers', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.buffer.flush()
+        self.assertEqual(Answer.objects.filter(submission=self.submission).count(), 0)
+        self.assertEqual(self.buffer.size(), 4)
+        self.buffer.flush()
+        self.assertAnswers(correct=True)
+
+
+class SharedCacheGuardTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser('admin', password='pw')
+
+    def call(self, *args):
+        out = StringIO()
+        call_command(*args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_cache_invalidating_commands_refuse_locmem(self):
+        for args in (
+            ('run_import_worker', '--once'),
+            ('rescore_quiz', '--all'),
+            ('expire_submissions', '--once'),
+            ('import_quizzes', 'bank.jsonl'),
+        ):
+            with self.subTest(command=args[0]):
+                with self.assertRaisesMessage(CommandError, 'locmem cache is private to this process'):
+                    self.call(*args)
+
+    def test_commands_run_on_a_shared_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        quiz, questions = make_quiz(self.admin, 2)
+        expired = QuizSubmission.objects.create(
+            quiz=quiz, trainee=self.admin, deadline=timezone.now() - timedelta(hours=1),
+        )
+        answer_all(expired, questions)
+
+        file_cache = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}
+        with override_settings(CACHES={'default': file_cache}):
+            self.assertIn('Finalized 1 expired submission(s)', self.call('expire_submissions', '--once'))
+            self.assertIn('Rescored 1 submission(s)', self.call('rescore_quiz', str(quiz.id)))
+            # Leave the test runner's own SIGINT handler in place
+            with mock.patch('quiz_app.management.commands.run_import_worker.signal.signal'):
+                self.assertIn('Import worker stopped', self.call('run_import_worker', '--once'))
+        expired.refresh_from_db()
+        self.assertTrue(expired.is_completed)
+        self.assertEqual(expired.score, 50.0)
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+class AdminChangelistQueryTests(QueryBudgetMixin, CacheIsolationMixin, TestCase):
+    # Queries per changelist page, whatever the number of rows on it
+    CHANGELIST_QUERIES = {
+        'admin:quiz_app_quiz_changelist': 6,
+        'admin:quiz_app_quizsubmission_changelist': 5,
+        'admin:quiz_app_answer_changelist': 6,
+        'admin:auth_user_changelist': 6,
+        'admin:quiz_app_importjob_changelist': 5,
+        'admin:quiz_app_category_changelist': 5,
+        'admin:quiz_app_userprofile_changelist': 6,
+        'admin:quiz_app_question_changelist': 6,
+        'admin:quiz_app_choice_changelist': 5,
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser('admin', password='pw')
+        self.rows = 0
+        # Categories created by data migrations are listed next to the rows
+        self.existing = {'admin:quiz_app_category_changelist': Category.objects.count()}
+
+    def add_rows(self, count):
+        """One row for every changelist, each pointing at its own related objects"""
+        for i in range(self.rows, self.rows + count):
+            user = self.admin if i == 0 else User.objects.create_user(f'trainee{i}', password='pw')
+            category = Category.objects.create(name=f'Category {i}')
+            user.profile.registered_categories.add(category)
+            quiz = Quiz.objects.create(title=f'Quiz {i}', created_by=user, category=category)
+            question = Question.objects.create(quiz=quiz, question_text=f'Question {i}')
+            choice = Choice.objects.create(question=question, choice_text='Right', is_correct=True)
+            submission = QuizSubmission.objects.create(
+                quiz=quiz, trainee=user, is_completed=True, score=100.0, submitted_at=timezone.now(),
+            )
+            Answer.objects.create(submission=submission, question=question, selected_choice=choice)
+            ImportJob.objects.create(
+                uploaded_by=user, file_name=f'bank{i}.xlsx', file_data=b'', status=ImportJob.STATUS_SUCCEEDED,
+            )
+        self.rows += count
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.client.force_login(self.admin)
+        for rows in (1, 50):
+            self.add_rows(rows - self.rows)
+            for url_name, budget in self.CHANGELIST_QUERIES.items():
+                with self.subTest(url_name, rows=rows):
+                    response = self.assertQueryBudget(url_name, budget=budget)
+                    self.assertEqual(response.context['cl'].result_count, rows + self.existing.get(url_name, 0))
+
+
+
+class ImportUploadTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser('admin', password='pw')
+        self.client.force_login(self.admin)
+
+    def upload(self):
+        record = {
+            'title': 'Uploaded', 'created_by': 'admin', 'is_active': True,
+            'questions': [{
+                'question_text': 'Pick one', 'question_type': 'multiple_choice',
+                'choices': [{'choice_text': 'Right', 'is_correct': True}, {'choice_text': 'Wrong', 'is_correct': False}],
+            }],
+        }
+        bank = SimpleUploadedFile('bank.jsonl', json.dumps(record).encode() + b'\n')
+        response = self.client.post(reverse('admin:quiz_upload_excel'), {'excel_file': bank})
+        job = ImportJob.objects.get()
+        self.assertRedirects(response, reverse('admin:quiz_import_job', args=[job.pk]))
+        return job
+
+    @override_settings(IMPORT_WORKER=False)
+    def test_upload_is_imported_inline_without_a_worker(self):
+        job = self.upload()
+        self.assertEqual(job.status, ImportJob.STATUS_SUCCEEDED)
+        self.assertEqual(job.success_count, 1)
+        self.assertTrue(Quiz.objects.filter(title='Uploaded', questions__choices__is_correct=True).exists())
+
+    @override_settings(IMPORT_WORKER=True)
+    def test_upload_is_queued_for_the_worker(self):
+        job = self.upload()
+        self.assertEqual(job.status, ImportJob.STATUS_QUEUED)
+        self.assertFalse(Quiz.objects.filter(title='Uploaded').exists())
+
+    def test_progress_page_warns_about_a_queued_job_without_a_worker(self):
+        job = ImportJob.objects.create(uploaded_by=self.admin, file_name='bank.jsonl', file_data=b'')
+        url = reverse('admin:quiz_import_job', args=[job.pk])
+        with override_settings(IMPORT_WORKER=False):
+            self.assertContains(self.client.get(url), 'no import worker is configured')
+        with override_settings(IMPORT_WORKER=True):
+            self.assertNotContains(self.client.get(url), 'no import worker is configured')
+
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+REDIS = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'}}
+CACHED_DB_SESSIONS = 'django.contrib.sessions.backends.cached_db'
+DB_SESSIONS = 'django.contrib.sessions.backends.db'
+
+
+class CacheSettingsTests(TestCase):
+    def session_engine(self, **environ):
+        """SESSION_ENGINE the settings module picks in a fresh process with ``environ``"""
+        env = {key: value for key, value in os.environ.items() if key not in ('CACHE_BACKEND', 'SESSION_BACKEND')}
+        env.update(environ, DJANGO_SETTINGS_MODULE='quiz_project.settings')
+        result = subprocess.run(
+            [sys.executable, '-c', 'from django.conf import settings; print(settings.SESSION_ENGINE)'],
+            env=env, capture_output=True, text=True, check=True,
+        )
+        return result.stdout.strip()
+
+    def test_sessions_are_cached_only_in_a_shared_cache(self):
+        self.assertEqual(self.session_engine(CACHE_BACKEND='locmem'), DB_SESSIONS)
+        self.assertEqual(self.session_engine(CACHE_BACKEND='redis'), CACHED_DB_SESSIONS)
+        self.assertEqual(self.session_engine(CACHE_BACKEND='file'), CACHED_DB_SESSIONS)
+
+    def error_ids(self):
+        return [message.id for message in checks.check_locmem_in_production(None)]
+
+    @override_settings(DEBUG=False, CACHES=LOCMEM, SESSION_ENGINE=CACHED_DB_SESSIONS, WEB_CONCURRENCY=3)
+    def test_locmem_fails_with_cached_sessions_or_several_workers(self):
+        self.assertEqual(self.error_ids(), ['quiz_app.E001', 'quiz_app.E002'])
+        with self.settings(SESSION_ENGINE=DB_SESSIONS, WEB_CONCURRENCY=1):
+            self.assertEqual(self.error_ids(), [])
+        with self.settings(CACHES=REDIS):
+            self.assertEqual(self.error_ids(), [])
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.error_ids(), [])
+
+
+HOT_PATH = ['take_quiz', 'quiz_questions', 'submit_answer', 'submit_answers', 'submit_quiz']
+
+
+class AsyncHotPathURLs:
+    """The project's URLconf with the async hot path views, as served under ASGI"""
+    urlpatterns = [
+        path('admin/', admin.site.urls),
+        path('', include([
+            URLPattern(
+                pattern.pattern,
+                getattr(views, f'a{pattern.callback.__name__}') if pattern.name in HOT_PATH else pattern.callback,
+                name=pattern.name,
+            )
+            for pattern in quiz_urls.urlpatterns
+        ])),
+    ]
+
+
+class HotPathViewTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.trainee = User.objects.create_user('trainee', password='pw')
+        self.quiz, self.questions = make_quiz(self.trainee, 4)
+
+    def test_wsgi_serves_sync_views(self):
+        for url_name in HOT_PATH:
+            with self.subTest(url_name):
+                view = resolve(reverse(url_name, args=[self.quiz.id])).func
+                self.assertFalse(iscoroutinefunction(view))
+                self.assertTrue(iscoroutinefunction(getattr(views, f'a{view.__name__}')))
+
+    def take_exam(self, request):
+        """Autosave, page through and submit an exam; returns the JSON question page"""
+        submission = QuizSubmission.objects.create(
+            quiz=self.quiz, trainee=self.trainee, deadline=timezone.now() + timedelta(hours=1),
+        )
+        (first, first_right, _), (second, _, second_wrong) = self.questions[:2]
+        responses = [
+            request('post', reverse('submit_answer', args=[self.quiz.id]), {
+                'question_id': first.id, 'choice_id': first_right.id,
+            }),
+            request('post', reverse('submit_answers', args=[self.quiz.id]), json.dumps({
+                'answers': [{'question_id': second.id, 'choice_id': second_wrong.id}],
+            }), content_type='application/json'),
+            request('get', reverse('take_quiz', args=[self.quiz.id])),
+            request('get', reverse('quiz_questions', args=[self.quiz.id]), {'page': 1, 'per_page': 2}),
+        ]
+        self.assertEqual([response.status_code for response in responses], [200, 200, 200, 200])
+
+        response = request('post', reverse('submit_quiz', args=[self.quiz.id]))
+        self.assertRedirects(response, reverse('quiz_results', args=[submission.id]), fetch_redirect_response=False)
+        submission.refresh_from_db()
+        self.assertTrue(submission.is_completed)
+        self.assertEqual(submission.score, 25.0)
+        submission.delete()
+        return responses[-1].json()
+
+    def test_sync_and_async_views_agree(self):
+        self.client.force_login(self.trainee)
+        sync_page = self.take_exam(lambda method, *args, **kwargs: getattr(self.client, method)(*args, **kwargs))
+
+        async_client = AsyncClient()
+        async_client.force_login(self.trainee)
+
+        async def async_request(method, *args, **kwargs):
+            return await getattr(async_client, method)(*args, **kwargs)
+
+        with override_settings(ROOT_URLCONF=AsyncHotPathURLs):
+            async_page = self.take_exam(async_to_sync(async_request))
+        self.assertEqual(async_page, sync_page)
+        self.assertEqual([question['answer'] is not None for question in async_page['questions']], [True, True])
+
+
+class DeadlineMigrationTests(TransactionTestCase):
+    before = [('quiz_app', '0007_hot_query_indexes')]
+    after = [('quiz_app', '0008_submission_deadline')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def test_open_exams_get_at_least_a_full_time_limit(self):
+        apps = self.migrate(self.before)
+        owner = apps.get_model('auth', 'User').objects.create(username='owner')
+        quiz = apps.get_model('quiz_app', 'Quiz').objects.create(title='Timed', created_by=owner)
+        apps.get_model('quiz_app', 'Question').objects.create(quiz=quiz, question_text='Q', time_limit_minutes=30)
+        Submission = apps.get_model('quiz_app', 'QuizSubmission')
+        now = timezone.now()
+        abandoned = Submission.objects.create(quiz=quiz, trainee=owner)
+        Submission.objects.filter(pk=abandoned.pk).update(started_at=now - timedelta(days=3))
+        trainee = apps.get_model('auth', 'User').objects.create(username='trainee')
+        running = Submission.objects.create(quiz=quiz, trainee=trainee)
+        Submission.objects.filter(pk=running.pk).update(started_at=now - timedelta(minutes=5))
+
+        apps = self.migrate(self.after)
+        Submission = apps.get_model('quiz_app', 'QuizSubmission')
+        migrated_at = timezone.now()
+        abandoned, running = Submission.objects.get(pk=abandoned.pk), Submission.objects.get(pk=running.pk)
+        # Resumable for one time limit from the upgrade, not finalized at once
+        self.assertGreaterEqual(abandoned.deadline, now + timedelta(minutes=30))
+        self.assertLessEqual(abandoned.deadline, migrated_at + timedelta(minutes=30))
+        # An exam started just before the upgrade gets the same full window
+        self.assertEqual(running.deadline, abandoned.deadline)
+
+
+class SubmitRaceTests(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.trainee = User.objects.create_user('trainee', password='pw')
+        self.quiz, questions = make_quiz(self.trainee, 4)
+        started_at = timezone.now() - timedelta(hours=2)
+        self.submission = QuizSubmission.objects.create(
+            quiz=self.quiz, trainee=self.trainee, started_at=started_at,
+            deadline=started_at + timedelta(hours=1),
+        )
+        answer_all(self.submission, questions)
+
+    def assertSweeperResultStands(self, response):
+        self.assertRedirects(
+            response, reverse('quiz_results', args=[self.submission.id]), fetch_redirect_response=False,
+        )
+        submission = QuizSubmission.objects.get(pk=self.submission.pk)
+        self.assertTrue(submission.is_completed)
+        self.assertEqual(submission.score, 50.0)
+        self.assertEqual(submission.submitted_at, submission.deadline)
+
+    def sweep_then_score(self, submission):
+        # The sweeper finalizes the exam after the view has read it
+        self.assertEqual(finalize_expired_submissions()['finalized'], 1)
+        return 100.0
+
+    def test_submit_does_not_overwrite_a_swept_exam(self):
+        self.client.force_login(self.trainee)
+        with mock.patch('quiz_app.views.grade_submission', side_effect=self.sweep_then_score), \
+                mock.patch('quiz_app.grading.record_submission') as record_submission:
+            response = self.client.post(reverse('submit_quiz', args=[self.quiz.id]))
+        self.assertSweeperResultStands(response)
+        self.assertEqual(record_submission.call_count, 0)
+
+    def test_async_submit_does_not_overwrite_a_swept_exam(self):
+        client = AsyncClient()
+        client.force_login(self.trainee)
+
+        async def sweep_then_score(submission):
+            return await sync_to_async(self.sweep_then_score)(submission)
+
+        with override_settings(ROOT_URLCONF=AsyncHotPathURLs), \
+                mock.patch('quiz_app.views.agrade_submission', side_effect=sweep_then_score):
+            response = async_to_sync(client.post)(reverse('submit_quiz', args=[self.quiz.id]))
+        self.assertSweeperResultStands(response)
+
+    def test_submit_in_time_is_recorded(self):
+        QuizSubmission.objects.filter(pk=self.submission.pk).update(deadline=timezone.now() + timedelta(hours=1))
+        self.client.force_login(self.trainee)
+        with mock.patch('quiz_app.grading.record_submission') as record_submission:
+            self.client.post(reverse('submit_quiz', args=[self.quiz.id]))
+        submission = QuizSubmission.objects.get(pk=self.submission.pk)
+        self.assertTrue(submission.is_completed)
+        self.assertEqual(submission.score, 50.0)
+        self.assertEqual(record_submission.call_args.args[0].pk, submission.pk)
+
+
+class QueryPlanTests(QueryPlanMixin, CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.trainee = User.objects.create_user('trainee', password='pw')
+        self.category = Category.objects.create(name='Query plans')
+        self.trainee.profile.registered_categories.add(self.category)
+        self.quiz, self.questions = make_quiz(self.trainee, 3)
+        Quiz.objects.filter(pk=self.quiz.pk).update(category=self.category)
+        self.submission = QuizSubmission.objects.create(
+            quiz=self.quiz, trainee=self.trainee, is_completed=True, score=50.0, submitted_at=timezone.now(),
+        )
+        answer_all(self.submission, self.questions)
+
+    def test_hot_querysets_use_indexes(self):
+        # The indexes of migration 0007 and the keys these lookups rely on
+        self.assertQuerysetIndexed(ranked_submissions(self.quiz.id))
+        self.assertQuerysetIndexed(available_quizzes([self.category.id]))
+        question = self.questions[0][0]
+        self.assertQuerysetIndexed(Answer.objects.filter(submission=self.submission, question=question))
+
+    def test_check_query_plans_querysets_use_indexes(self):
+        for page, description, queryset in hot_querysets(self.submission):
+            with self.subTest(page, query=description):
+                self.assertQuerysetIndexed(queryset)
+
+    def test_trainee_pages_use_indexes(self):
+        self.client.force_login(self.trainee)
+        self.assertNoFullScans('quiz_list')
+        self.assertNoFullScans('quiz_results', args=[self.submission.id])
+        self.assertNoFullScans('quiz_leaderboard', args=[self.quiz.id])
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+class QueryBudgetTests(QueryBudgetMixin, CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        self.trainee = User.objects.create_user('trainee', password='pw')
+        category = Category.objects.create(name='Budgets')
+        self.trainee.profile.registered_categories.add(category)
+        self.quiz, questions = make_quiz(self.staff, 5)
+        done, done_questions = make_quiz(self.staff, 5, title='Done')
+        Quiz.objects.filter(pk__in=[self.quiz.pk, done.pk]).update(category=category)
+        QuizSubmission.objects.create(quiz=self.quiz, trainee=self.trainee, deadline=timezone.now() + timedelta(hours=1))
+        completed = QuizSubmission.objects.create(
+            quiz=done, trainee=self.trainee, is_completed=True, score=60.0, submitted_at=timezone.now(),
+        )
+        answer_all(completed, done_questions)
+
+        question, right, wrong = questions[0]
+        answers = json.dumps({'answers': [{'question_id': question.id, 'choice_id': wrong.id}]})
+        # url name -> (method, args, data, extra)
+        self.requests = {
+            'quiz_list': ('get', [], None, {}),
+            'take_quiz': ('get', [self.quiz.id], None, {}),
+            'quiz_questions': ('get', [self.quiz.id], {'page': 1}, {}),
+            'submit_answer': ('post', [self.quiz.id], {'question_id': question.id, 'choice_id': right.id}, {}),
+            'submit_answers': ('post', [self.quiz.id], answers, {'content_type': 'application/json'}),
+            'quiz_results': ('get', [completed.id], None, {}),
+            'quiz_leaderboard': ('get', [done.id], None, {}),
+        }
+
+    def request(self, url_name, budget=None):
+        method, args, data, extra = self.requests[url_name]
+        if budget is None:
+            return getattr(self.client, method)(reverse(url_name, args=args), data, **extra)
+        return self.assertQueryBudget(url_name, budget=budget, method=method, args=args, data=data, **extra)
+
+    def test_every_budgeted_url_is_covered(self):
+        self.assertEqual(set(self.requests) | {'submit_quiz', 'user_list'}, set(QUERY_BUDGETS))
+
+    def test_trainee_pages_stay_within_budget_on_a_warm_cache(self):
+        self.client.force_login(self.trainee)
+        for url_name in self.requests:
+            self.request(url_name)
+        get_answer_key(self.quiz.id)
+
+        for url_name in self.requests:
+            with self.subTest(url_name):
+                response = self.request(url_name, budget=QUERY_BUDGETS[url_name])
+                self.assertEqual(response.status_code, 200)
+        response = self.assertQueryBudget('submit_quiz', method='post', args=[self.quiz.id])
+        self.assertEqual(response.status_code, 302)
+
+    def test_user_list_stays_within_budget(self):
+        self.client.force_login(self.staff)
+        self.assertEqual(self.assertQueryBudget('user_list').status_code, 200)
@@ -1,19 +1,30 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth import views as auth_views
 from . import views
 
+
+def hot_path(view_name):
+    """The async twin of a trainee hot-path view under ASGI, the sync view under WSGI"""
+    return getattr(views, f'a{view_name}' if settings.ASYNC_VIEWS else view_name)
+
+
 urlpatterns = [
     path('', views.quiz_list_view, name='quiz_list'),
     path('register/', views.register_view, name='register'),
     path('login/', views.login_view, name='login'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
     path('quiz/<int:quiz_id>/start/', views.start_quiz_view, name='start_quiz'),
-    path('quiz/<int:quiz_id>/', views.take_quiz_view, name='take_quiz'),
-    path('quiz/<int:quiz_id>/submit-answer/', views.submit_answer_view, name='submit_answer'),
-    path('quiz/<int:quiz_id>/submit/', views.submit_quiz_view, name='submit_quiz'),
+    path('quiz/<int:quiz_id>/', hot_path('take_quiz_view'), name='take_quiz'),
+    path('quiz/<int:quiz_id>/questions/', hot_path('quiz_questions_view'), name='quiz_questions'),
+    path('quiz/<int:quiz_id>/submit-answer/', hot_path('submit_answer_view'), name='submit_answer'),
+    path('quiz/<int:quiz_id>/submit-answers/', hot_path('submit_answers_view'), name='submit_answers'),
+    path('quiz/<int:quiz_id>/submit/', hot_path('submit_quiz_view'), name='submit_quiz'),
     path('quiz/<int:quiz_id>/leaderboard/', views.leaderboard_view, name='quiz_leaderboard'),
+    path('quiz/<int:quiz_id>/events/', views.quiz_events_view, name='quiz_events'),
     path('results/<int:submission_id>/', views.quiz_results_view, name='quiz_results'),
     path('manage/users/', views.user_list_view, name='user_list'),
     path('manage/users/<int:user_id>/delete/', views.delete_user_view, name='delete_user'),
+    path('manage/metrics/', views.metrics_view, name='metrics'),
 ]
 
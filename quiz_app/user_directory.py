@@ -0,0 +1,113 @@
+"""
+Staff user directory with keyset pagination.
+
+Pages are ordered by ``(date_joined, id)`` and located with a cursor holding
+the last row seen, so page N costs the same as page 1 instead of an ever
+larger OFFSET. Username search is a prefix range on the unique username
+index. Per-user aggregates come from correlated subqueries in the same
+query that reads the page.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.db.models import Avg, Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import QuizSubmission, UserProfile
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(date_joined, user_id):
+    """Opaque, URL-safe position of a row in (date_joined, id) order"""
+    microseconds = (date_joined - _EPOCH) // timedelta(microseconds=1)
+    return f'{microseconds}-{user_id}'
+
+
+def decode_cursor(cursor):
+    try:
+        microseconds, user_id = cursor.split('-')
+        return _EPOCH + timedelta(microseconds=int(microseconds)), int(user_id)
+    except (ValueError, OverflowError):
+        raise InvalidCursor(cursor)
+
+
+def prefix_range(prefix):
+    """
+    ``(low, high)`` bounds matching every string starting with ``prefix``.
+    A range comparison can seek the username index on every backend, which
+    ``LIKE 'abc%'`` can't on SQLite. Matching follows the column collation.
+    """
+    last = prefix[-1]
+    if ord(last) == 0x10FFFF:
+        return prefix, None
+    return prefix, prefix[:-1] + chr(ord(last) + 1)
+
+
+def _count_subquery(queryset, ref):
+    counts = queryset.filter(**{ref: OuterRef('pk')}).order_by().values(ref).annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def annotate_directory_stats(queryset):
+    """Add category_count, completed_count and average_score to users"""
+    categories = UserProfile.registered_categories.through.objects.all()
+    completed = QuizSubmission.objects.filter(is_completed=True)
+    average = (
+        completed.filter(trainee_id=OuterRef('pk'), score__isnull=False)
+        .order_by().values('trainee_id').annotate(average=Avg('score')).values('average')
+    )
+    return queryset.annotate(
+        category_count=_count_subquery(categories, 'userprofile__user_id'),
+        completed_count=_count_subquery(completed, 'trainee_id'),
+        average_score=Subquery(average),
+    )
+
+
+def get_user_page(search='', after=None, before=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Return ``(users, next_cursor, previous_cursor)`` for one directory page.
+
+    ``after``/``before`` are cursors from a previous page; the missing
+    direction's cursor is None when there are no more rows that way.
+    """
+    users = User.objects.only(
+        'id', 'username', 'email', 'is_staff', 'is_superuser', 'date_joined',
+    )
+    if search:
+        low, high = prefix_range(search)
+        users = users.filter(username__gte=low)
+        if high is not None:
+            users = users.filter(username__lt=high)
+
+    backwards = before is not None and after is None
+    cursor = before if backwards else after
+    if cursor is not None:
+        joined, user_id = decode_cursor(cursor)
+        # Written as ">= AND (> OR >)" so the date_joined index bounds the scan
+        if backwards:
+            users = users.filter(Q(date_joined__lte=joined), Q(date_joined__lt=joined) | Q(id__lt=user_id))
+        else:
+            users = users.filter(Q(date_joined__gte=joined), Q(date_joined__gt=joined) | Q(id__gt=user_id))
+
+    ordering = ('-date_joined', '-id') if backwards else ('date_joined', 'id')
+    rows = list(annotate_directory_stats(users).order_by(*ordering)[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return rows, None, None
+    first = encode_cursor(rows[0].date_joined, rows[0].id)
+    last = encode_cursor(rows[-1].date_joined, rows[-1].id)
+    if backwards:
+        return rows, last, first if has_more else None
+    return rows, last if has_more else None, first if cursor is not None else None
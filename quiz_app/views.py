@@ -1,29 +1,65 @@
+import json
+import os
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.http import JsonResponse
+from django.core.paginator import InvalidPage
+from django.db.models import Count
+from django.http import Http404, HttpResponse, JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
-from .models import Quiz, Question, Choice, QuizSubmission, Answer, UserProfile
+from .models import Category, Quiz, QuizSubmission, UserProfile
 from .forms import UserRegistrationForm
+from . import answer_buffer, metrics, question_delivery
+from .access import aget_allowed_category_ids, get_allowed_category_ids
+from .answer_keys import get_answer_key, review_answers
+from .db_router import use_replica
+from .autosave import MAX_BATCH_ITEMS, astore_answers, store_answers, validate_answer_items
+from .decorators import async_login_required, async_require_POST
+from .grading import afinalize_submission, agrade_submission, finalize_submission, grade_submission
+from .leaderboard import get_rank, get_top_entries
+from .snapshots import aget_quiz_snapshot_or_404, get_quiz_snapshot, get_quiz_snapshot_or_404
+from .user_directory import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor, get_user_page
 
 
 def check_quiz_category_access(user, quiz):
     """Check if user has access to the quiz's category"""
-    if not quiz.category:
+    if not quiz.category_id:
         # If quiz has no category, allow access (for backward compatibility)
         return True
     
+    # Users without a profile have no registered categories
+    return quiz.category_id in get_allowed_category_ids(user)
+
+
+def available_quizzes(category_ids):
+    """Active quizzes in the given categories, with their question counts"""
+    return (
+        Quiz.objects.filter(is_active=True, category_id__in=category_ids)
+        .select_related('category', 'created_by')
+        .annotate(question_count=Count('questions'))
+    )
+
+
+async def acheck_quiz_category_access(user, quiz):
+    """Async version of ``check_quiz_category_access``"""
+    if not quiz.category_id:
+        return True
+    return quiz.category_id in await aget_allowed_category_ids(user)
+
+
+async def aget_object_or_404(model, **kwargs):
+    """``get_object_or_404`` for async views (Django 4.2 has no async version)"""
     try:
-        user_profile = user.profile
-        registered_categories = user_profile.registered_categories.all()
-        return quiz.category in registered_categories
-    except UserProfile.DoesNotExist:
-        # If user has no profile, they have no registered categories
-        return False
+        return await model.objects.aget(**kwargs)
+    except model.DoesNotExist:
+        raise Http404(f'No {model._meta.object_name} matches the given query.')
 
 
 def register_view(request):
@@ -63,25 +99,21 @@ def login_view(request):
     return render(request, 'quiz_app/login.html')
 
 
+@use_replica
 @login_required
 def quiz_list_view(request):
     """Display list of available quizzes filtered by user's registered categories"""
     # Get user's registered categories
-    try:
-        user_profile = request.user.profile
-        registered_categories = user_profile.registered_categories.all()
-    except UserProfile.DoesNotExist:
-        # Create profile if it doesn't exist (for existing users)
-        user_profile = UserProfile.objects.create(user=request.user)
-        registered_categories = user_profile.registered_categories.all()
+    allowed_category_ids = get_allowed_category_ids(request.user)
     
     # Filter quizzes by user's registered categories
-    if registered_categories.exists():
-        quizzes = Quiz.objects.filter(
-            is_active=True,
-            category__in=registered_categories
-        ).prefetch_related('submissions', 'questions', 'category')
+    if allowed_category_ids:
+        registered_categories = Category.objects.filter(pk__in=allowed_category_ids)
+        quizzes = available_quizzes(allowed_category_ids)
     else:
+        # Create profile if it doesn't exist (for existing users)
+        UserProfile.objects.get_or_create(user=request.user)
+        registered_categories = Category.objects.none()
         # If user has no registered categories, show no quizzes
         quizzes = Quiz.objects.none()
         messages.info(
@@ -89,15 +121,15 @@ def quiz_list_view(request):
             'You have not registered for any categories. Please contact an administrator to register for categories.'
         )
     
-    user_submissions = QuizSubmission.objects.filter(trainee=request.user, is_completed=True).select_related('quiz')
-    submitted_quiz_ids = user_submissions.values_list('quiz_id', flat=True)
-    
-    # Create a dictionary mapping quiz_id to submission_id for easy lookup
-    submission_map = {sub.quiz_id: sub.id for sub in user_submissions}
+    # Map quiz_id to the user's completed submission_id in one keyed query
+    submission_map = dict(
+        QuizSubmission.objects.filter(trainee=request.user, is_completed=True)
+        .values_list('quiz_id', 'id')
+    )
     
     context = {
         'quizzes': quizzes,
-        'submitted_quiz_ids': list(submitted_quiz_ids),
+        'submitted_quiz_ids': list(submission_map),
         'submission_map': submission_map,
         'registered_categories': registered_categories,
     }
@@ -114,11 +146,17 @@ def start_quiz_view(request, quiz_id):
         messages.error(request, 'You do not have access to quizzes in this category.')
         return redirect('quiz_list')
     
-    # Check if user already has a submission
+    # Check if user already has a submission; a new one gets its deadline
+    # now, so later requests compare against it instead of re-adding time limits
+    started_at = timezone.now()
+    total_time_seconds = get_quiz_snapshot(quiz.id).total_time_seconds
     submission, created = QuizSubmission.objects.get_or_create(
         quiz=quiz,
         trainee=request.user,
-        defaults={'started_at': timezone.now()}
+        defaults={
+            'started_at': started_at,
+            'deadline': QuizSubmission.deadline_for(started_at, total_time_seconds),
+        }
     )
     
     if submission.is_completed:
@@ -128,75 +166,253 @@ def start_quiz_view(request, quiz_id):
     return redirect('take_quiz', quiz_id=quiz_id)
 
 
+# The trainee hot path below comes in pairs: a sync view for WSGI workers and
+# an async twin (``a`` prefix) for ASGI. urls.py serves one set or the other,
+# following ASYNC_VIEWS, so neither server pays to adapt the other's views.
+
+def _take_quiz_context(quiz, submission, first_page, answered_ids):
+    return {
+        'quiz': quiz,
+        'total_questions': len(quiz.questions),
+        'first_page': first_page,
+        'answered_ids': sorted(answered_ids),
+        'submission': submission,
+        'deadline': submission.deadline,
+        'server_time': timezone.now(),
+        'live_updates': settings.LIVE_UPDATES,
+    }
+
+
 @login_required
 def take_quiz_view(request, quiz_id):
     """Display quiz questions for taking"""
-    quiz = get_object_or_404(Quiz, id=quiz_id, is_active=True)
+    quiz = get_quiz_snapshot_or_404(quiz_id)
     
     # Check if user has access to this quiz's category
     if not check_quiz_category_access(request.user, quiz):
         messages.error(request, 'You do not have access to quizzes in this category.')
         return redirect('quiz_list')
     
-    submission = get_object_or_404(QuizSubmission, quiz=quiz, trainee=request.user)
+    submission = get_object_or_404(QuizSubmission, quiz_id=quiz.id, trainee=request.user)
     
     if submission.is_completed:
         messages.info(request, 'You have already completed this quiz.')
         return redirect('quiz_results', submission_id=submission.id)
     
-    questions = quiz.questions.all()
-    # total time in seconds based on per-question time limits
-    total_time_seconds = sum(q.time_limit_minutes for q in questions) * 60
-    existing_answers = {answer.question_id: answer for answer in submission.answers.all()}
+    # A shell with the first page of questions; the page fetches the rest
+    page = question_delivery.get_question_page(quiz, 1)
+    answers = question_delivery.get_saved_answers(submission.id, [q.id for q in page.object_list])
     
-    context = {
-        'quiz': quiz,
-        'questions': questions,
-        'submission': submission,
-        'existing_answers': existing_answers,
-        'total_time_seconds': total_time_seconds,
-    }
+    context = _take_quiz_context(
+        quiz, submission,
+        question_delivery.page_payload(page, answers),
+        question_delivery.get_answered_question_ids(submission.id),
+    )
     return render(request, 'quiz_app/take_quiz.html', context)
 
 
+@async_login_required
+async def atake_quiz_view(request, quiz_id):
+    """Async version of ``take_quiz_view``"""
+    quiz = await aget_quiz_snapshot_or_404(quiz_id)
+    
+    if not await acheck_quiz_category_access(request.user, quiz):
+        messages.error(request, 'You do not have access to quizzes in this category.')
+        return redirect('quiz_list')
+    
+    submission = await aget_object_or_404(QuizSubmission, quiz_id=quiz.id, trainee=request.user)
+    
+    if submission.is_completed:
+        messages.info(request, 'You have already completed this quiz.')
+        return redirect('quiz_results', submission_id=submission.id)
+    
+    page = question_delivery.get_question_page(quiz, 1)
+    answers = await question_delivery.aget_saved_answers(submission.id, [q.id for q in page.object_list])
+    
+    context = _take_quiz_context(
+        quiz, submission,
+        question_delivery.page_payload(page, answers),
+        await question_delivery.aget_answered_question_ids(submission.id),
+    )
+    return render(request, 'quiz_app/take_quiz.html', context)
+
+
+def _requested_page_size(request):
+    try:
+        return min(
+            max(int(request.GET.get('per_page', question_delivery.DEFAULT_PAGE_SIZE)), 1),
+            question_delivery.MAX_PAGE_SIZE,
+        )
+    except ValueError:
+        return question_delivery.DEFAULT_PAGE_SIZE
+
+
+@login_required
+def quiz_questions_view(request, quiz_id):
+    """JSON page of questions with the trainee's saved answers (?page=, ?per_page=)"""
+    quiz = get_quiz_snapshot_or_404(quiz_id)
+    
+    # Check if user has access to this quiz's category
+    if not check_quiz_category_access(request.user, quiz):
+        return JsonResponse({'error': 'You do not have access to quizzes in this category.'}, status=403)
+    
+    submission = get_object_or_404(QuizSubmission, quiz_id=quiz.id, trainee=request.user)
+    
+    if submission.is_completed:
+        return JsonResponse({'error': 'Quiz already completed'}, status=400)
+    
+    try:
+        page = question_delivery.get_question_page(quiz, request.GET.get('page', 1), _requested_page_size(request))
+    except InvalidPage:
+        return JsonResponse({'error': 'Invalid page'}, status=404)
+    
+    answers = question_delivery.get_saved_answers(submission.id, [q.id for q in page.object_list])
+    return JsonResponse(question_delivery.page_payload(page, answers))
+
+
+@async_login_required
+async def aquiz_questions_view(request, quiz_id):
+    """Async version of ``quiz_questions_view``"""
+    quiz = await aget_quiz_snapshot_or_404(quiz_id)
+    
+    if not await acheck_quiz_category_access(request.user, quiz):
+        return JsonResponse({'error': 'You do not have access to quizzes in this category.'}, status=403)
+    
+    submission = await aget_object_or_404(QuizSubmission, quiz_id=quiz.id, trainee=request.user)
+    
+    if submission.is_completed:
+        return JsonResponse({'error': 'Quiz already completed'}, status=400)
+    
+    try:
+        page = question_delivery.get_question_page(quiz, request.GET.get('page', 1), _requested_page_size(request))
+    except InvalidPage:
+        return JsonResponse({'error': 'Invalid page'}, status=404)
+    
+    answers = await question_delivery.aget_saved_answers(submission.id, [q.id for q in page.object_list])
+    return JsonResponse(question_delivery.page_payload(page, answers))
+
+
+def _closed_for_answers(submission):
+    """Error response if the submission no longer takes answers, else None"""
+    if submission.is_completed:
+        return JsonResponse({'error': 'Quiz already completed'}, status=400)
+    if submission.is_past_deadline():
+        return JsonResponse({'error': 'Time is up for this quiz'}, status=400)
+    return None
+
+
 @login_required
 @require_http_methods(["POST"])
 def submit_answer_view(request, quiz_id):
     """Save an answer for a question"""
-    quiz = get_object_or_404(Quiz, id=quiz_id)
+    quiz = get_quiz_snapshot_or_404(quiz_id, active_only=False)
     
     # Check if user has access to this quiz's category
     if not check_quiz_category_access(request.user, quiz):
         return JsonResponse({'error': 'You do not have access to quizzes in this category.'}, status=403)
     
-    submission = get_object_or_404(QuizSubmission, quiz=quiz, trainee=request.user)
+    submission = get_object_or_404(QuizSubmission, quiz_id=quiz.id, trainee=request.user)
+    closed = _closed_for_answers(submission)
+    if closed:
+        return closed
     
-    if submission.is_completed:
-        return JsonResponse({'error': 'Quiz already completed'}, status=400)
+    rows, errors = validate_answer_items(quiz, [request.POST.dict()])
+    if errors:
+        raise Http404(errors[0]['error'])
     
-    question_id = request.POST.get('question_id')
-    question = get_object_or_404(Question, id=question_id, quiz=quiz)
+    store_answers(submission.id, rows)
     
-    answer, created = Answer.objects.get_or_create(
-        submission=submission,
-        question=question
-    )
+    return JsonResponse({'success': True})
+
+
+@async_login_required
+@async_require_POST
+async def asubmit_answer_view(request, quiz_id):
+    """Async version of ``submit_answer_view``"""
+    quiz = await aget_quiz_snapshot_or_404(quiz_id, active_only=False)
     
-    if question.question_type == 'multiple_choice':
-        choice_id = request.POST.get('choice_id')
-        if choice_id:
-            choice = get_object_or_404(Choice, id=choice_id, question=question)
-            answer.selected_choice = choice
-            answer.answer_text = choice.choice_text
-    else:
-        answer_text = request.POST.get('answer_text', '')
-        answer.answer_text = answer_text
+    if not await acheck_quiz_category_access(request.user, quiz):
+        return JsonResponse({'error': 'You do not have access to quizzes in this category.'}, status=403)
+    
+    submission = await aget_object_or_404(QuizSubmission, quiz_id=quiz.id, trainee=request.user)
+    closed = _closed_for_answers(submission)
+    if closed:
+        return closed
     
-    answer.save()
+    rows, errors = validate_answer_items(quiz, [request.POST.dict()])
+    if errors:
+        raise Http404(errors[0]['error'])
+    
+    await astore_answers(submission.id, rows)
     
     return JsonResponse({'success': True})
 
 
+def _posted_answer_items(request):
+    """The list of answers in a batch autosave, or None if the payload is invalid"""
+    # JSON body from fetch(), or an "answers" form field from sendBeacon()
+    try:
+        if request.content_type == 'application/json':
+            items = json.loads(request.body).get('answers')
+        else:
+            items = json.loads(request.POST.get('answers', ''))
+    except (ValueError, AttributeError):
+        return None
+    
+    if not isinstance(items, list) or len(items) > MAX_BATCH_ITEMS:
+        return None
+    return items
+
+
+@login_required
+@require_http_methods(["POST"])
+def submit_answers_view(request, quiz_id):
+    """Save a batch of answers for several questions in one request"""
+    quiz = get_quiz_snapshot_or_404(quiz_id, active_only=False)
+    
+    # Check if user has access to this quiz's category
+    if not check_quiz_category_access(request.user, quiz):
+        return JsonResponse({'error': 'You do not have access to quizzes in this category.'}, status=403)
+    
+    submission = get_object_or_404(QuizSubmission, quiz_id=quiz.id, trainee=request.user)
+    closed = _closed_for_answers(submission)
+    if closed:
+        return closed
+    
+    items = _posted_answer_items(request)
+    if items is None:
+        return JsonResponse({'error': 'Invalid answers payload'}, status=400)
+    
+    rows, errors = validate_answer_items(quiz, items)
+    saved = store_answers(submission.id, rows)
+    
+    return JsonResponse({'success': not errors, 'saved': saved, 'errors': errors})
+
+
+@async_login_required
+@async_require_POST
+async def asubmit_answers_view(request, quiz_id):
+    """Async version of ``submit_answers_view``"""
+    quiz = await aget_quiz_snapshot_or_404(quiz_id, active_only=False)
+    
+    if not await acheck_quiz_category_access(request.user, quiz):
+        return JsonResponse({'error': 'You do not have access to quizzes in this category.'}, status=403)
+    
+    submission = await aget_object_or_404(QuizSubmission, quiz_id=quiz.id, trainee=request.user)
+    closed = _closed_for_answers(submission)
+    if closed:
+        return closed
+    
+    items = _posted_answer_items(request)
+    if items is None:
+        return JsonResponse({'error': 'Invalid answers payload'}, status=400)
+    
+    rows, errors = validate_answer_items(quiz, items)
+    saved = await astore_answers(submission.id, rows)
+    
+    return JsonResponse({'success': not errors, 'saved': saved, 'errors': errors})
+
+
 @login_required
 @require_http_methods(["POST"])
 def submit_quiz_view(request, quiz_id):
@@ -213,78 +429,173 @@ def submit_quiz_view(request, quiz_id):
     if submission.is_completed:
         return JsonResponse({'error': 'Quiz already completed'}, status=400)
     
+    # Persist any buffered autosaves before grading
+    if answer_buffer.is_enabled():
+        answer_buffer.get_buffer().flush(submission_id=submission.id)
+    
     # Calculate score
-    total_questions = quiz.questions.count()
-    correct_answers = 0
+    score = grade_submission(submission)
+
+    if finalize_submission(submission, score):
+        messages.success(request, f'Quiz submitted successfully! Your score: {score:.1f}%')
+    else:
+        messages.info(request, 'Your time was up, so this quiz was already submitted.')
+    return redirect('quiz_results', submission_id=submission.id)
+
+
+@async_login_required
+@async_require_POST
+async def asubmit_quiz_view(request, quiz_id):
+    """Async version of ``submit_quiz_view``"""
+    quiz = await aget_object_or_404(Quiz, id=quiz_id)
     
-    for answer in submission.answers.all():
-        if answer.question.question_type == 'multiple_choice':
-            if answer.selected_choice and answer.selected_choice.is_correct:
-                correct_answers += 1
+    if not await acheck_quiz_category_access(request.user, quiz):
+        messages.error(request, 'You do not have access to quizzes in this category.')
+        return redirect('quiz_list')
     
-    score = (correct_answers / total_questions * 100) if total_questions > 0 else 0
+    submission = await aget_object_or_404(QuizSubmission, quiz=quiz, trainee=request.user)
     
-    submission.is_completed = True
-    submission.submitted_at = timezone.now()
-    submission.score = score
-    submission.save()
+    if submission.is_completed:
+        return JsonResponse({'error': 'Quiz already completed'}, status=400)
+    
+    if answer_buffer.is_enabled():
+        await sync_to_async(answer_buffer.get_buffer().flush)(submission_id=submission.id)
     
-    messages.success(request, f'Quiz submitted successfully! Your score: {score:.1f}%')
+    score = await agrade_submission(submission)
+
+    if await afinalize_submission(submission, score):
+        messages.success(request, f'Quiz submitted successfully! Your score: {score:.1f}%')
+    else:
+        messages.info(request, 'Your time was up, so this quiz was already submitted.')
     return redirect('quiz_results', submission_id=submission.id)
 
 
+@use_replica
 @login_required
 def quiz_results_view(request, submission_id):
     """Display quiz results"""
     submission = get_object_or_404(QuizSubmission, id=submission_id, trainee=request.user)
-    quiz = submission.quiz
+    quiz = get_quiz_snapshot(submission.quiz_id)
     
     # Check if user has access to this quiz's category
     if not check_quiz_category_access(request.user, quiz):
         messages.error(request, 'You do not have access to quizzes in this category.')
         return redirect('quiz_list')
     
-    answers = submission.answers.select_related('question', 'selected_choice').all()
-    
-    # Create a dictionary for easy lookup
-    answers_dict = {answer.question_id: answer for answer in answers}
+    # Correctness comes from the answer key and choice text from the
+    # snapshot, so the answers are read without joining their choices
+    answers = submission.answers.only('submission_id', 'question_id', 'selected_choice_id', 'answer_text')
     
     context = {
         'submission': submission,
         'quiz': quiz,
-        'questions': quiz.questions.all(),
-        'answers_dict': answers_dict,
+        'review': review_answers(quiz, get_answer_key(quiz.id), answers),
     }
     return render(request, 'quiz_app/quiz_results.html', context)
 
 
+@use_replica
 @login_required
 def leaderboard_view(request, quiz_id):
     """Display leaderboard for a quiz"""
-    quiz = get_object_or_404(Quiz, id=quiz_id)
+    quiz = get_quiz_snapshot_or_404(quiz_id, active_only=False)
     
     # Check if user has access to this quiz's category
     if not check_quiz_category_access(request.user, quiz):
         messages.error(request, 'You do not have access to quizzes in this category.')
         return redirect('quiz_list')
     
-    submissions = (
-        QuizSubmission.objects.filter(quiz=quiz, is_completed=True, score__isnull=False)
-        .select_related('trainee')
-        .order_by('-score', 'submitted_at')[:50]
-    )
+    own_submission = QuizSubmission.objects.filter(
+        quiz_id=quiz.id, trainee=request.user, is_completed=True, score__isnull=False
+    ).first()
+    if own_submission:
+        own_rank, total_ranked = get_rank(own_submission)
+    else:
+        own_rank, total_ranked = None, None
+    
     context = {
         'quiz': quiz,
-        'submissions': submissions,
+        'entries': get_top_entries(quiz.id),
+        'own_submission': own_submission,
+        'own_rank': own_rank,
+        'total_ranked': total_ranked,
+        'live_updates': settings.LIVE_UPDATES,
     }
     return render(request, 'quiz_app/leaderboard.html', context)
 
 
+def quiz_events_view(request, quiz_id):
+    """
+    Live leaderboard and timer stream of a quiz. Under ASGI with live updates
+    on, ``quiz_app.live.with_live_events`` serves this URL before Django does;
+    anything reaching the view can't stream, and 204 stops EventSource retrying.
+    """
+    return HttpResponse(status=204)
+
+
+@use_replica
 @staff_member_required
 def user_list_view(request):
-    """Admin/staff: list all registered users."""
-    users = User.objects.all().order_by('date_joined')
-    return render(request, 'quiz_app/user_list.html', {'users': users})
+    """Admin/staff: browse registered users page by page (?format=json for scripts)."""
+    wants_json = request.GET.get('format') == 'json'
+    search = request.GET.get('q', '').strip()
+    try:
+        page_size = min(max(int(request.GET.get('per_page', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        page_size = DEFAULT_PAGE_SIZE
+
+    try:
+        users, next_cursor, previous_cursor = get_user_page(
+            search=search,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+            page_size=page_size,
+        )
+    except InvalidCursor:
+        if wants_json:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+        return redirect('user_list')
+
+    if wants_json:
+        return JsonResponse({
+            'results': [
+                {
+                    'id': u.id,
+                    'username': u.username,
+                    'email': u.email,
+                    'is_staff': u.is_staff,
+                    'is_superuser': u.is_superuser,
+                    'date_joined': u.date_joined.isoformat(),
+                    'registered_categories': u.category_count,
+                    'completed_quizzes': u.completed_count,
+                    'average_score': u.average_score,
+                }
+                for u in users
+            ],
+            'next': next_cursor,
+            'previous': previous_cursor,
+        })
+
+    return render(request, 'quiz_app/user_list.html', {
+        'users': users,
+        'search': search,
+        'page_size': page_size,
+        'next_cursor': next_cursor,
+        'previous_cursor': previous_cursor,
+    })
+
+
+@staff_member_required
+def metrics_view(request):
+    """Admin/staff: per-URL query and timing aggregates of this worker process."""
+    if request.method == 'POST' and request.POST.get('reset'):
+        metrics.reset_stats()
+    return JsonResponse({
+        'enabled': settings.QUIZ_METRICS,
+        'pid': os.getpid(),
+        'views': metrics.get_stats(),
+        'connections': metrics.get_connection_stats(),
+    })
 
 
 @staff_member_required
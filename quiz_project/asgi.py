@@ -12,6 +12,18 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quiz_project.settings')
+# Under ASGI each request runs its database work in a thread of its own, so
+# a persistent connection would never be reused and stays open until that
+# thread is collected. Connect per request unless told otherwise, or set
+# DB_POOL_SIZE to hand connections between those threads.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+# Serve the async versions of the trainee hot path views (see ASYNC_VIEWS)
+os.environ.setdefault('DJANGO_ASYNC_VIEWS', 'True')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Live leaderboard/timer streams bypass Django's request cycle (see quiz_app/live.py)
+from quiz_app.live import with_live_events  # noqa: E402
+
+application = with_live_events(django_application)
 
@@ -5,6 +5,8 @@ Django settings for quiz_project project.
 from pathlib import Path
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -103,8 +105,30 @@ if DB_ENGINE == 'mysql':
             'OPTIONS': {
                 'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
             },
+            # Keep connections open between requests instead of reconnecting
+            # to RDS every time; 0 restores connect-per-request. Health checks
+            # ping a reused connection once per request before using it.
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': env_bool('DB_CONN_HEALTH_CHECKS', True),
         }
     }
+
+    # Optional per-process connection pool for threaded gunicorn workers
+    # (see quiz_app/db_backends/mysql_pool). Connections go back to the pool
+    # after each request and any thread of the worker can take them over.
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '0'))
+    if DB_POOL_SIZE > 0:
+        DATABASES['default'].update({
+            'ENGINE': 'quiz_app.db_backends.mysql_pool',
+            'CONN_MAX_AGE': 0,
+            'POOL': {
+                'MAX_IDLE': DB_POOL_SIZE,
+                # Recycle before MySQL's wait_timeout can drop them
+                'MAX_LIFETIME': int(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+                # Ping connections that sat idle this long before reuse
+                'PING_AFTER': int(os.getenv('DB_POOL_PING_AFTER', '30')),
+            },
+        })
 else:
     # Default to SQLite for local development or if env vars not set
     DATABASES = {
@@ -115,6 +139,122 @@ else:
     }
 
 
+# Read replicas (see quiz_app/db_router.py)
+# DB_REPLICAS lists replica MySQL hosts ("host" or "host:port", same user and
+# database as the primary), or SQLite file paths when DB_ENGINE isn't mysql;
+# pointing it at db.sqlite3 itself exercises the routing locally.
+DATABASE_REPLICAS = []
+for number, replica in enumerate([r.strip() for r in os.getenv('DB_REPLICAS', '').split(',') if r.strip()], start=1):
+    alias = f'replica{number}'
+    DATABASES[alias] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if DB_ENGINE == 'mysql':
+        host, _, port = replica.partition(':')
+        DATABASES[alias].update(HOST=host, PORT=port or DATABASES['default']['PORT'])
+    else:
+        DATABASES[alias]['NAME'] = BASE_DIR / replica
+    DATABASE_REPLICAS.append(alias)
+
+# Seconds a browser keeps reading from the primary after it wrote something
+REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', '10'))
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['quiz_app.db_router.ReplicaRouter']
+    # Outside the session middleware, whose saves count as writes
+    MIDDLEWARE.insert(0, 'quiz_app.db_router.PrimaryPinMiddleware')
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Quiz snapshots, category access sets, leaderboards and sessions live here.
+# CACHE_BACKEND is one of locmem (default; private to each process), file,
+# memcached (needs pymemcache) or redis (needs redis). With several gunicorn
+# workers or the import/flush workers running, use a shared one.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem').lower()
+_CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'quiz-app'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'cache')),
+    # "host:port", several separated by commas
+    'memcached': ('django.core.cache.backends.memcached.PyMemcacheCache', '127.0.0.1:11211'),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+if CACHE_BACKEND not in _CACHE_BACKENDS:
+    raise ImproperlyConfigured(f'CACHE_BACKEND must be one of: {", ".join(_CACHE_BACKENDS)}')
+CACHES = {
+    'default': {
+        'BACKEND': _CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.getenv('CACHE_LOCATION', _CACHE_BACKENDS[CACHE_BACKEND][1]),
+        # Keeps several deployments sharing one memcached/redis apart
+        'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'quiz'),
+        'TIMEOUT': int(os.getenv('CACHE_TIMEOUT', '300')),
+    }
+}
+
+# Number of web server processes. gunicorn and uvicorn read WEB_CONCURRENCY
+# as their worker count; quiz_app.E002 uses it to reject the locmem cache
+# when there are several.
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+
+# Sessions: SESSION_BACKEND is cached_db (read from the cache and written
+# through to the database; the default with a shared cache), db (a query on
+# every authenticated request; the default with locmem) or signed_cookies
+# (nothing stored server side).
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'db' if CACHE_BACKEND == 'locmem' else 'cached_db').lower()
+_SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+if SESSION_BACKEND not in _SESSION_ENGINES:
+    raise ImproperlyConfigured(f'SESSION_BACKEND must be one of: {", ".join(_SESSION_ENGINES)}')
+SESSION_ENGINE = _SESSION_ENGINES[SESSION_BACKEND]
+
+
+# Write-behind autosave buffer (see quiz_app/answer_buffer.py)
+# When enabled, autosaved answers go to a local SQLite file and are moved to
+# the database in bulk by `python manage.py flush_answer_buffer`.
+ANSWER_WRITE_BEHIND = env_bool("ANSWER_WRITE_BEHIND", False)
+ANSWER_BUFFER_PATH = os.getenv("ANSWER_BUFFER_PATH", str(BASE_DIR / "answer_buffer.sqlite3"))
+
+
+# Exam deadlines (see QuizSubmission.deadline)
+# Autosaves are accepted this many seconds past the deadline, for requests in
+# flight when the timer ends; `python manage.py expire_submissions` finalizes
+# exams only after it too.
+EXAM_GRACE_SECONDS = int(os.getenv("EXAM_GRACE_SECONDS", "10"))
+
+
+# Admin quiz bank uploads (see quiz_app/import_jobs.py)
+# Turn this on when `python manage.py run_import_worker` runs next to the web
+# server; without a worker, uploads are imported during the upload request.
+IMPORT_WORKER = env_bool("IMPORT_WORKER", False)
+
+
+# Trainee hot path views (quiz page, question pages, autosaves, submission):
+# async under ASGI, where asgi.py turns this on, sync under WSGI. A sync
+# worker would run async views through an event loop per request for
+# nothing, at less than half the autosave throughput.
+ASYNC_VIEWS = env_bool("DJANGO_ASYNC_VIEWS", False)
+
+
+# Live leaderboard and exam timer over Server-Sent Events (see quiz_app/live.py)
+# Streams need the ASGI server; pages only open them when this is on.
+LIVE_UPDATES = env_bool("LIVE_UPDATES", False)
+# How often each server process checks a watched quiz's leaderboard
+LIVE_POLL_SECONDS = float(os.getenv("LIVE_POLL_SECONDS", "1"))
+# How often streams get the server clock (also keeps idle connections open)
+LIVE_TICK_SECONDS = float(os.getenv("LIVE_TICK_SECONDS", "15"))
+# Streams are closed after this long and the browser reconnects
+LIVE_STREAM_SECONDS = int(os.getenv("LIVE_STREAM_SECONDS", "300"))
+
+
+# Per-view query/timing instrumentation (see quiz_app/metrics.py)
+# Adds Server-Timing headers and per-URL aggregates at /manage/metrics/.
+QUIZ_METRICS = env_bool("QUIZ_METRICS", False)
+if QUIZ_METRICS:
+    MIDDLEWARE.insert(0, 'quiz_app.metrics.QueryMetricsMiddleware')
+    TEMPLATES[0]['BACKEND'] = 'quiz_app.metrics.TimedDjangoTemplates'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 